@@ -0,0 +1,18 @@
+# Generated by Django 5.0.4 on 2026-10-16 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aging', '0006_agingsnapshot_aging_year'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agingsnapshot',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Set when the snapshot is deleted; its lines are purged in the background.', null=True, verbose_name='Deleted At'),
+        ),
+    ]
@@ -3,13 +3,17 @@ from django.conf import settings
 from django.db import models
 from django.db.models import Sum
 
+from apps.data_import.managers import LiveLineManager, LiveSnapshotManager
+
 
 class AgingSnapshot(models.Model):
     """
     One import-session record per uploaded aging Excel file.
 
     All AgingReceivable lines produced by a single import are linked here.
-    Deleting a snapshot cascades to all its lines — full rollback in one DELETE.
+    Deleting a snapshot (API or re-import) only sets deleted_at — it
+    disappears at once from `objects` — and its lines are purged in the
+    background in bounded batches (apps/data_import/purge.py).
     """
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -54,6 +58,17 @@ class AgingSnapshot(models.Model):
         verbose_name="Uploaded At",
     )
 
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Deleted At",
+        help_text="Set when the snapshot is deleted; its lines are purged in the background.",
+    )
+
+    objects = LiveSnapshotManager()
+    all_objects = models.Manager()
+
     class Meta:
         db_table = "aging_snapshot"
         ordering = ["-uploaded_at"]
@@ -70,7 +85,8 @@ class AgingReceivable(models.Model):
     One customer account row from an aging Excel report.
 
     Each instance belongs to one AgingSnapshot session.
-    Deleting the snapshot cascades to all its lines.
+    `objects` includes the lines of deleted snapshots awaiting purge; use
+    `live` unless the query is scoped to a live snapshot.
     """
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -179,6 +195,9 @@ class AgingReceivable(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = models.Manager()
+    live = LiveLineManager()
+
     class Meta:
         db_table = "aging_receivable"
         verbose_name = "Aging Receivable"
@@ -29,11 +29,12 @@ def _strip_param(request, key: str, default: str = "") -> str:
 
 
 def _build_sales_map(company) -> dict:
+    from apps.transactions.classification import MovementKind
     from apps.transactions.models import MaterialMovement
 
     qs = (
         MaterialMovement.objects
-        .filter(company=company, movement_type="ف بيع")
+        .filter(company=company, movement_kind=MovementKind.SALE)
         .exclude(Q(customer_name__isnull=True) | Q(customer_name=""))
         .exclude(Q(branch__name__isnull=True) | Q(branch__name=""))
         .values_list("customer_name", "branch__name")
@@ -79,7 +80,8 @@ def _get_snapshot_and_qs(company, snapshot_id_param: str):
 class AgingSnapshotListView(APIView):
     """
     GET  /api/aging/snapshots/           → list all snapshots (newest first)
-    DELETE /api/aging/snapshots/<uuid>/  → delete (roll back) a snapshot
+    DELETE /api/aging/snapshots/<uuid>/  → delete (roll back) a snapshot; its
+                                           lines are purged in the background
     """
     permission_classes = [IsAuthenticated]
 
@@ -95,7 +97,9 @@ class AgingSnapshotListView(APIView):
             snapshot = AgingSnapshot.objects.get(id=snapshot_id, company=company)
         except AgingSnapshot.DoesNotExist:
             return Response({"error": "Snapshot not found."}, status=status.HTTP_404_NOT_FOUND)
-        snapshot.delete()
+        # Hidden at once; its lines are purged in the background
+        from apps.data_import.purge import discard_snapshots
+        discard_snapshots(AgingSnapshot.objects.filter(pk=snapshot.pk))
         return Response({"deleted": str(snapshot_id)}, status=status.HTTP_200_OK)
 
 
@@ -168,7 +172,7 @@ class AgingDetailView(APIView):
 
     def get(self, request, aging_id):
         try:
-            record = AgingReceivable.objects.select_related("customer").get(
+            record = AgingReceivable.live.select_related("customer").get(
                 id=aging_id,
                 company=request.user.company,
             )
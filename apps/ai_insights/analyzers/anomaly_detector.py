@@ -9,9 +9,9 @@ from collections import defaultdict
 from datetime import date, timedelta
 from statistics import mean, stdev
 
-from django.db.models import Count, Sum, Q
-from django.db.models.functions import TruncDate
+from django.db.models import Count, F, Sum, Q
 
+from apps.transactions.classification import MovementKind
 from apps.ai_insights.client import AIClient, AIClientError
 
 logger = logging.getLogger(__name__)
@@ -96,25 +96,25 @@ class AnomalyDetector:
         }
 
     def _build_time_series(self, company) -> dict:
-        from apps.transactions.models import MaterialMovement
+        from apps.kpi.models import DailySalesFact
         today      = date.today()
         full_start = today - timedelta(days=DETECTION_WINDOW_DAYS)
         base_qs    = (
-            MaterialMovement.objects
-            .filter(company=company, movement_type="ف بيع", movement_date__gte=full_start)
+            DailySalesFact.objects
+            .filter(company=company, movement_kind=MovementKind.SALE, date__gte=full_start)
             .exclude(Q(customer_name__isnull=True) | Q(customer_name=""))
         )
         daily_revenue   = dict(
-            base_qs.annotate(day=TruncDate("movement_date"))
+            base_qs.annotate(day=F("date"))
             .values("day").annotate(value=Sum("total_out")).values_list("day", "value")
         )
         daily_txns      = dict(
-            base_qs.annotate(day=TruncDate("movement_date"))
-            .values("day").annotate(value=Count("id")).values_list("day", "value")
+            base_qs.annotate(day=F("date"))
+            .values("day").annotate(value=Sum("line_count")).values_list("day", "value")
         )
         daily_customers = {
             row["day"]: row["value"]
-            for row in base_qs.annotate(day=TruncDate("movement_date"))
+            for row in base_qs.annotate(day=F("date"))
             .values("day").annotate(value=Count("customer_name", distinct=True))
         }
         streams = {"daily_revenue_lyd": [], "daily_transactions": [], "daily_unique_customers": []}
@@ -180,13 +180,13 @@ class AnomalyDetector:
 
     def _detect_per_product(self, company) -> list:
         """Detect revenue anomalies per top-N SKU using same rolling 3-sigma."""
-        from apps.transactions.models import MaterialMovement
+        from apps.kpi.models import DailySalesFact
         today      = date.today()
         full_start = today - timedelta(days=DETECTION_WINDOW_DAYS)
 
         top_products = (
-            MaterialMovement.objects
-            .filter(company=company, movement_type="ف بيع", movement_date__gte=full_start)
+            DailySalesFact.objects
+            .filter(company=company, movement_kind=MovementKind.SALE, date__gte=full_start)
             .exclude(Q(material_code__isnull=True) | Q(material_code=""))
             .values("material_code", "material_name")
             .annotate(total_rev=Sum("total_out"))
@@ -198,10 +198,10 @@ class AnomalyDetector:
 
         daily_per_product = defaultdict(list)
         for row in (
-            MaterialMovement.objects
-            .filter(company=company, movement_type="ف بيع",
-                    movement_date__gte=full_start, material_code__in=product_codes)
-            .annotate(day=TruncDate("movement_date"))
+            DailySalesFact.objects
+            .filter(company=company, movement_kind=MovementKind.SALE,
+                    date__gte=full_start, material_code__in=product_codes)
+            .annotate(day=F("date"))
             .values("material_code", "day")
             .annotate(value=Sum("total_out"))
             .order_by("material_code", "day")
@@ -26,9 +26,10 @@ import time
 from datetime import date, timedelta
 
 from django.conf import settings
-from django.db.models import Count, Max, Sum, Q
+from django.db.models import Max, Sum, Q
 from django.db.models.functions import TruncMonth
 
+from apps.transactions.classification import MovementKind
 from apps.ai_insights.client import AIClient, AIClientError, RateLimitError
 
 logger = logging.getLogger(__name__)
@@ -136,7 +137,7 @@ class ChurnPredictor:
     # ── Feature engineering ───────────────────────────────────────────────────
 
     def _compute_features(self, company) -> list[dict]:
-        from apps.transactions.models import MaterialMovement
+        from apps.kpi.models import DailySalesFact
         from apps.aging.models import AgingReceivable, AgingSnapshot
         from apps.customers.models import Customer
 
@@ -145,23 +146,23 @@ class ChurnPredictor:
 
         # Pre-limit to top 200 by revenue before expensive feature engineering
         sales_per_customer = (
-            MaterialMovement.objects
-            .filter(company=company, movement_type="ف بيع", movement_date__gte=period_from)
+            DailySalesFact.objects
+            .filter(company=company, movement_kind=MovementKind.SALE, date__gte=period_from)
             .exclude(Q(customer_name__isnull=True) | Q(customer_name=""))
             .values("customer_name")
             .annotate(
-                purchase_count=Count("id"),
-                last_purchase=Max("movement_date"),
+                purchase_count=Sum("line_count"),
+                last_purchase=Max("date"),
                 total_revenue=Sum("total_out"),
             )
             .order_by("-total_revenue")[:PRE_FILTER_LIMIT]
         )
 
         monthly_by_customer = (
-            MaterialMovement.objects
-            .filter(company=company, movement_type="ف بيع", movement_date__gte=period_from)
+            DailySalesFact.objects
+            .filter(company=company, movement_kind=MovementKind.SALE, date__gte=period_from)
             .exclude(Q(customer_name__isnull=True) | Q(customer_name=""))
-            .annotate(month=TruncMonth("movement_date"))
+            .annotate(month=TruncMonth("date"))
             .values("customer_name", "month")
             .annotate(monthly_revenue=Sum("total_out"))
             .order_by("customer_name", "month")
@@ -7,6 +7,7 @@ SCRUM-35 v2.0 - Causal graph linking + role-based situation filtering
 import logging
 from datetime import date, timedelta
 from django.db.models import Count, Sum, Q, Max
+from apps.transactions.classification import ANY_PURCHASE_KINDS, MovementKind
 from apps.ai_insights.client import AIClient, AIClientError
 
 logger = logging.getLogger(__name__)
@@ -202,7 +203,7 @@ class CriticalDetector:
             period_from = today - timedelta(days=ANALYSIS_DAYS)
             top_customers = (
                 MaterialMovement.objects
-                .filter(company=company, movement_type="ف بيع", movement_date__gte=period_from)
+                .filter(company=company, movement_kind=MovementKind.SALE, movement_date__gte=period_from)
                 .exclude(Q(customer_name__isnull=True) | Q(customer_name=""))
                 .values("customer_name")
                 .annotate(last_purchase=Max("movement_date"), total_revenue=Sum("total_out"))
@@ -247,11 +248,11 @@ class CriticalDetector:
             base_start = today - timedelta(days=60)
             base_end   = today - timedelta(days=7)
             recent = (MaterialMovement.objects
-                      .filter(company=company, movement_type="ف بيع", movement_date__gte=week_start)
+                      .filter(company=company, movement_kind=MovementKind.SALE, movement_date__gte=week_start)
                       .aggregate(total=Sum("total_out"), txns=Count("id")))
             recent_rev = float(recent["total"] or 0)
             baseline   = (MaterialMovement.objects
-                          .filter(company=company, movement_type="ف بيع",
+                          .filter(company=company, movement_kind=MovementKind.SALE,
                                   movement_date__gte=base_start, movement_date__lt=base_end)
                           .aggregate(total=Sum("total_out")))
             baseline_7d = float(baseline["total"] or 0) / 53 * 7 if baseline["total"] else 0
@@ -322,7 +323,7 @@ class CriticalDetector:
             period_from = today - timedelta(days=ANALYSIS_DAYS)
             top_products = (
                 MaterialMovement.objects
-                .filter(company=company, movement_type="ف بيع", movement_date__gte=period_from)
+                .filter(company=company, movement_kind=MovementKind.SALE, movement_date__gte=period_from)
                 .values("material_code", "material_name")
                 .annotate(total_revenue=Sum("total_out"), total_qty_sold=Sum("qty_out"))
                 .exclude(Q(material_code__isnull=True) | Q(material_code=""))
@@ -330,7 +331,7 @@ class CriticalDetector:
             )
             purchases = dict(
                 MaterialMovement.objects
-                .filter(company=company, movement_type__contains="شراء", movement_date__gte=period_from)
+                .filter(company=company, movement_kind__in=ANY_PURCHASE_KINDS, movement_date__gte=period_from)
                 .values("material_code").annotate(total_in=Sum("qty_in"))
                 .values_list("material_code", "total_in")
             )
@@ -376,10 +377,10 @@ class CriticalDetector:
             prev_start = today - timedelta(days=60)
             prev_end   = today - timedelta(days=30)
             curr = (MaterialMovement.objects
-                    .filter(company=company, movement_type="ف بيع", movement_date__gte=curr_start)
+                    .filter(company=company, movement_kind=MovementKind.SALE, movement_date__gte=curr_start)
                     .aggregate(revenue=Sum("total_out")))
             prev = (MaterialMovement.objects
-                    .filter(company=company, movement_type="ف بيع",
+                    .filter(company=company, movement_kind=MovementKind.SALE,
                             movement_date__gte=prev_start, movement_date__lt=prev_end)
                     .aggregate(revenue=Sum("total_out")))
             curr_rev = float(curr["revenue"] or 0)
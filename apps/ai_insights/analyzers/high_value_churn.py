@@ -50,6 +50,7 @@ from datetime import date, timedelta
 from django.db.models import Count, Max, Sum, Q
 from django.db.models.functions import TruncMonth
 
+from apps.transactions.classification import MovementKind
 from apps.ai_insights.client import AIClient, AIClientError
 
 logger = logging.getLogger(__name__)
@@ -243,7 +244,7 @@ class HighValueChurnDetector:
             MaterialMovement.objects
             .filter(
                 company=company,
-                movement_type="ف بيع",
+                movement_kind=MovementKind.SALE,
                 movement_date__gte=period_from,
             )
             .exclude(Q(customer_name__isnull=True) | Q(customer_name=""))
@@ -259,7 +260,7 @@ class HighValueChurnDetector:
             MaterialMovement.objects
             .filter(
                 company=company,
-                movement_type="ف بيع",
+                movement_kind=MovementKind.SALE,
                 movement_date__gte=period_from,
             )
             .exclude(Q(customer_name__isnull=True) | Q(customer_name=""))
@@ -13,6 +13,7 @@ from collections import defaultdict
 from django.db.models import Count, Sum, Q
 from django.db.models.functions import TruncMonth
 
+from apps.transactions.classification import MovementKind
 from apps.ai_insights.client import AIClient, AIClientError
 
 logger = logging.getLogger(__name__)
@@ -76,24 +77,32 @@ class Predictor:
     # ── History fetch ─────────────────────────────────────────────────────────
 
     def _fetch_monthly_history(self, company) -> list:
-        from apps.transactions.models import MaterialMovement
+        from apps.kpi.models import DailySalesFact, MonthlySalesFact
         today      = date.today()
-        start_date = today.replace(day=1) - timedelta(days=HISTORY_MONTHS * 31)
+        start_date = (today.replace(day=1) - timedelta(days=HISTORY_MONTHS * 31)).replace(day=1)
         rows = (
-            MaterialMovement.objects
-            .filter(company=company, movement_type="ف بيع", movement_date__gte=start_date)
-            .exclude(Q(customer_name__isnull=True) | Q(customer_name=""))
-            .annotate(month=TruncMonth("movement_date"))
+            MonthlySalesFact.objects
+            .filter(company=company, movement_kind=MovementKind.SALE,
+                    has_customer=True, month__gte=start_date)
             .values("month")
-            .annotate(revenue=Sum("total_out"), transaction_count=Count("id"),
-                      unique_customers=Count("customer_name", distinct=True))
+            .annotate(revenue=Sum("total_out"), transaction_count=Sum("line_count"))
             .order_by("month")
         )
+        # Distinct customers do not add up across months: counted on the daily facts
+        customers = dict(
+            DailySalesFact.objects
+            .filter(company=company, movement_kind=MovementKind.SALE, date__gte=start_date)
+            .exclude(Q(customer_name__isnull=True) | Q(customer_name=""))
+            .annotate(month=TruncMonth("date"))
+            .values("month")
+            .annotate(unique_customers=Count("customer_name", distinct=True))
+            .values_list("month", "unique_customers")
+        )
         return [{"t": i, "year": r["month"].year, "month": r["month"].month,
                  "period": f"{MONTH_NAMES[r['month'].month]} {r['month'].year}",
                  "revenue_lyd": float(r["revenue"] or 0),
                  "transaction_count": r["transaction_count"] or 0,
-                 "unique_customers": r["unique_customers"] or 0}
+                 "unique_customers": customers.get(r["month"], 0)}
                 for i, r in enumerate(rows)]
 
     # ── Seasonality ───────────────────────────────────────────────────────────
@@ -245,14 +254,14 @@ class Predictor:
     # ── Customer forecast ─────────────────────────────────────────────────────
 
     def _forecast_customers(self, company) -> list:
-        from apps.transactions.models import MaterialMovement
+        from apps.kpi.models import DailySalesFact
         today = date.today()
         rows = (
-            MaterialMovement.objects
-            .filter(company=company, movement_type="ف بيع",
-                    movement_date__gte=today - timedelta(days=90))
+            DailySalesFact.objects
+            .filter(company=company, movement_kind=MovementKind.SALE,
+                    date__gte=today - timedelta(days=90))
             .exclude(Q(customer_name__isnull=True) | Q(customer_name=""))
-            .annotate(month=TruncMonth("movement_date"))
+            .annotate(month=TruncMonth("date"))
             .values("month").annotate(unique_customers=Count("customer_name", distinct=True))
             .order_by("month")
         )
@@ -13,6 +13,7 @@ from statistics import mean, stdev
 from django.db.models import Sum, Q
 from django.db.models.functions import TruncMonth, TruncDate
 
+from apps.transactions.classification import MovementKind
 from apps.ai_insights.client import AIClient, AIClientError
 
 logger = logging.getLogger(__name__)
@@ -87,14 +88,14 @@ class SeasonalAnalyzer:
     # ── Monthly series ────────────────────────────────────────────────────────
 
     def _build_monthly_series(self, company) -> list:
-        from apps.transactions.models import MaterialMovement
+        from apps.kpi.models import DailySalesFact
         today      = date.today()
         start_date = today.replace(day=1) - timedelta(days=HISTORY_MONTHS * 30)
         rows = (
-            MaterialMovement.objects
-            .filter(company=company, movement_type="ف بيع", movement_date__gte=start_date)
+            DailySalesFact.objects
+            .filter(company=company, movement_kind=MovementKind.SALE, date__gte=start_date)
             .exclude(Q(customer_name__isnull=True) | Q(customer_name=""))
-            .annotate(month=TruncMonth("movement_date"))
+            .annotate(month=TruncMonth("date"))
             .values("month").annotate(revenue=Sum("total_out"))
             .order_by("month")
         )
@@ -172,7 +173,7 @@ class SeasonalAnalyzer:
         Ramadan show a deviation from the average seasonal index.
         Returns a dict with detected effects.
         """
-        from apps.transactions.models import MaterialMovement
+        from apps.kpi.models import DailySalesFact
 
         effects = {}
         years_in_data = set(r["year"] for r in series)
@@ -184,9 +185,9 @@ class SeasonalAnalyzer:
 
             # Revenue during Ramadan month vs same month prior year
             ramadan_rev = (
-                MaterialMovement.objects
-                .filter(company=company, movement_type="ف بيع",
-                        movement_date__gte=start, movement_date__lte=end)
+                DailySalesFact.objects
+                .filter(company=company, movement_kind=MovementKind.SALE,
+                        date__gte=start, date__lte=end)
                 .aggregate(total=Sum("total_out"))
             )
             daily_avg_ramadan = float(ramadan_rev["total"] or 0) / RAMADAN_DURATION_DAYS
@@ -194,9 +195,9 @@ class SeasonalAnalyzer:
             # Prior 30 days baseline
             prior_start = start - timedelta(days=30)
             prior_rev   = (
-                MaterialMovement.objects
-                .filter(company=company, movement_type="ف بيع",
-                        movement_date__gte=prior_start, movement_date__lt=start)
+                DailySalesFact.objects
+                .filter(company=company, movement_kind=MovementKind.SALE,
+                        date__gte=prior_start, date__lt=start)
                 .aggregate(total=Sum("total_out"))
             )
             daily_avg_prior = float(prior_rev["total"] or 0) / 30
@@ -268,13 +269,13 @@ class SeasonalAnalyzer:
 
     def _compute_category_patterns(self, company) -> list:
         try:
-            from apps.transactions.models import MaterialMovement
+            from apps.kpi.models import DailySalesFact
             today      = date.today()
             start_date = today.replace(day=1) - timedelta(days=HISTORY_MONTHS * 30)
             rows = (
-                MaterialMovement.objects
-                .filter(company=company, movement_type="ف بيع", movement_date__gte=start_date)
-                .annotate(month=TruncMonth("movement_date"))
+                DailySalesFact.objects
+                .filter(company=company, movement_kind=MovementKind.SALE, date__gte=start_date)
+                .annotate(month=TruncMonth("date"))
                 .values("month", "category")
                 .annotate(revenue=Sum("total_out"))
                 .order_by("category", "month")
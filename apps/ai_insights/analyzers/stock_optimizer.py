@@ -17,6 +17,7 @@ from collections import defaultdict
 from django.db.models import Count, Sum, Avg, Min, Max, Q, F
 from django.db.models.functions import TruncDate
 
+from apps.transactions.classification import ANY_PURCHASE_KINDS, MovementKind
 from apps.ai_insights.client import AIClient, AIClientError
 
 logger = logging.getLogger(__name__)
@@ -139,7 +140,7 @@ class StockOptimizer:
 
         sales = (
             MaterialMovement.objects
-            .filter(company=company, movement_type="ف بيع", movement_date__gte=start_date)
+            .filter(company=company, movement_kind=MovementKind.SALE, movement_date__gte=start_date)
             .values("material_code", "material_name")
             .annotate(
                 total_revenue=Sum("total_out"),
@@ -156,7 +157,7 @@ class StockOptimizer:
         if not using_real_stock:
             purchases = dict(
                 MaterialMovement.objects
-                .filter(company=company, movement_type__contains="شراء",
+                .filter(company=company, movement_kind__in=ANY_PURCHASE_KINDS,
                         movement_date__gte=start_date)
                 .values("material_code")
                 .annotate(total_qty_in=Sum("qty_in"))
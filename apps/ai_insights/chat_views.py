@@ -275,6 +275,7 @@ class BusinessContextBuilder:
     def _add_sales_context(self, company, lines):
         """Read live sales data for current month."""
         try:
+            from apps.transactions.classification import MovementKind
             from apps.transactions.models import MaterialMovement
             from django.db.models import Sum, Count, Q
             from datetime import timedelta
@@ -283,7 +284,7 @@ class BusinessContextBuilder:
             m_start = today.replace(day=1)
             ytd_start = date(today.year, 1, 1)
 
-            base = MaterialMovement.objects.filter(company=company, movement_type="ف بيع")
+            base = MaterialMovement.objects.filter(company=company, movement_kind=MovementKind.SALE)
             mtd  = base.filter(movement_date__gte=m_start).aggregate(rev=Sum("total_out"), txns=Count("id"))
             ytd  = base.filter(movement_date__gte=ytd_start).aggregate(rev=Sum("total_out"))
 
@@ -216,7 +216,7 @@ class CustomerAgingView(APIView):
         from apps.aging.models import AgingReceivable
         from apps.aging.serializers import AgingReceivableSerializer
 
-        records = AgingReceivable.objects.filter(
+        records = AgingReceivable.live.filter(
             company=request.user.company,
             customer=customer,
         ).order_by("-created_at")
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ImportLog
+from .models import ImportLog, UploadSession
 
 
 @admin.register(ImportLog)
@@ -43,3 +43,24 @@ class ImportLogAdmin(admin.ModelAdmin):
             "fields": ("started_at", "completed_at"),
         }),
     )
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = [
+        "original_filename", "status", "file_size", "chunk_size",
+        "created_by", "company", "created_at",
+    ]
+    list_filter = ["company", "status"]
+    search_fields = ["original_filename", "created_by__username"]
+    readonly_fields = [
+        "id", "company", "created_by", "original_filename",
+        "file_size", "chunk_size", "file_type", "load_method", "force",
+        "spool_path", "received_chunks", "status", "import_log",
+        "created_at", "updated_at",
+    ]
+    ordering = ["-created_at"]
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False  # Sessions are opened through the upload API only
@@ -0,0 +1,155 @@
+"""
+apps/data_import/converters.py
+
+Cell converters used by the Excel parsers.
+
+    to_str()      — NFC-normalised, stripped string ("" for None)
+    to_decimal()  — Decimal quantized to 4 places (default for blanks / junk)
+    to_date()     — date from a date/datetime cell or a text date
+    row_converter() — per-file converter of a whole row
+
+Spreadsheet columns are highly repetitive (movement types, branch names,
+categories, prices), so the expensive steps are memoized: NFC
+normalisation of non-ASCII text, float → Decimal and text-date parsing.
+Whole numbers skip the str() round trip altogether.
+
+A parser describes the columns it reads once per file:
+
+    convert = row_converter([
+        (1, to_str,     ""),      # (column index, converter, value when the
+        (6, to_decimal, None),    #  row is too short to have the column)
+    ])
+    code, qty = convert(row)
+
+which replaces repeated ``f(row[i]) if len(row) > i else default`` checks
+with one itemgetter call and a length test per row.
+"""
+
+import unicodedata
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Callable, Optional, Sequence, Tuple
+
+# Entries kept per memoized converter; plenty for the distinct values of a
+# file's low-cardinality columns while bounding worker memory.
+CACHE_SIZE = 1 << 16
+
+_QUANTUM = Decimal("0.0001")
+_ZERO = Decimal("0")
+
+
+# ── Strings ──────────────────────────────────────────────────────────────────
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _normalize_text(text: str) -> str:
+    return unicodedata.normalize("NFC", text).strip()
+
+
+def to_str(value: Any) -> str:
+    """
+    Convert any cell value to a clean string.
+
+    Applies:
+      - NFC Unicode normalisation  (handles composed/decomposed Arabic)
+      - str.strip()                (removes ALL Unicode whitespace, including
+                                    U+0020 regular space and U+00A0 non-breaking)
+
+    This is the single, authoritative string-cleaning helper used by every
+    parser.  All movement-type values must go through here so that cells
+    like 'ف بيع ' (with a trailing space) are stored as 'ف بيع'.
+    """
+    if value is None:
+        return ""
+    text = value if type(value) is str else str(value)
+    if text.isascii():
+        # NFC leaves ASCII unchanged
+        return text.strip()
+    return _normalize_text(text)
+
+
+def to_str_or_none(value: Any) -> Optional[str]:
+    return to_str(value) or None
+
+
+# ── Numbers ──────────────────────────────────────────────────────────────────
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _float_to_decimal(value: float) -> Decimal:
+    # str() keeps the shortest repr (0.1 → "0.1"), as Excel displays it
+    return Decimal(str(value)).quantize(_QUANTUM)
+
+
+def to_decimal(value: Any, default: Decimal = _ZERO) -> Decimal:
+    if value is None or value == "":
+        return default
+    try:
+        kind = type(value)
+        if kind is int:
+            return Decimal(value).quantize(_QUANTUM)
+        if kind is float:
+            return _float_to_decimal(value)
+        return Decimal(str(value)).quantize(_QUANTUM)
+    except (InvalidOperation, TypeError):
+        return default
+
+
+# ── Dates ────────────────────────────────────────────────────────────────────
+
+_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y")
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_date(text: str) -> Optional[date]:
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def to_date(value: Any) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return _parse_date(str(value).strip())
+
+
+# ── Rows ─────────────────────────────────────────────────────────────────────
+
+def row_converter(
+    columns: Sequence[Tuple[int, Callable[[Any], Any], Any]],
+) -> Callable[[Sequence], tuple]:
+    """
+    Compile a converter for rows of one file.
+
+    *columns* lists (index, converter, missing) triples; the returned
+    function maps a row to the tuple of converted cells, in that order.
+    ``missing`` is used as is (not converted) when the row is too short to
+    have the column, as openpyxl may yield for trailing empty cells.
+    """
+    columns = list(columns)
+    indexes = [index for index, _, _ in columns]
+    converters = tuple(convert for _, convert, _ in columns)
+    width = max(indexes) + 1
+    if len(indexes) == 1:
+        only = indexes[0]
+        pick = lambda row: (row[only],)  # noqa: E731
+    else:
+        pick = itemgetter(*indexes)
+
+    def convert(row: Sequence) -> tuple:
+        if len(row) >= width:
+            return tuple([f(v) for f, v in zip(converters, pick(row))])
+        size = len(row)
+        return tuple([
+            f(row[index]) if index < size else missing
+            for index, f, missing in columns
+        ])
+
+    return convert
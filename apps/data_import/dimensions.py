@@ -0,0 +1,135 @@
+"""
+apps/data_import/dimensions.py
+
+In-memory dimension lookups for the movement importer.
+
+The company's products, all branches and the company's customers are
+loaded once into dicts keyed by a normalised code / name, so resolving a
+movement row's foreign keys costs no query.  Product codes are matched
+exactly (NFC, trimmed: Product is unique per company and code); branch
+and customer names loosely (normalize_key).  Products and branches that
+are missing are created in bulk, one INSERT per chunk of rows.
+
+Usage:
+    dims = DimensionMaps(company)                       # 3 queries
+    dims.ensure_products({"1141001": {"product_name": "...", ...}})
+    dims.ensure_branches(["فرع الكريمية"])
+    dims.product_id("1141001"), dims.branch_id("فرع الكريمية"), dims.customer_id("...")
+"""
+
+import unicodedata
+from typing import Dict, Iterable, Optional
+
+from django.db import transaction
+
+
+def normalize_key(value) -> str:
+    """
+    Lookup key for a code or name: NFC, trimmed, inner whitespace collapsed
+    to single spaces and case-folded.
+    """
+    if value is None:
+        return ""
+    return " ".join(unicodedata.normalize("NFC", str(value)).split()).casefold()
+
+
+def normalize_code(value) -> str:
+    """
+    Lookup key for a product code: NFC and trimmed only — codes differing
+    by case or inner spacing are distinct products.
+    """
+    if value is None:
+        return ""
+    return unicodedata.normalize("NFC", str(value)).strip()
+
+
+class DimensionMaps:
+
+    def __init__(self, company):
+        from apps.branches.models import Branch
+        from apps.customers.models import Customer
+        from apps.products.models import Product
+
+        self.company = company
+
+        # NFC, trimmed product_code → Product id
+        self._products: Dict[str, object] = {}
+        for pk, code in (
+            Product.objects.filter(company=company)
+            .order_by("product_code")
+            .values_list("id", "product_code")
+        ):
+            self._products.setdefault(normalize_code(code), pk)
+
+        # normalised branch name → Branch id
+        self._branches: Dict[str, object] = {}
+        for pk, name in Branch.objects.order_by("name").values_list("id", "name"):
+            self._branches.setdefault(normalize_key(name), pk)
+
+        # normalised customer name → Customer id (first account code wins
+        # when two customers share a name)
+        self._customers: Dict[str, object] = {}
+        for pk, name in (
+            Customer.objects.filter(company=company)
+            .order_by("account_code")
+            .values_list("id", "name")
+        ):
+            self._customers.setdefault(normalize_key(name), pk)
+
+    # ── Lookups ───────────────────────────────────────────────────────────────
+
+    def product_id(self, code: str) -> Optional[object]:
+        return self._products.get(normalize_code(code))
+
+    def branch_id(self, name: str) -> Optional[object]:
+        return self._branches.get(normalize_key(name))
+
+    def customer_id(self, name: str) -> Optional[object]:
+        return self._customers.get(normalize_key(name))
+
+    # ── Bulk creation ─────────────────────────────────────────────────────────
+
+    def ensure_products(self, products: Dict[str, Dict]) -> int:
+        """
+        Create the products of *products* (code → field values) that are not
+        known yet.  Returns the number of codes that were missing.
+        """
+        from apps.products.models import Product
+
+        missing = {}
+        for code, values in products.items():
+            key = normalize_code(code)
+            if key and key not in self._products and key not in missing:
+                missing[key] = Product(company=self.company, product_code=code, **values)
+        if not missing:
+            return 0
+
+        with transaction.atomic():
+            Product.objects.bulk_create(missing.values(), ignore_conflicts=True)
+        # ignore_conflicts leaves the instances' ids unreliable → re-read them
+        for pk, code in Product.objects.filter(
+            company=self.company,
+            product_code__in=[p.product_code for p in missing.values()],
+        ).values_list("id", "product_code"):
+            self._products.setdefault(normalize_code(code), pk)
+        return len(missing)
+
+    def ensure_branches(self, names: Iterable[str]) -> int:
+        """Create the branches of *names* that are not known yet."""
+        from apps.branches.models import Branch
+
+        missing = {}
+        for name in names:
+            key = normalize_key(name)
+            if key and key not in self._branches and key not in missing:
+                missing[key] = Branch(name=name, is_active=True)
+        if not missing:
+            return 0
+
+        with transaction.atomic():
+            Branch.objects.bulk_create(missing.values(), ignore_conflicts=True)
+        for pk, name in Branch.objects.filter(
+            name__in=[b.name for b in missing.values()],
+        ).values_list("id", "name"):
+            self._branches.setdefault(normalize_key(name), pk)
+        return len(missing)
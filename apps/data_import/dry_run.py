@@ -0,0 +1,105 @@
+"""
+apps/data_import/dry_run.py
+
+Validation-only imports.
+
+POST /api/import/upload/ with dry_run=true runs the workbook through the
+same conversion and validation as a real import, without writing a
+single row, and answers with a workbook of the rows that would be
+rejected — the original cells followed by the Excel row number and the
+error.  Users fix their file from it instead of by trial-and-error
+imports, each of which replaces the company's data.
+
+Usage:
+    result = validate_upload(file_obj, filename, company, user)
+    with tempfile.TemporaryFile() as fh:
+        write_error_workbook(result, fh)
+"""
+
+from typing import Any, Dict, Iterable
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.styles import Font
+
+from .parsers.excel_parser import parse_excel_file
+
+ROW_HEADER = "Excel row"
+ERROR_HEADER = "Error"
+
+
+def validate_upload(
+    file_obj,
+    filename: str,
+    company,
+    user=None,
+    file_type: str = None,
+    allowed_types: Iterable[str] = None,
+) -> Dict:
+    """
+    Convert and validate every row of *file_obj* without writing anything.
+
+    Returns the parser result (the counts the import would report, all of
+    its errors with the failing rows' cells) plus "header_row".  Raises
+    ValueError / PermissionError like parse_excel_file().
+    """
+    extra_context: Dict = {
+        "user":     user,
+        "filename": filename,
+        "dry_run":  True,
+    }
+    result = parse_excel_file(
+        file_obj=file_obj,
+        filename=filename,
+        company=company,
+        file_type=file_type,
+        extra_context=extra_context,
+        allowed_types=set(allowed_types) if allowed_types is not None else None,
+    )
+    result["header_row"] = extra_context.get("header_row")
+    return result
+
+
+def write_error_workbook(result: Dict, fh) -> int:
+    """
+    Write the failing rows of a validate_upload() result to *fh* as xlsx,
+    in file order.  File-level errors (row 0) come first, without cells.
+    Returns the number of error rows written.
+    """
+    errors = sorted(result.get("errors") or [], key=lambda e: e.get("row") or 0)
+    header = list(result.get("header_row") or ())
+    # Every row gets the same width so the row / error columns line up
+    width = max([len(header)] + [len(e.get("cells") or ()) for e in errors])
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Errors")
+    bold = Font(bold=True)
+
+    title = [_cell(ws, value, bold) for value in header]
+    title += [WriteOnlyCell(ws) for _ in range(width - len(header))]
+    title += [_cell(ws, ROW_HEADER, bold), _cell(ws, ERROR_HEADER, bold)]
+    ws.append(title)
+
+    for entry in errors:
+        cells = list(entry.get("cells") or ())
+        cells += [None] * (width - len(cells))
+        ws.append(
+            [_cell(ws, value) for value in cells]
+            + [_cell(ws, entry.get("row") or None), _cell(ws, entry.get("error", ""))]
+        )
+
+    wb.save(fh)
+    return len(errors)
+
+
+def _cell(ws, value: Any, font: Font = None) -> WriteOnlyCell:
+    """A cell holding *value* verbatim: text is never read as a formula."""
+    if isinstance(value, str):
+        value = ILLEGAL_CHARACTERS_RE.sub("", value)
+    cell = WriteOnlyCell(ws, value=value)
+    if isinstance(value, str):
+        cell.data_type = "s"
+    if font:
+        cell.font = font
+    return cell
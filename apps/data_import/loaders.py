@@ -0,0 +1,175 @@
+"""
+apps/data_import/loaders.py
+
+Bulk row loaders used by the Excel parsers.
+
+A loader receives plain tuples whose values follow the ``fields`` order
+given at construction time and writes them to the model's table:
+
+    OrmLoader   — bulk_create(), works on every database backend.
+    CopyLoader  — PostgreSQL ``COPY ... FROM STDIN`` through psycopg2's
+                  copy_expert(); rows are streamed, never materialised
+                  as model instances.
+
+Columns that are not listed in ``fields`` are filled the same way the ORM
+would fill them: callable defaults (UUID primary keys) per row, auto_now /
+auto_now_add timestamps and constant defaults once per load.
+
+Usage:
+    loader = get_loader(MaterialMovement, ["company_id", "material_code", ...], "copy")
+    loader.load(rows)           # → number of rows written
+"""
+
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Iterator, List, Sequence
+
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class OrmLoader:
+    """Writes rows with Model.objects.bulk_create()."""
+
+    method = "orm"
+
+    def __init__(self, model, fields: Sequence[str]):
+        self.model = model
+        self.fields = list(fields)
+
+    def load(self, rows: Iterable[tuple]) -> int:
+        objs = [self.model(**dict(zip(self.fields, row))) for row in rows]
+        self.model.objects.bulk_create(objs)
+        return len(objs)
+
+
+class CopyLoader(OrmLoader):
+    """Streams rows into ``COPY <table> (<columns>) FROM STDIN`` (text format)."""
+
+    method = "copy"
+
+    def __init__(self, model, fields: Sequence[str]):
+        super().__init__(model, fields)
+        meta = model._meta
+        given = [meta.get_field(name) for name in self.fields]
+        given_names = {f.name for f in given}
+
+        # Columns the caller did not provide → filled like the ORM would.
+        # Values are appended after the caller's tuple in this order:
+        # per-row defaults first, then per-load defaults.
+        per_row_fields, per_load_fields = [], []
+        self._per_row_defaults = []   # callables evaluated for every row
+        self._per_load_defaults = []  # callables evaluated once per load()
+        for field in meta.concrete_fields:
+            if field.name in given_names:
+                continue
+            if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False):
+                per_load_fields.append(field)
+                self._per_load_defaults.append(timezone.now)
+            elif field.has_default() and callable(field.default):
+                per_row_fields.append(field)
+                self._per_row_defaults.append(field.default)
+            elif field.has_default():
+                per_load_fields.append(field)
+                self._per_load_defaults.append(lambda value=field.get_default(): value)
+
+        quote = connection.ops.quote_name
+        self._sql = "COPY {} ({}) FROM STDIN".format(
+            quote(meta.db_table),
+            ", ".join(quote(f.column) for f in given + per_row_fields + per_load_fields),
+        )
+
+    def load(self, rows: Iterable[tuple]) -> int:
+        counter = [0]
+        stream = _CopyStream(self._lines(rows, counter))
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, "copy_expert"):
+                raw.copy_expert(self._sql, stream, size=_CopyStream.CHUNK_SIZE)
+            else:  # psycopg 3
+                with raw.copy(self._sql) as copy:
+                    while True:
+                        data = stream.read(_CopyStream.CHUNK_SIZE)
+                        if not data:
+                            break
+                        copy.write(data)
+        return counter[0]
+
+    def _lines(self, rows: Iterable[tuple], counter: List[int]) -> Iterator[str]:
+        per_load = tuple(make() for make in self._per_load_defaults)
+        per_row = self._per_row_defaults
+        for row in rows:
+            values = tuple(row) + tuple(make() for make in per_row) + per_load
+            counter[0] += 1
+            yield "\t".join(_copy_value(v) for v in values) + "\n"
+
+
+class _CopyStream:
+    """Minimal read()-only file object fed by a generator of COPY lines."""
+
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, lines: Iterator[str]):
+        self._lines = lines
+        self._buffer = bytearray()
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line.encode("utf-8")
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
+def _copy_value(value) -> str:
+    """Format one value for the COPY text format."""
+    if value is None:
+        return r"\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, Decimal):
+        return format(value, "f")
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    text = str(value)
+    if "\\" in text or "\t" in text or "\n" in text or "\r" in text:
+        text = (
+            text.replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r")
+        )
+    return text
+
+
+LOADERS = {
+    "orm": OrmLoader,
+    "copy": CopyLoader,
+}
+
+
+def get_loader(model, fields: Sequence[str], method: str = "orm") -> OrmLoader:
+    """
+    Return a loader for *model*.
+
+    ``method="copy"`` silently falls back to the ORM loader on backends
+    other than PostgreSQL, so callers never need to check the vendor.
+    """
+    cls = LOADERS.get(method)
+    if not cls:
+        raise ValueError(f"Unknown load method: '{method}'")
+    if cls is CopyLoader and connection.vendor != "postgresql":
+        logger.info(
+            "[get_loader] COPY requested on '%s' backend — using the ORM loader.",
+            connection.vendor,
+        )
+        cls = OrmLoader
+    return cls(model, fields)
@@ -0,0 +1,65 @@
+"""
+apps/data_import/locks.py
+
+Per-company, per-file-type import lock.
+
+Two imports of the same kind for the same company must not run at once:
+both would replace the same date range (movements) or snapshot year
+(inventory, aging) and could interleave their deletes and inserts.
+Imports for different companies, or of different file types, are
+independent and keep running in parallel.
+
+The lock is a PostgreSQL session-level advisory lock, taken without
+waiting (pg_try_advisory_lock) on a dedicated connection: the import
+itself may close and reopen the default connection (see parallel.py)
+without releasing it.  The server releases it if the worker dies.  On
+other databases the lock is a no-op.
+
+Usage:
+    with import_lock(company.id, "movements") as acquired:
+        if not acquired:
+            ...                 # another import is running → try later
+"""
+
+import hashlib
+import logging
+from contextlib import contextmanager
+from typing import Iterator
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+
+def lock_key(company_id, file_type: str) -> int:
+    """Signed 64-bit advisory lock key for (company, file_type)."""
+    digest = hashlib.blake2b(
+        f"data_import:{company_id}:{file_type or ''}".encode("utf-8"), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+@contextmanager
+def import_lock(company_id, file_type: str) -> Iterator[bool]:
+    """
+    Try to take the import lock of (company_id, file_type) and yield
+    whether it was acquired; it is released when the block exits.
+    """
+    if connections[DEFAULT_DB_ALIAS].vendor != "postgresql":
+        yield True
+        return
+
+    key = lock_key(company_id, file_type)
+    lock_conn = connections.create_connection(DEFAULT_DB_ALIAS)
+    try:
+        with lock_conn.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", [key])
+            acquired = cursor.fetchone()[0]
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with lock_conn.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", [key])
+    finally:
+        lock_conn.close()
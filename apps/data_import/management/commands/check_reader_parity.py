@@ -0,0 +1,70 @@
+"""
+apps/data_import/management/commands/check_reader_parity.py
+
+Reads workbooks with every reader backend and checks that the parsers
+would receive identical row tuples.
+
+Usage:
+    python manage.py check_reader_parity samples/*.xlsx
+    python manage.py check_reader_parity samples/ --max-diffs 5
+
+Exits with an error when any file differs, so it can run in CI over the
+sample workbook corpus.
+"""
+
+import os
+from itertools import zip_longest
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.data_import.readers import calamine_available, get_reader
+
+
+def _read_all(path, backend):
+    # Rows are compared untrimmed: a missing trailing cell reaches the
+    # parsers as the row_converter default, not as an empty value.
+    with open(path, "rb") as fh, get_reader(fh, backend) as reader:
+        return [tuple(r) for r in reader.rows()]
+
+
+class Command(BaseCommand):
+    help = "Compare the calamine and openpyxl workbook readers on sample files."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Workbooks or directories of workbooks.")
+        parser.add_argument("--max-diffs", type=int, default=10, help="Differences shown per file.")
+
+    def handle(self, *args, **options):
+        if not calamine_available():
+            raise CommandError("python-calamine is not installed — nothing to compare.")
+
+        files = []
+        for path in options["paths"]:
+            if os.path.isdir(path):
+                files += sorted(
+                    os.path.join(path, name) for name in os.listdir(path)
+                    if name.lower().endswith(".xlsx")
+                )
+            else:
+                files.append(path)
+
+        failed = 0
+        for path in files:
+            expected = _read_all(path, "openpyxl")
+            actual = _read_all(path, "calamine")
+            diffs = [
+                (idx, a, b)
+                for idx, (a, b) in enumerate(zip_longest(expected, actual), start=1)
+                if a != b
+            ]
+            if not diffs:
+                self.stdout.write(self.style.SUCCESS(f"OK    {path} ({len(expected)} rows)"))
+                continue
+
+            failed += 1
+            self.stdout.write(self.style.ERROR(f"DIFF  {path} ({len(diffs)} rows differ)"))
+            for idx, a, b in diffs[:options["max_diffs"]]:
+                self.stdout.write(f"      row {idx}:\n        openpyxl: {a!r}\n        calamine: {b!r}")
+
+        if failed:
+            raise CommandError(f"{failed} of {len(files)} workbook(s) differ between readers.")
@@ -0,0 +1,29 @@
+"""
+apps/data_import/management/commands/purge_deleted_snapshots.py
+
+Purges every inventory / aging snapshot marked deleted whose background
+purge has not run (e.g. the task was lost while the worker was down).
+
+Usage:
+    python manage.py purge_deleted_snapshots
+    python manage.py purge_deleted_snapshots --batch-size 2000
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.data_import.purge import pending_purges, purge_snapshot
+
+
+class Command(BaseCommand):
+    help = "Purge the lines of deleted inventory and aging snapshots."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None, help="Lines deleted per batch.")
+
+    def handle(self, *args, **options):
+        count = 0
+        for label, snapshot_id in list(pending_purges()):
+            lines = purge_snapshot(label, snapshot_id, options["batch_size"])
+            self.stdout.write(f"{label} {snapshot_id}: {lines} lines purged.")
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"{count} snapshot(s) purged."))
@@ -0,0 +1,37 @@
+"""
+apps/data_import/management/commands/purge_upload_sessions.py
+
+Deletes the chunked upload sessions left open without a new chunk for
+DATA_IMPORT_UPLOAD_SESSION_TTL seconds, with their spooled files, and
+fails the imports left PROCESSING past the task time limit — what the
+hourly purge_upload_sessions task does, for deployments without celery
+beat.
+
+Usage:
+    python manage.py purge_upload_sessions
+    python manage.py purge_upload_sessions --max-age 3600
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.data_import.services import fail_stale_imports, purge_stale_upload_sessions
+
+
+class Command(BaseCommand):
+    help = "Delete abandoned chunked upload sessions and their spooled files."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-age", type=int, default=None,
+            help="Seconds without a chunk (default: DATA_IMPORT_UPLOAD_SESSION_TTL).",
+        )
+
+    def handle(self, *args, **options):
+        max_age = timedelta(seconds=options["max_age"]) if options["max_age"] is not None else None
+        failed = fail_stale_imports()
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} interrupted import(s) marked failed."))
+        count = purge_stale_upload_sessions(max_age)
+        self.stdout.write(self.style.SUCCESS(f"{count} upload session(s) purged."))
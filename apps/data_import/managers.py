@@ -0,0 +1,29 @@
+"""
+apps/data_import/managers.py
+
+Managers of the snapshot models purged in the background (inventory and
+aging, see purge.py): rows marked deleted are hidden from the moment they
+are marked, before their purge runs.
+
+Snapshots use LiveSnapshotManager as `objects`.  Line models keep a plain
+default manager: most line queries are already scoped to a live snapshot
+(snapshot.lines, filter(snapshot=...)) and filtering on the snapshot's
+deleted_at would join the snapshot table into every one of them.  The
+others go through the `live` manager (LiveLineManager).
+"""
+
+from django.db import models
+
+
+class LiveSnapshotManager(models.Manager):
+    """Default manager: hides snapshots marked deleted and awaiting purge."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class LiveLineManager(models.Manager):
+    """`live` manager: hides the lines of snapshots marked deleted (joins the snapshot)."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(snapshot__deleted_at__isnull=True)
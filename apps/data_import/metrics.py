@@ -0,0 +1,128 @@
+"""
+apps/data_import/metrics.py
+
+Throughput instrumentation for Excel imports.
+
+An ImportMetrics instance is passed to the parsers in
+extra_context["metrics"]; the time spent in each phase is accumulated
+and stored on the ImportLog as import_context["metrics"]:
+
+    read      — pulling rows out of the workbook
+    convert   — parsing / converting / validating cells (the remainder of
+                the parser's time once every other phase is accounted for)
+    dimensions — resolving and creating products, branches, customers
+    delete    — removing the rows being replaced
+    insert    — bulk writes (staging, upserts, promotion inserts)
+    post      — work after the rows are written (deactivation, refreshing
+                the KPI rollups, finalising the log)
+
+Timings are wall-clock seconds.  With parallel ingestion (parallel.py)
+the workers' convert / dimensions / insert times are summed across
+processes, so phases may add up to more than total_seconds.
+
+Usage:
+    metrics = ImportMetrics()
+    rows = metrics.timed_iter(rows, "read")
+    with metrics.phase("insert"):
+        ...
+    log.import_context["metrics"] = metrics.as_dict(row_count)
+
+    with phase(extra_context, "delete"):       # no-op without metrics
+        ...
+"""
+
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, Iterator, Optional
+
+PHASES = ("read", "convert", "dimensions", "delete", "insert", "post")
+
+# Phases measured directly; "convert" is what the parser spent elsewhere
+MEASURED_PHASES = tuple(p for p in PHASES if p != "convert")
+
+
+class ImportMetrics:
+
+    def __init__(self):
+        self.timings: Dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - start
+
+    @contextmanager
+    def parsing(self):
+        """Wrap a parser call: the time no other phase claims is "convert"."""
+        start = time.perf_counter()
+        measured = self._measured()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            inner = self._measured() - measured
+            self.timings["convert"] += max(0.0, elapsed - inner)
+
+    def _measured(self) -> float:
+        return sum(self.timings[name] for name in MEASURED_PHASES)
+
+    def add(self, timings: Dict[str, float]) -> None:
+        """Add timings measured elsewhere (e.g. in a worker process)."""
+        for name, seconds in timings.items():
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def timed_iter(self, iterable: Iterable, name: str = "read") -> Iterator:
+        """Yield from *iterable*, charging the time spent in next() to *name*."""
+        iterator = iter(iterable)
+        clock = time.perf_counter
+        while True:
+            start = clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.timings[name] += clock() - start
+                return
+            self.timings[name] += clock() - start
+            yield item
+
+    def as_dict(self, row_count: int) -> Dict:
+        total = time.perf_counter() - self._started
+        return {
+            "timings":         {name: round(seconds, 3) for name, seconds in self.timings.items()},
+            "total_seconds":   round(total, 3),
+            "rows_per_second": round(row_count / total, 1) if total > 0 else None,
+            "peak_memory_mb":  peak_memory_mb(),
+        }
+
+
+def phase(extra_context: Optional[Dict], name: str):
+    """metrics.phase(name) if extra_context carries metrics, else a no-op."""
+    metrics = (extra_context or {}).get("metrics")
+    return metrics.phase(name) if metrics else nullcontext()
+
+
+def peak_memory_mb() -> Optional[float]:
+    """
+    Peak resident set size of this process and of its finished child
+    processes (parallel ingestion workers), in MB.  None where the
+    resource module is unavailable (Windows).
+
+    This is the peak since the process started: for a long-lived Celery
+    worker it can reflect an earlier, larger import.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.4 on 2026-10-16 18:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0004_company_city_company_country_company_current_erp'),
+        ('data_import', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importlog',
+            name='file_hash',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='File SHA-256'),
+        ),
+        migrations.AddIndex(
+            model_name='importlog',
+            index=models.Index(fields=['company', 'file_hash'], name='data_import_company_841f8f_idx'),
+        ),
+    ]
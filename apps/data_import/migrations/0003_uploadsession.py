@@ -0,0 +1,44 @@
+# Generated by Django 5.0.4 on 2026-10-16 18:28
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0004_company_city_company_country_company_current_erp'),
+        ('data_import', '0002_importlog_file_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('original_filename', models.CharField(max_length=500, verbose_name='Original Filename')),
+                ('file_size', models.BigIntegerField(verbose_name='File Size (bytes)')),
+                ('chunk_size', models.PositiveIntegerField(verbose_name='Chunk Size (bytes)')),
+                ('file_type', models.CharField(blank=True, choices=[('branches', 'Branches'), ('customers', 'Customers'), ('movements', 'Material Movements'), ('inventory', 'Inventory Snapshot'), ('aging', 'Aging Receivables')], default='', max_length=30, verbose_name='File Type')),
+                ('load_method', models.CharField(blank=True, default='', max_length=10, verbose_name='Load Method')),
+                ('force', models.BooleanField(default=False, verbose_name='Force Re-import')),
+                ('spool_path', models.CharField(max_length=1000, verbose_name='Spool Path')),
+                ('received_chunks', models.JSONField(blank=True, default=list, help_text='Sorted indexes of the chunks written so far.', verbose_name='Received Chunks')),
+                ('status', models.CharField(choices=[('open', 'Open'), ('completed', 'Completed'), ('aborted', 'Aborted')], default='open', max_length=20, verbose_name='Status')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='companies.company', verbose_name='Company')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL, verbose_name='Created By')),
+                ('import_log', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload_sessions', to='data_import.importlog', verbose_name='Import Log')),
+            ],
+            options={
+                'verbose_name': 'Upload Session',
+                'verbose_name_plural': 'Upload Sessions',
+                'db_table': 'data_import_upload_session',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
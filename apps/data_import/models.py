@@ -61,6 +61,15 @@ class ImportLog(models.Model):
         verbose_name="Status",
     )
 
+    # SHA-256 of the uploaded workbook, used to skip re-imports of a file
+    # that was already imported successfully.
+    file_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default="",
+        verbose_name="File SHA-256",
+    )
+
     row_count = models.PositiveIntegerField(
         default=0,
         verbose_name="Rows Processed",
@@ -98,9 +107,111 @@ class ImportLog(models.Model):
         verbose_name = "Import Log"
         verbose_name_plural = "Import Logs"
         ordering = ["-started_at"]
+        indexes = [
+            models.Index(fields=["company", "file_hash"]),
+        ]
 
     def __str__(self):
         return (
             f"[{self.file_type}] {self.original_filename} "
             f"— {self.status} ({self.success_count}/{self.row_count} rows)"
         )
+
+
+class UploadSession(models.Model):
+    """
+    A chunked upload in progress (see upload_views.py).
+
+    The file is pre-allocated in DATA_IMPORT_SPOOL_DIR at init; every chunk
+    is written in place at index * chunk_size, so chunks may arrive in any
+    order and a dropped connection only costs the chunk that was in flight.
+    On completion the spooled file is handed to the import task by path.
+    """
+
+    class SessionStatus(models.TextChoices):
+        OPEN = "open", "Open"
+        COMPLETED = "completed", "Completed"
+        ABORTED = "aborted", "Aborted"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    company = models.ForeignKey(
+        "companies.Company",
+        on_delete=models.CASCADE,
+        related_name="upload_sessions",
+        verbose_name="Company",
+    )
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="upload_sessions",
+        verbose_name="Created By",
+    )
+
+    original_filename = models.CharField(max_length=500, verbose_name="Original Filename")
+    file_size = models.BigIntegerField(verbose_name="File Size (bytes)")
+    chunk_size = models.PositiveIntegerField(verbose_name="Chunk Size (bytes)")
+
+    # Import options chosen at init, applied on completion
+    file_type = models.CharField(
+        max_length=30,
+        choices=ImportLog.FileType.choices,
+        blank=True,
+        default="",
+        verbose_name="File Type",
+    )
+    load_method = models.CharField(max_length=10, blank=True, default="", verbose_name="Load Method")
+    force = models.BooleanField(default=False, verbose_name="Force Re-import")
+
+    spool_path = models.CharField(max_length=1000, verbose_name="Spool Path")
+    received_chunks = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name="Received Chunks",
+        help_text="Sorted indexes of the chunks written so far.",
+    )
+
+    status = models.CharField(
+        max_length=20,
+        choices=SessionStatus.choices,
+        default=SessionStatus.OPEN,
+        verbose_name="Status",
+    )
+
+    import_log = models.ForeignKey(
+        ImportLog,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="upload_sessions",
+        verbose_name="Import Log",
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
+
+    class Meta:
+        db_table = "data_import_upload_session"
+        verbose_name = "Upload Session"
+        verbose_name_plural = "Upload Sessions"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return (
+            f"{self.original_filename} — {self.status} "
+            f"({len(self.received_chunks)}/{self.total_chunks} chunks)"
+        )
+
+    @property
+    def total_chunks(self) -> int:
+        return max(1, -(-self.file_size // self.chunk_size))
+
+    def chunk_length(self, index: int) -> int:
+        """Expected byte length of chunk *index* (the last one may be shorter)."""
+        return min(self.chunk_size, self.file_size - index * self.chunk_size)
+
+    @property
+    def missing_chunks(self) -> list:
+        received = set(self.received_chunks)
+        return [i for i in range(self.total_chunks) if i not in received]
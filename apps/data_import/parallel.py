@@ -0,0 +1,129 @@
+"""
+apps/data_import/parallel.py
+
+Process pool used to ingest very large movement files.
+
+The importing process keeps reading the workbook and hands chunks of raw
+rows to worker processes, which convert, validate and write them to
+MaterialMovementStage exactly like the sequential path
+(MovementsParser.load_chunk).  Each worker opens its own database
+connection and keeps its DimensionMaps for the whole import.  The staged
+batch is still promoted by the importing process in one transaction, so
+the file commits atomically whatever the number of workers.
+
+billiard (Celery's fork of multiprocessing) is used instead of
+multiprocessing: Celery prefork workers are daemonic processes, which
+multiprocessing does not allow to start children.
+
+The pool can only start outside any transaction: the importing process
+closes its connections before forking (see imap_bounded), which would
+abort a transaction the caller holds open.  Callers check
+in_atomic_block() first and import sequentially instead.
+
+Usage:
+    for result in imap_bounded(load_movement_chunk, args_iter, workers=4):
+        ...                     # results arrive in submission order
+"""
+
+import logging
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+# Per-worker state, keyed by staged batch id: (company, dims, convert, loader)
+_WORKER_STATE: Dict = {}
+
+
+def in_atomic_block() -> bool:
+    """Whether any open database connection is inside transaction.atomic()."""
+    from django.db import connections
+
+    return any(conn.in_atomic_block for conn in connections.all(initialized_only=True))
+
+
+def _init_worker() -> None:
+    import django
+
+    django.setup()
+    # Never reuse a connection inherited from the parent process
+    from django.db import connections
+
+    for conn in connections.all(initialized_only=True):
+        conn.connection = None
+    _WORKER_STATE.clear()
+
+
+def load_movement_chunk(company_id, batch_id, load_method: str, chunk) -> Dict:
+    """Worker entry point: stage one chunk of movement rows."""
+    from apps.companies.models import Company
+    from apps.data_import.converters import row_converter
+    from apps.data_import.dimensions import DimensionMaps
+    from apps.data_import.loaders import get_loader
+    from apps.data_import.metrics import ImportMetrics
+    from apps.data_import.parsers.excel_parser import MovementsParser
+    from apps.transactions.models import MaterialMovementStage
+
+    parser = MovementsParser()
+    state = _WORKER_STATE.get(batch_id)
+    if state is None:
+        company = Company.objects.get(id=company_id)
+        state = _WORKER_STATE[batch_id] = (
+            company,
+            DimensionMaps(company),
+            row_converter(parser.COLUMNS),
+            get_loader(MaterialMovementStage, ("batch_id",) + parser.FIELDS, load_method),
+        )
+    company, dims, convert, loader = state
+    # Phase timings travel back with the result (see metrics.py)
+    metrics = ImportMetrics()
+    with metrics.parsing():
+        result = parser.load_chunk(
+            chunk, company, dims, convert, loader, batch_id, {"metrics": metrics},
+        )
+    result["timings"] = metrics.timings
+    return result
+
+
+def imap_bounded(
+    func: Callable,
+    args_iter: Iterable[tuple],
+    workers: int,
+    max_pending: int = None,
+) -> Iterator:
+    """
+    Run func(*args) for every args tuple on a pool of *workers* processes
+    and yield the results in submission order.
+
+    At most *max_pending* calls (default 2 per worker) are in flight, so
+    the input is consumed only as fast as the workers keep up and never
+    held in memory as a whole.  A worker exception is re-raised here;
+    closing the generator early terminates the pool.
+
+    Raises RuntimeError inside transaction.atomic(): the connections are
+    closed before forking and the caller's transaction would be lost.
+    """
+    from billiard import get_context
+    from django.db import connections
+
+    if in_atomic_block():
+        raise RuntimeError("imap_bounded() cannot run inside transaction.atomic().")
+
+    max_pending = max_pending or 2 * workers
+    # Children are forked: give them no open connection to inherit
+    for conn in connections.all(initialized_only=True):
+        conn.close()
+    pool = get_context().Pool(workers, initializer=_init_worker)
+    logger.info("[imap_bounded] %d worker processes started.", workers)
+    pending = deque()
+    try:
+        for args in args_iter:
+            pending.append(pool.apply_async(func, args))
+            if len(pending) >= max_pending:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
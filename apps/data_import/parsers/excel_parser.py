@@ -1,12 +1,31 @@
+import hashlib
 import logging
 import re
-import unicodedata
-from datetime import date, datetime
+import uuid
+from datetime import date
 from decimal import Decimal, InvalidOperation
-from typing import Any, Dict, List, Optional, Set
-
-import openpyxl
-from django.db import transaction
+from itertools import chain, islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+# Raised at the import task's soft time limit, wherever the import is:
+# the row and batch handlers below re-raise it instead of recording an error.
+from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+from django.db import connection, transaction
+
+from apps.data_import.converters import (
+    row_converter,
+    to_date,
+    to_decimal,
+    to_str,
+    to_str_or_none,
+)
+from apps.data_import.dimensions import DimensionMaps
+from apps.data_import.loaders import get_loader
+from apps.data_import.metrics import phase
+from apps.data_import.purge import discard_snapshots
+from apps.data_import.readers import get_reader
+from apps.transactions.classification import is_cash_customer, movement_kind, name_key
 
 logger = logging.getLogger(__name__)
 
@@ -28,40 +47,12 @@ FILENAME_HINTS = {
 }
 
 
-def _to_decimal(value: Any, default: Decimal = Decimal("0")) -> Decimal:
-    if value is None or value == "":
-        return default
-    try:
-        return Decimal(str(value)).quantize(Decimal("0.0001"))
-    except (InvalidOperation, TypeError):
-        return default
-
-
-def _to_str(value: Any) -> str:
-    """
-    Convert any cell value to a clean string.
-
-    Applies:
-      - NFC Unicode normalisation  (handles composed/decomposed Arabic)
-      - str.strip()                (removes ALL Unicode whitespace, including
-                                    U+0020 regular space and U+00A0 non-breaking)
-
-    This is the single, authoritative string-cleaning helper used by every
-    parser in this module.  All movement-type values must go through here so
-    that cells like 'ف بيع ' (with a trailing space) are stored as 'ف بيع'.
-    """
-    if value is None:
-        return ""
-    s = unicodedata.normalize("NFC", str(value))
-    return s.strip()
-
-
 def _is_number(value: Any) -> bool:
     if value is None:
         return False
     if isinstance(value, (int, float, Decimal)):
         return True
-    txt = _to_str(value)
+    txt = to_str(value)
     if not txt:
         return False
     try:
@@ -71,21 +62,6 @@ def _is_number(value: Any) -> bool:
         return False
 
 
-def _to_date(value: Any) -> Optional[date]:
-    if value is None:
-        return None
-    if isinstance(value, datetime):
-        return value.date()
-    if isinstance(value, date):
-        return value
-    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y"):
-        try:
-            return datetime.strptime(str(value).strip(), fmt).date()
-        except ValueError:
-            continue
-    return None
-
-
 def _extract_account_code(account_str: str) -> Optional[str]:
     if not account_str:
         return None
@@ -94,6 +70,157 @@ def _extract_account_code(account_str: str) -> Optional[str]:
     return code if code.isdigit() else None
 
 
+def _iter_chunks(iterable: Iterable, size: int) -> Iterator[List]:
+    """Yield successive lists of at most *size* items from *iterable*."""
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _field_error(model, values: Dict[str, Any]) -> Optional[str]:
+    """
+    Check converted values against the model's column limits in Python.
+
+    Returns a human-readable error for the first value that the database
+    would reject (string longer than max_length, number with too many
+    digits), or None when every value fits.  Catching these before the
+    INSERT keeps a single bad cell from failing a whole bulk batch.
+    """
+    for name, value in values.items():
+        if value is None:
+            continue
+        field = model._meta.get_field(name)
+        max_length = getattr(field, "max_length", None)
+        if max_length and isinstance(value, str) and len(value) > max_length:
+            return f"{field.verbose_name}: value longer than {max_length} characters."
+        if isinstance(value, Decimal) and getattr(field, "max_digits", None):
+            int_digits = field.max_digits - field.decimal_places
+            if value.adjusted() >= int_digits:
+                return f"{field.verbose_name}: {value} exceeds {int_digits} integer digits."
+    return None
+
+
+def _row_error(row_number: int, error: str, row=None, dry_run: bool = False) -> Dict:
+    """
+    Error entry of one Excel row.  In a dry run the row's raw cells are
+    kept as well, for the workbook of failing rows (see dry_run.py).
+    """
+    entry = {"row": row_number, "error": error}
+    if dry_run and row is not None:
+        entry["cells"] = tuple(row)
+    return entry
+
+
+def _bulk_insert(loader, batch: List[tuple], errors: List[Dict]) -> int:
+    """
+    Write a batch of (row_number, values) pairs with a single loader call.
+
+    When the batch is rejected, replay it row by row inside savepoints so
+    that only the failing rows are dropped and each one is reported in
+    *errors* with its Excel row number.  Returns the number of rows saved.
+    """
+    try:
+        with transaction.atomic():
+            return loader.load(values for _, values in batch)
+    except SoftTimeLimitExceeded:
+        raise
+    except Exception:
+        logger.warning(
+            "[%s] Bulk %s load of %d rows failed — retrying row by row.",
+            loader.model.__name__, loader.method, len(batch),
+        )
+
+    saved = 0
+    for row_number, values in batch:
+        try:
+            with transaction.atomic():
+                saved += loader.load([values])
+        except SoftTimeLimitExceeded:
+            raise
+        except Exception as e:
+            errors.append({"row": row_number, "error": str(e)})
+    return saved
+
+
+_MOVEMENT_HASH_FIELDS = (
+    "material_code", "movement_type", "category", "lab_code", "material_name",
+    "qty_in", "price_in", "total_in", "qty_out", "price_out", "total_out",
+    "balance_price", "customer_name",
+)
+
+
+def _movement_hash(movement_date: date, values: Dict, branch_name: str, refs: tuple) -> str:
+    """
+    Fingerprint of a movement row: 128-bit BLAKE2b over the movement date,
+    the raw branch name, every imported value and the resolved
+    (product_id, branch_id, customer_id).  Decimals are normalised so
+    that 5, 5.0 and 5.0000 hash alike.
+
+    The ids are part of the fingerprint so that a re-import replaces rows
+    whose references changed (e.g. a customer imported since), instead of
+    pairing them with their stale live copy.
+    """
+    parts = [movement_date.isoformat(), branch_name or ""]
+    parts += ["" if ref is None else str(ref) for ref in refs]
+    for name in _MOVEMENT_HASH_FIELDS:
+        value = values[name]
+        if value is None:
+            parts.append("")
+        elif isinstance(value, Decimal):
+            parts.append(format(value.normalize(), "f"))
+        else:
+            parts.append(str(value))
+    return hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _report_progress(extra_context: Dict, processed: int, succeeded: int) -> None:
+    """Forward chunk progress to the caller's extra_context["progress"] callback."""
+    progress = extra_context.get("progress")
+    if progress:
+        progress(processed, succeeded)
+
+
+def _bulk_upsert(
+    model, batch: List[tuple], unique_fields: List[str], update_fields: List[str], errors: List[Dict],
+) -> int:
+    """
+    Upsert a batch of (row_number, instance) pairs with a single
+    bulk_create(update_conflicts=True).
+
+    Falls back to row-by-row savepoints like _bulk_insert() when the batch
+    is rejected.  Returns the number of rows written.
+    """
+    options = {
+        "update_conflicts": True,
+        "unique_fields": unique_fields,
+        "update_fields": update_fields,
+    }
+    try:
+        with transaction.atomic():
+            return len(model.objects.bulk_create([obj for _, obj in batch], **options))
+    except SoftTimeLimitExceeded:
+        raise
+    except Exception:
+        logger.warning(
+            "[%s] Bulk upsert of %d rows failed — retrying row by row.",
+            model.__name__, len(batch),
+        )
+
+    saved = 0
+    for row_number, obj in batch:
+        try:
+            with transaction.atomic():
+                saved += len(model.objects.bulk_create([obj], **options))
+        except SoftTimeLimitExceeded:
+            raise
+        except Exception as e:
+            errors.append({"row": row_number, "error": str(e)})
+    return saved
+
+
 def detect_file_type(filename: str, header_row: tuple) -> Optional[str]:
     filename_lower = filename.lower()
     for file_type, hints in FILENAME_HINTS.items():
@@ -103,7 +230,7 @@ def detect_file_type(filename: str, header_row: tuple) -> Optional[str]:
     if not header_row:
         return None
 
-    header_joined = " ".join(_to_str(h) for h in header_row if h is not None)
+    header_joined = " ".join(to_str(h) for h in header_row if h is not None)
     for file_type, keywords in HEADER_FINGERPRINTS.items():
         if all(kw in header_joined for kw in keywords):
             return file_type
@@ -112,106 +239,304 @@ def detect_file_type(filename: str, header_row: tuple) -> Optional[str]:
 
 
 class BranchesParser:
-    def parse(self, rows: List, company, extra_context=None) -> Dict:
+    """
+    Upserts branches by name with one INSERT ... ON CONFLICT DO UPDATE per
+    batch.  Existing names are loaded once to split created / updated.
+    """
+
+    BATCH_SIZE = 1000
+    UPDATE_FIELDS = ["address", "phone", "is_active", "updated_at"]
+
+    def parse(self, rows: Iterable, company, extra_context=None) -> Dict:
         from apps.branches.models import Branch
 
-        data_rows = [r for r in rows[1:] if r and r[0] is not None]
-        created = updated = 0
+        dry_run = (extra_context or {}).get("dry_run", False)
+        rows = iter(rows)
+        next(rows, None)  # header
+        data_rows = (r for r in rows if r and r[0] is not None)
+        total = created = updated = 0
         errors = []
 
+        with phase(extra_context, "dimensions"):
+            existing_names = set(Branch.objects.values_list("name", flat=True))
+        convert = row_converter([
+            (0, to_str, ""),    # name
+            (1, to_str, None),  # address
+            (2, to_str, None),  # phone
+        ])
+        # name → (row, Branch): a repeated name keeps its last row, as the
+        # successive update_or_create() calls used to.
+        pending: Dict[str, tuple] = {}
+
         for i, row in enumerate(data_rows, start=2):
+            total += 1
             try:
-                with transaction.atomic():
-                    branch_name = _to_str(row[0])
-                    if not branch_name:
-                        continue
-                    _, was_created = Branch.objects.update_or_create(
-                        name=branch_name,
-                        defaults={
-                            "address": _to_str(row[1]) if len(row) > 1 else None or None,
-                            "phone": _to_str(row[2]) if len(row) > 2 else None or None,
-                            "is_active": True,
-                        },
-                    )
-                    created += was_created
-                    updated += not was_created
+                branch_name, address, phone = convert(row)
+                if not branch_name:
+                    continue
+                branch = Branch(
+                    name=branch_name,
+                    address=address,
+                    phone=phone,
+                    is_active=True,
+                )
+                error = _field_error(Branch, {"name": branch.name, "phone": branch.phone})
+                if error:
+                    errors.append(_row_error(i, error, row, dry_run))
+                    continue
+
+                if branch_name in existing_names or branch_name in pending:
+                    updated += 1
+                else:
+                    created += 1
+                pending[branch_name] = (i, branch)
+            except SoftTimeLimitExceeded:
+                raise
             except Exception as e:
-                errors.append({"row": i, "error": str(e)})
+                errors.append(_row_error(i, str(e), row, dry_run))
+
+        if not dry_run:
+            with phase(extra_context, "insert"):
+                for chunk in _iter_chunks(pending.values(), self.BATCH_SIZE):
+                    _bulk_upsert(Branch, chunk, ["name"], self.UPDATE_FIELDS, errors)
 
-        return {"total": len(data_rows), "created": created, "updated": updated, "errors": errors}
+        return {"total": total, "created": created, "updated": updated, "errors": errors}
 
 
 class CustomersParser:
-    def parse(self, rows: List, company, extra_context=None) -> Dict:
+    """
+    Upserts customers on (company, account_code) with one
+    INSERT ... ON CONFLICT DO UPDATE per batch, then deactivates — in a
+    single UPDATE — the company's customers that are missing from the file.
+    """
+
+    BATCH_SIZE = 1000
+    UPDATE_FIELDS = ["name", "address", "area_code", "phone", "email", "is_active", "updated_at"]
+
+    def parse(self, rows: Iterable, company, extra_context=None) -> Dict:
         from apps.customers.models import Customer
 
-        data_rows = [r for r in rows[1:] if r and r[0] is not None]
-        created = updated = 0
+        dry_run = (extra_context or {}).get("dry_run", False)
+        rows = iter(rows)
+        next(rows, None)  # header
+        data_rows = (r for r in rows if r and r[0] is not None)
+        total = created = updated = 0
         errors = []
         seen_codes: Set[str] = set()
 
+        with phase(extra_context, "dimensions"):
+            existing_codes = set(
+                Customer.objects.filter(company=company).values_list("account_code", flat=True)
+            )
+        # account_code → (row, Customer): a repeated code keeps its last row.
+        pending: Dict[str, tuple] = {}
+        # name, account code, address, area code, phone, email
+        convert = row_converter([(idx, to_str, "") for idx in range(6)])
+
         for i, row in enumerate(data_rows, start=2):
+            total += 1
             try:
-                with transaction.atomic():
-                    customer_name = _to_str(row[0])
-                    account_code = _to_str(row[1]) if len(row) > 1 else ""
-                    address = _to_str(row[2]) if len(row) > 2 else ""
-                    area_code = _to_str(row[3]) if len(row) > 3 else ""
-                    phone = _to_str(row[4]) if len(row) > 4 else ""
-                    email = _to_str(row[5]) if len(row) > 5 else ""
-
-                    if not customer_name:
-                        continue
-                    if not account_code:
-                        account_code = f"AUTO-{i}"
-
-                    _, was_created = Customer.objects.update_or_create(
-                        company=company,
-                        account_code=account_code,
-                        defaults={
-                            "name": customer_name,
-                            "address": address or None,
-                            "area_code": area_code or None,
-                            "phone": phone or None,
-                            "email": email or None,
-                            "is_active": True,
-                        },
-                    )
-                    seen_codes.add(account_code)
-                    created += was_created
-                    updated += not was_created
+                customer_name, account_code, address, area_code, phone, email = convert(row)
+
+                if not customer_name:
+                    continue
+                if not account_code:
+                    account_code = f"AUTO-{i}"
+                # Recorded before validation: a row that fails to import
+                # must not get its customer deactivated.
+                seen_codes.add(account_code)
+
+                customer = Customer(
+                    company=company,
+                    account_code=account_code,
+                    name=customer_name,
+                    address=address or None,
+                    area_code=area_code or None,
+                    phone=phone or None,
+                    email=email or None,
+                    is_active=True,
+                )
+                error = _field_error(Customer, {
+                    "account_code": account_code,
+                    "name": customer_name,
+                    "area_code": customer.area_code,
+                    "phone": customer.phone,
+                    "email": customer.email,
+                })
+                if error:
+                    errors.append(_row_error(i, error, row, dry_run))
+                    continue
+
+                if account_code in existing_codes or account_code in pending:
+                    updated += 1
+                else:
+                    created += 1
+                pending[account_code] = (i, customer)
+            except SoftTimeLimitExceeded:
+                raise
             except Exception as e:
-                errors.append({"row": i, "error": str(e)})
+                errors.append(_row_error(i, str(e), row, dry_run))
+
+        if not dry_run:
+            with phase(extra_context, "insert"):
+                for chunk in _iter_chunks(pending.values(), self.BATCH_SIZE):
+                    _bulk_upsert(
+                        Customer, chunk, ["company", "account_code"], self.UPDATE_FIELDS, errors,
+                    )
+
+        # ── Deactivate customers no longer present in the file ───────────────
+        deactivated = 0
+        if seen_codes:
+            with phase(extra_context, "post"):
+                missing = (
+                    Customer.objects.filter(company=company, is_active=True)
+                    .exclude(account_code__in=seen_codes)
+                )
+                # A dry run only reports how many would be deactivated
+                deactivated = missing.count() if dry_run else missing.update(is_active=False)
 
         return {
-            "total": len(data_rows),
+            "total": total,
             "created": created,
             "updated": updated,
+            "deactivated": deactivated,
             "errors": errors,
         }
 
 
 class MovementsParser:
-    BATCH_SIZE = 500
+    """
+    Imports a حركة المادة file into MaterialMovement rows.
+
+    Rows are consumed as a stream, BATCH_SIZE at a time: each chunk is
+    validated and converted in Python, then written through a bulk loader
+    (bulk_create or PostgreSQL COPY, see loaders.py).  If a batch is
+    rejected by the database, that batch alone is replayed row by row so
+    the offending rows are reported individually.
+
+    Existing movements in the file's date range are replaced, without
+    readers ever seeing a partial file: rows are first loaded into
+    MaterialMovementStage under a fresh batch id, then promoted in one
+    short transaction.
+
+    Promotion is incremental.  Every row carries a content_hash of its
+    natural key, values and resolved references; the live range and the staged batch are
+    matched on (content_hash, occurrence number) so that identical
+    duplicate lines pair up one to one.  Only unmatched live rows are
+    deleted and only unmatched staged rows are inserted — re-importing a
+    cumulative yearly file leaves the unchanged months alone.
+
+    Products, branches and customers are resolved through DimensionMaps
+    (preloaded once per import); the chunk's missing products and branches
+    are created in bulk before its movements are written.
+
+    Very large files can be ingested by a pool of worker processes (see
+    parallel.py and _workers()): the chunks are then converted and staged
+    concurrently, each worker over its own database connection, while
+    promotion stays a single transaction in the calling process.
+    """
 
-    def parse(self, rows: List, company, extra_context=None) -> Dict:
-        from apps.transactions.models import MaterialMovement
-        from apps.products.models import Product
-        from apps.branches.models import Branch
-        from apps.customers.models import Customer
+    BATCH_SIZE = 2000
+
+    # Column order of the tuples handed to the loader.
+    FIELDS = (
+        "company_id", "product_id", "branch_id", "customer_id", "movement_date",
+        "category", "material_code", "lab_code", "material_name", "movement_type",
+        "qty_in", "price_in", "total_in", "qty_out", "price_out", "total_out",
+        "balance_price", "customer_name",
+        "movement_kind", "is_cash_customer", "material_name_key",   # classification.py
+        "content_hash",
+    )
+
+    AMOUNT_FIELDS = (
+        "qty_in", "price_in", "total_in", "qty_out", "price_out", "total_out",
+        "balance_price",
+    )
+
+    # (column, converter, value when the row is too short) — see row_converter
+    COLUMNS = (
+        (0, to_str_or_none, None),      # category
+        (1, to_str, ""),                # material_code
+        (2, to_str_or_none, None),      # lab_code
+        (3, to_str, ""),                # material_name
+        (4, to_date, None),             # movement_date
+        (5, to_str, ""),                # movement_type
+        *((idx, to_decimal, None) for idx in range(6, 13)),   # AMOUNT_FIELDS
+        (13, to_str, ""),               # branch name
+        (14, to_str_or_none, None),     # customer_name
+    )
+
+    def parse(self, rows: Iterable, company, extra_context=None) -> Dict:
+        from apps.transactions.models import MaterialMovementStage
+
+        extra_context = extra_context or {}
+        if extra_context.get("dry_run"):
+            # Validation only: nothing is staged, promoted or created
+            return self._parse(rows, company, extra_context, None, None)
+
+        batch_id = uuid.uuid4()
+        loader = get_loader(
+            MaterialMovementStage, ("batch_id",) + self.FIELDS,
+            extra_context.get("load_method", "orm"),
+        )
+        try:
+            return self._parse(rows, company, extra_context, loader, batch_id)
+        finally:
+            with phase(extra_context, "post"):
+                MaterialMovementStage.objects.filter(batch_id=batch_id).delete()
 
-        data_rows = [r for r in rows[1:] if r and len(r) > 1 and r[1] is not None]
+    def _parse(self, rows, company, extra_context, loader, batch_id) -> Dict:
+        from apps.transactions.models import MaterialMovement
 
-        file_dates: List[date] = []
-        parsed: List[tuple] = []
+        rows = iter(rows)
+        next(rows, None)  # header
+        data_rows = (r for r in rows if r and len(r) > 1 and r[1] is not None)
+        chunks = _iter_chunks(enumerate(data_rows, start=2), self.BATCH_SIZE)
 
-        for i, row in enumerate(data_rows, start=2):
-            d = _to_date(row[4]) if len(row) > 4 else None
-            parsed.append((i, row, d))
-            if d is not None:
-                file_dates.append(d)
+        total = created = 0
+        errors = []
+        date_from: Optional[date] = None
+        date_to: Optional[date] = None
+
+        dry_run = extra_context.get("dry_run", False)
+        workers = 1 if dry_run else self._workers(extra_context)
+        if workers > 1:
+            # Chunks are converted and staged by a process pool, each worker
+            # over its own connection; results come back in file order.
+            from apps.data_import.parallel import imap_bounded, load_movement_chunk
+
+            results = imap_bounded(
+                load_movement_chunk,
+                ((company.id, batch_id, loader.method, chunk) for chunk in chunks),
+                workers,
+            )
+        else:
+            dims = None
+            if not dry_run:
+                with phase(extra_context, "dimensions"):
+                    dims = DimensionMaps(company)
+            convert = row_converter(self.COLUMNS)
+            results = (
+                self.load_chunk(chunk, company, dims, convert, loader, batch_id, extra_context)
+                for chunk in chunks
+            )
 
-        if not file_dates:
+        try:
+            for result in results:
+                total += result["total"]
+                created += result["created"]
+                errors += result["errors"]
+                if result.get("timings") and extra_context.get("metrics"):
+                    extra_context["metrics"].add(result["timings"])
+                if result["date_from"] is not None:
+                    lo, hi = result["date_from"], result["date_to"]
+                    date_from = lo if date_from is None else min(date_from, lo)
+                    date_to = hi if date_to is None else max(date_to, hi)
+                _report_progress(extra_context, total, created)
+        finally:
+            results.close()
+
+        if date_from is None:
             return {
                 "total": 0,
                 "created": 0,
@@ -219,97 +544,271 @@ class MovementsParser:
                 "errors": [{"row": 0, "error": "No valid dates found in file."}],
             }
 
-        date_from = min(file_dates)
-        date_to = max(file_dates)
-
-        product_cache: Dict[str, Optional[Product]] = {}
-        branch_cache: Dict[str, Optional[Branch]] = {}
-        customer_cache: Dict[str, Optional[Customer]] = {}
+        date_range = {"from": str(date_from), "to": str(date_to)}
+        if dry_run:
+            return {
+                "total": total,
+                "created": created,
+                "updated": 0,
+                "date_range": date_range,
+                "errors": errors,
+            }
 
-        created = 0
-        errors = []
+        inserted, removed = self._promote(
+            MaterialMovement, company, batch_id, date_from, date_to, extra_context,
+        )
+        return {
+            "total": total,
+            "created": inserted,
+            "updated": 0,
+            "inserted": inserted,
+            "unchanged": created - inserted,
+            "removed": removed,
+            "date_range": date_range,
+            "deleted_existing": removed,
+            "errors": errors,
+        }
 
-        with transaction.atomic():
-            deleted_count, _ = MaterialMovement.objects.filter(
-                company=company,
-                movement_date__gte=date_from,
-                movement_date__lte=date_to,
-            ).delete()
+    @staticmethod
+    def _workers(extra_context: Dict) -> int:
+        """
+        Worker processes for this file: extra_context["workers"], else
+        settings.DATA_IMPORT_WORKERS once the sheet declares at least
+        DATA_IMPORT_PARALLEL_MIN_ROWS rows (a pool is not worth starting
+        for smaller files).  Always 1 inside transaction.atomic(), e.g. an
+        eager task run within a request transaction: starting the pool
+        closes the connections (see parallel.py).
+        """
+        from apps.data_import.parallel import in_atomic_block
+
+        workers = extra_context.get("workers")
+        if not workers:
+            expected = extra_context.get("expected_rows") or 0
+            if expected < getattr(settings, "DATA_IMPORT_PARALLEL_MIN_ROWS", 200000):
+                return 1
+            workers = getattr(settings, "DATA_IMPORT_WORKERS", 1)
+        if workers > 1 and in_atomic_block():
+            logger.warning(
+                "[MovementsParser] Inside a transaction: importing with 1 process "
+                "instead of %d.", workers,
+            )
+            return 1
+        return workers
+
+    def load_chunk(self, chunk, company, dims, convert, loader, batch_id, extra_context=None) -> Dict:
+        """
+        Convert, validate and stage one chunk of (row number, row) pairs.
+
+        The chunk's unknown products and branches are created first.
+        Returns the chunk's row count, staged count, errors and date span.
+        In a dry run the chunk is only validated: its staged count is the
+        number of valid rows.
+        """
+        from apps.transactions.models import MaterialMovement
+        from apps.branches.models import Branch
 
-        for i, row, movement_date in parsed:
+        dry_run = (extra_context or {}).get("dry_run", False)
+        errors = []
+        parsed: List[tuple] = []   # (row, movement_date, values, branch_name)
+        chunk_dates: List[date] = []
+
+        for i, row in chunk:
+            (
+                category, material_code, lab_code, material_name, movement_date,
+                movement_type, *amounts, branch_name, customer_name,
+            ) = convert(row)
+            if movement_date is not None:
+                chunk_dates.append(movement_date)
             try:
-                with transaction.atomic():
-                    material_code = _to_str(row[1])
-                    if not material_code or movement_date is None:
-                        if movement_date is None and material_code:
-                            errors.append({"row": i, "error": f"Invalid date: {row[4]}"})
-                        continue
+                if not material_code or movement_date is None:
+                    if movement_date is None and material_code:
+                        raw_date = row[4] if len(row) > 4 else None
+                        errors.append(_row_error(i, f"Invalid date: {raw_date}", row, dry_run))
+                    continue
 
-                    # ── FIX: explicit .strip() on movement_type ──────────────
-                    # _to_str already calls .strip(), but we add an extra
-                    # explicit call here as a belt-and-suspenders guard.
-                    # Some Excel files (e.g. حركة_المادة_الشنت) store the cell
-                    # value as 'ف بيع ' (trailing space).  Without this guard
-                    # those rows are stored with the space and never match
-                    # queries for 'ف بيع', causing branches to vanish from charts.
-                    movement_type = _to_str(row[5]).strip() if len(row) > 5 else ""
-
-                    if material_code not in product_cache:
-                        product_cache[material_code] = Product.objects.filter(
-                            company=company, product_code=material_code
-                        ).first()
-
-                    raw_branch_name = _to_str(row[13]) if len(row) > 13 else ""
-                    branch = None
-                    if raw_branch_name:
-                        if raw_branch_name not in branch_cache:
-                            branch_obj, _ = Branch.objects.get_or_create(
-                                name=raw_branch_name,
-                                defaults={"is_active": True},
-                            )
-                            branch_cache[raw_branch_name] = branch_obj
-                        branch = branch_cache.get(raw_branch_name)
-
-                    customer_name = _to_str(row[14]) if len(row) > 14 else ""
-                    if customer_name and customer_name not in customer_cache:
-                        customer_cache[customer_name] = Customer.objects.filter(
-                            company=company,
-                            name__icontains=customer_name[:50],
-                        ).first()
-
-                    MaterialMovement.objects.create(
-                        company=company,
-                        product=product_cache.get(material_code),
-                        category=_to_str(row[0]) or None,
-                        material_code=material_code,
-                        lab_code=_to_str(row[2]) or None,
-                        material_name=_to_str(row[3]),
-                        movement_date=movement_date,
-                        movement_type=movement_type,   # guaranteed stripped
-                        qty_in=_to_decimal(row[6]) if len(row) > 6 else None,
-                        price_in=_to_decimal(row[7]) if len(row) > 7 else None,
-                        total_in=_to_decimal(row[8]) if len(row) > 8 else None,
-                        qty_out=_to_decimal(row[9]) if len(row) > 9 else None,
-                        price_out=_to_decimal(row[10]) if len(row) > 10 else None,
-                        total_out=_to_decimal(row[11]) if len(row) > 11 else None,
-                        balance_price=_to_decimal(row[12]) if len(row) > 12 else None,
-                        branch=branch,
-                        customer_name=customer_name or None,
-                        customer=customer_cache.get(customer_name),
-                    )
-                    created += 1
+                # to_str() strips every cell, movement_type included:
+                # some Excel files (e.g. حركة_المادة_الشنت) store it as
+                # 'ف بيع ' (trailing space), and such rows would never
+                # match queries for 'ف بيع', causing branches to vanish
+                # from charts.
+                values = {
+                    "category":      category,
+                    "material_code": material_code,
+                    "lab_code":      lab_code,
+                    "material_name": material_name,
+                    "movement_type": movement_type,   # guaranteed stripped
+                    "customer_name": customer_name,
+                    # Derived columns the KPI queries filter on
+                    "movement_kind":     movement_kind(movement_type),
+                    "is_cash_customer":  is_cash_customer(customer_name),
+                    "material_name_key": name_key(material_name),
+                }
+                values.update(zip(self.AMOUNT_FIELDS, amounts))
+                error = _field_error(MaterialMovement, values)
+                if not error and branch_name:
+                    error = _field_error(Branch, {"name": branch_name})
+                if error:
+                    errors.append(_row_error(i, error, row, dry_run))
+                    continue
+                parsed.append((i, movement_date, values, branch_name))
+            except SoftTimeLimitExceeded:
+                raise
             except Exception as e:
-                errors.append({"row": i, "error": str(e)})
+                errors.append(_row_error(i, str(e), row, dry_run))
+
+        if dry_run:
+            return {
+                "total":     len(chunk),
+                "created":   len(parsed),
+                "errors":    errors,
+                "date_from": min(chunk_dates) if chunk_dates else None,
+                "date_to":   max(chunk_dates) if chunk_dates else None,
+            }
 
+        # ── Dimensions: create the chunk's unknown products / branches ──
+        with phase(extra_context, "dimensions"):
+            dims.ensure_products({
+                values["material_code"]: {
+                    "product_name": values["material_name"],
+                    "lab_code":     values["lab_code"],
+                    "category":     values["category"],
+                }
+                for _, _, values, _ in parsed
+            })
+            dims.ensure_branches(branch_name for _, _, _, branch_name in parsed if branch_name)
+
+        batch: List[tuple] = []
+        for i, movement_date, values, branch_name in parsed:
+            refs = (
+                dims.product_id(values["material_code"]),
+                dims.branch_id(branch_name) if branch_name else None,
+                dims.customer_id(values["customer_name"]) if values["customer_name"] else None,
+            )
+            batch.append((i, (
+                batch_id,
+                company.id,
+                *refs,
+                movement_date,
+                *(values[name] for name in self.FIELDS[5:-1]),
+                _movement_hash(movement_date, values, branch_name, refs),
+            )))
+
+        created = 0
+        if batch:
+            with phase(extra_context, "insert"):
+                created = _bulk_insert(loader, batch, errors)
         return {
-            "total": len(data_rows),
-            "created": created,
-            "updated": 0,
-            "date_range": {"from": str(date_from), "to": str(date_to)},
-            "deleted_existing": deleted_count,
-            "errors": errors,
+            "total":     len(chunk),
+            "created":   created,
+            "errors":    errors,
+            "date_from": min(chunk_dates) if chunk_dates else None,
+            "date_to":   max(chunk_dates) if chunk_dates else None,
         }
 
+    @staticmethod
+    def _promote(model, company, batch_id, date_from: date, date_to: date, extra_context=None) -> tuple:
+        """
+        Merge the staged batch into the company's movements in
+        [date_from, date_to], in a single transaction.
+
+        Live and staged rows are numbered within each content_hash
+        (ROW_NUMBER) and paired on (content_hash, number): unpaired live
+        rows are deleted, unpaired staged rows are copied over with
+        INSERT ... SELECT.  The sales facts of the range are rebuilt once
+        it commits, in their own transaction, so that the movement table
+        is not locked for the rebuild.  Returns (inserted, removed).
+        """
+        from apps.kpi.facts import refresh_sales_facts
+        from apps.transactions.models import MaterialMovementStage
+
+        quote = connection.ops.quote_name
+        live_table = quote(model._meta.db_table)
+        stage_table = quote(MaterialMovementStage._meta.db_table)
+        columns = ", ".join(quote(f.column) for f in model._meta.concrete_fields)
+        ctes = f"""
+            WITH live AS (
+                SELECT id, content_hash,
+                       ROW_NUMBER() OVER (PARTITION BY content_hash ORDER BY id) AS n
+                FROM {live_table}
+                WHERE company_id = %s AND movement_date BETWEEN %s AND %s
+            ),
+            staged AS (
+                SELECT id, content_hash,
+                       ROW_NUMBER() OVER (PARTITION BY content_hash ORDER BY id) AS n
+                FROM {stage_table}
+                WHERE batch_id = %s
+            )
+        """
+        # The CTEs sit inside the subqueries so that each statement starts
+        # with DELETE / INSERT and the driver reports its rowcount.
+        delete_sql = f"""
+            DELETE FROM {live_table} WHERE id IN (
+                {ctes}
+                SELECT live.id FROM live
+                LEFT JOIN staged ON staged.content_hash = live.content_hash AND staged.n = live.n
+                WHERE staged.id IS NULL
+            )
+        """
+        # Run after the delete: the surviving live rows of each hash are
+        # exactly the paired ones, so renumbering them pairs them again.
+        insert_sql = f"""
+            INSERT INTO {live_table} ({columns})
+            SELECT {columns} FROM {stage_table} WHERE id IN (
+                {ctes}
+                SELECT staged.id FROM staged
+                LEFT JOIN live ON live.content_hash = staged.content_hash AND live.n = staged.n
+                WHERE live.id IS NULL
+            )
+        """
+        params = [
+            model._meta.get_field("company").get_db_prep_value(company.pk, connection),
+            date_from,
+            date_to,
+            MaterialMovementStage._meta.get_field("batch_id").get_db_prep_value(batch_id, connection),
+        ]
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                with phase(extra_context, "delete"):
+                    cursor.execute(delete_sql, params)
+                removed = cursor.rowcount
+                with phase(extra_context, "insert"):
+                    cursor.execute(insert_sql, params)
+                inserted = cursor.rowcount
+        with phase(extra_context, "post"):
+            try:
+                refresh_sales_facts(company.pk, date_from, date_to)
+            except Exception:
+                # The movements are committed: the import stands, the
+                # facts are repaired with rebuild_sales_facts.
+                logger.exception(
+                    "[MovementsParser] Sales facts of company %s not refreshed for %s → %s; "
+                    "run `manage.py rebuild_sales_facts --company %s`.",
+                    company.pk, date_from, date_to, company.pk,
+                )
+        return inserted, removed
+
+
+def _compile_melt(branch_pairs: List[tuple], unit_cost_idx: int):
+    """
+    Build the row converter of an inventory sheet.
+
+    Category, code, name, unit cost and every branch (qty, value) pair are
+    converted by one row_converter; missing cells count as empty.  The
+    result is (category, code, name, unit_cost, lines) where lines is an
+    iterable of (branch_name, qty, value).
+    """
+    names = [branch_name for _, _, branch_name in branch_pairs]
+    columns = [(0, to_str, ""), (1, to_str, ""), (2, to_str, ""), (unit_cost_idx, to_decimal, Decimal("0"))]
+    for qty_idx, val_idx, _ in branch_pairs:
+        columns += [(qty_idx, to_decimal, Decimal("0")), (val_idx, to_decimal, Decimal("0"))]
+    convert = row_converter(columns)
+
+    def melt(row):
+        cells = convert(row)
+        return (*cells[:4], zip(names, cells[4::2], cells[5::2]))
+
+    return melt
+
 
 class InventoryParser:
     """
@@ -330,8 +829,21 @@ class InventoryParser:
         col i+1  → value  (header usually starts with "قيمة …")
 
     Result: one InventorySnapshot (session) + N×M InventorySnapshotLine rows.
+
+    Each row goes through one converter compiled from the header (see
+    _compile_melt), and the lines of consecutive Excel rows are written
+    through a bulk loader (bulk_create or PostgreSQL COPY) once per
+    BATCH_SIZE lines — a handful of statements for a whole file.
     """
 
+    BATCH_SIZE = 50000
+
+    # Column order of the tuples handed to the loader.
+    FIELDS = (
+        "snapshot_id", "product_category", "product_code", "product_name",
+        "branch_name", "quantity", "unit_cost", "line_value", "product_name_key",
+    )
+
     _TOTAL_QTY_KW = [
         "إجماليكمية", "اجماليكمية",
         "الكميةالإجمالية", "الكميةالاجمالية",
@@ -342,21 +854,26 @@ class InventoryParser:
         "costprice", "unitcost", "avgcost", "averagecost",
     ]
 
-    def parse(self, rows: List, company, extra_context=None) -> Dict:
+    def parse(self, rows: Iterable, company, extra_context=None) -> Dict:
         from apps.inventory.models import InventorySnapshot, InventorySnapshotLine
 
         extra_context = extra_context or {}
+        dry_run = extra_context.get("dry_run", False)
         user = extra_context.get("user")
         source_file = extra_context.get("filename", "")
 
-        if not rows:
+        rows = iter(rows)
+        header_row = next(rows, None)
+        if header_row is None:
             return {"total": 0, "created": 0, "updated": 0, "errors": []}
 
-        headers = [(_to_str(h) or "").strip() for h in rows[0]]
-        data_rows = [r for r in rows[1:] if r and len(r) > 1 and _to_str(r[1])]
+        headers = [to_str(h) for h in header_row]
+        data_rows = (r for r in rows if r and len(r) > 1 and to_str(r[1]))
 
-        if not data_rows:
+        first_row = next(data_rows, None)
+        if first_row is None:
             return {"total": 0, "created": 0, "updated": 0, "errors": []}
+        data_rows = chain([first_row], data_rows)
 
         # ── Header normaliser (strips spaces, parens, punctuation) ──────────
         def _norm(s: str) -> str:
@@ -405,6 +922,14 @@ class InventoryParser:
             i += 2
         # If dynamic area has an odd width, the last column is silently skipped.
 
+        # A repeated branch header keeps its first pair (the unique key is
+        # snapshot + product_code + branch_name).
+        seen_branches: Set[str] = set()
+        branch_pairs = [
+            bp for bp in branch_pairs
+            if not (bp[2] in seen_branches or seen_branches.add(bp[2]))
+        ]
+
         if not branch_pairs:
             return {
                 "total": 0, "created": 0, "updated": 0,
@@ -427,14 +952,15 @@ class InventoryParser:
             )
         inventory_year = int(year_match.group(1))
 
-        # ── Upsert: delete old snapshot for same company + year ─────────
+        # ── Upsert: replace old snapshot for same company + year ────────
+        # Marked deleted (hidden at once), lines purged in the background
         company_name = company.name if company else extra_context.get("company_name", "")
-        if company:
+        if company and not dry_run:
             old_qs = InventorySnapshot.objects.filter(
                 company=company, inventory_year=inventory_year
             )
-            deleted_count = old_qs.count()
-            old_qs.delete()
+            with phase(extra_context, "delete"):
+                deleted_count = len(discard_snapshots(old_qs))
             if deleted_count:
                 logger.info(
                     "[InventoryParser] Replaced %d existing snapshot(s) for "
@@ -443,67 +969,103 @@ class InventoryParser:
                 )
 
         # ── Create new snapshot session record ──────────────────────────
-        snapshot = InventorySnapshot.objects.create(
-            company=company,
-            company_name=company_name,
-            inventory_year=inventory_year,
-            source_file=source_file,
-            uploaded_by=user,
-        )
+        snapshot = None
+        if not dry_run:
+            snapshot = InventorySnapshot.objects.create(
+                company=company,
+                company_name=company_name,
+                inventory_year=inventory_year,
+                source_file=source_file,
+                uploaded_by=user,
+            )
 
         # ── Melt: 1 Excel row → len(branch_pairs) InventorySnapshotLine rows ──
+        loader = get_loader(InventorySnapshotLine, self.FIELDS, extra_context.get("load_method", "orm"))
+        melt = _compile_melt(branch_pairs, unit_cost_idx)
+        snapshot_id = snapshot.id if snapshot else None
         lines_created = 0
         errors = []
+        batch: List[tuple] = []
+        # Products already melted — a repeated product row is skipped, as
+        # bulk_create(ignore_conflicts=True) used to do.
+        seen_products: Set[str] = set()
+        total = 0
 
         for row_idx, row in enumerate(data_rows, start=2):
+            total += 1
             try:
-                product_category = _to_str(row[0]) if len(row) > 0 else ""
-                product_code     = _to_str(row[1]) if len(row) > 1 else ""
-                product_name     = _to_str(row[2]) if len(row) > 2 else ""
+                product_category, product_code, product_name, unit_cost, lines = melt(row)
 
-                if not product_code:
+                if not product_code or product_code in seen_products:
                     continue
 
-                unit_cost = _to_decimal(row[unit_cost_idx]) if len(row) > unit_cost_idx else Decimal("0")
-
-                lines: List[InventorySnapshotLine] = []
-                for qty_idx, val_idx, branch_name in branch_pairs:
-                    qty = _to_decimal(row[qty_idx]) if len(row) > qty_idx else Decimal("0")
-                    val = _to_decimal(row[val_idx]) if len(row) > val_idx else Decimal("0")
-                    lines.append(
-                        InventorySnapshotLine(
-                            snapshot=snapshot,
-                            product_category=product_category,
-                            product_code=product_code,
-                            product_name=product_name,
-                            branch_name=branch_name,
-                            quantity=qty,
-                            unit_cost=unit_cost,
-                            line_value=val,
-                        )
-                    )
+                error = _field_error(InventorySnapshotLine, {
+                    "product_category": product_category,
+                    "product_code":     product_code,
+                    "product_name":     product_name,
+                })
+                if error:
+                    errors.append(_row_error(row_idx, error, row, dry_run))
+                    continue
 
-                if lines:
-                    InventorySnapshotLine.objects.bulk_create(lines, ignore_conflicts=True)
+                if dry_run:
+                    # The database would reject the row's lines at insert
+                    # time; check their amounts here instead.
+                    lines = list(lines)
+                    error = next(filter(None, (
+                        _field_error(InventorySnapshotLine, {
+                            "quantity": qty, "unit_cost": unit_cost, "line_value": val,
+                        })
+                        for _, qty, val in lines
+                    )), None)
+                    if error:
+                        errors.append(_row_error(row_idx, error, row, dry_run))
+                        continue
+                    seen_products.add(product_code)
                     lines_created += len(lines)
+                    continue
+                seen_products.add(product_code)
+
+                product_name_key = name_key(product_name)
+                batch.extend(
+                    (row_idx, (
+                        snapshot_id, product_category, product_code, product_name,
+                        branch_name, qty, unit_cost, val, product_name_key,
+                    ))
+                    for branch_name, qty, val in lines
+                )
 
+            except SoftTimeLimitExceeded:
+                raise
             except Exception as e:
-                errors.append({"row": row_idx, "error": str(e)})
+                errors.append(_row_error(row_idx, str(e), row, dry_run))
+                continue
+
+            if len(batch) >= self.BATCH_SIZE:
+                with phase(extra_context, "insert"):
+                    lines_created += _bulk_insert(loader, batch, errors)
+                batch = []
+                _report_progress(extra_context, total, total - len(errors))
+
+        if batch:
+            with phase(extra_context, "insert"):
+                lines_created += _bulk_insert(loader, batch, errors)
 
         # Roll back empty snapshot only if every row failed
-        if lines_created == 0 and len(data_rows) > 0:
-            snapshot.delete()
+        if lines_created == 0 and total > 0:
+            if snapshot:
+                snapshot.delete()
             return {
-                "total": len(data_rows), "created": 0, "updated": 0,
+                "total": total, "created": 0, "updated": 0,
                 "errors": errors or [{"row": 0, "error": "No lines were imported."}],
             }
 
         return {
-            "total": len(data_rows),
+            "total": total,
             "created": lines_created,
-            "products_count": len(data_rows) - len(errors),
+            "products_count": total - len(errors),
             "updated": 0,
-            "snapshot_id": str(snapshot.id),
+            "snapshot_id": str(snapshot.id) if snapshot else None,
             "inventory_year": inventory_year,
             "branches_detected": detected_branches,
             "errors": errors,
@@ -511,11 +1073,20 @@ class InventoryParser:
 
 
 class AgingParser:
-    def parse(self, rows: List, company, extra_context=None) -> Dict:
+
+    # Aging buckets, in column order from column 2
+    BUCKETS = (
+        "current", "d1_30", "d31_60", "d61_90", "d91_120", "d121_150",
+        "d151_180", "d181_210", "d211_240", "d241_270", "d271_300",
+        "d301_330", "over_330",
+    )
+
+    def parse(self, rows: Iterable, company, extra_context=None) -> Dict:
         from apps.aging.models import AgingReceivable, AgingSnapshot
         from apps.customers.models import Customer
 
         extra_context = extra_context or {}
+        dry_run = extra_context.get("dry_run", False)
         user = extra_context.get("user")
         source_file = extra_context.get("filename", "")
 
@@ -529,38 +1100,51 @@ class AgingParser:
             )
         aging_year = int(year_match.group(1))
 
-        data_rows = [r for r in rows[1:] if r and len(r) > 1 and r[1] is not None]
+        rows = iter(rows)
+        next(rows, None)  # header
+        data_rows = (r for r in rows if r and len(r) > 1 and r[1] is not None)
+        row_count = 0
         errors = []
 
-        customer_map = {
-            c.account_code: c
-            for c in Customer.objects.filter(company=company)
-        }
+        with phase(extra_context, "dimensions"):
+            customer_map = {
+                c.account_code: c
+                for c in Customer.objects.filter(company=company)
+            }
 
-        # ── Upsert: delete existing snapshot for same company + year ─────────
-        old_qs = AgingSnapshot.objects.filter(company=company, aging_year=aging_year)
-        deleted_count = old_qs.count()
-        old_qs.delete()
-        if deleted_count:
-            logger.info(
-                "[AgingParser] Replaced %d existing snapshot(s) for "
-                "company=%s year=%d.",
-                deleted_count, company, aging_year,
-            )
+        # ── Upsert: replace existing snapshot for same company + year ────────
+        # Marked deleted (hidden at once), lines purged in the background
+        snapshot = None
+        if not dry_run:
+            old_qs = AgingSnapshot.objects.filter(company=company, aging_year=aging_year)
+            with phase(extra_context, "delete"):
+                deleted_count = len(discard_snapshots(old_qs))
+            if deleted_count:
+                logger.info(
+                    "[AgingParser] Replaced %d existing snapshot(s) for "
+                    "company=%s year=%d.",
+                    deleted_count, company, aging_year,
+                )
 
-        # ── Create fresh snapshot for this import session ────────────────────
-        snapshot = AgingSnapshot.objects.create(
-            company=company,
-            aging_year=aging_year,
-            source_file=source_file,
-            uploaded_by=user,
-        )
+            # ── Create fresh snapshot for this import session ────────────────
+            snapshot = AgingSnapshot.objects.create(
+                company=company,
+                aging_year=aging_year,
+                source_file=source_file,
+                uploaded_by=user,
+            )
 
         lines: List[AgingReceivable] = []
+        # Formula cells (text starting with "=") are not numbers → 0
+        convert = row_converter(
+            [(1, to_str, "")]
+            + [(idx, to_decimal, Decimal("0")) for idx in range(2, 2 + len(self.BUCKETS))]
+        )
 
         for i, row in enumerate(data_rows, start=2):
+            row_count += 1
             try:
-                account = _to_str(row[1])
+                account, *amounts = convert(row)
                 if not account:
                     continue
                 if any(kw in account for kw in ["الإجمالي", "المجموع", "Total"]):
@@ -569,29 +1153,18 @@ class AgingParser:
                 account_code = _extract_account_code(account) or f"RAW-{account[:30]}"
                 customer = customer_map.get(account_code)
 
-                def sd(idx: int) -> Decimal:
-                    val = row[idx] if len(row) > idx else None
-                    if isinstance(val, str) and val.startswith("="):
-                        return Decimal("0")
-                    return _to_decimal(val)
-
-                buckets = {
-                    "current": sd(2),
-                    "d1_30": sd(3),
-                    "d31_60": sd(4),
-                    "d61_90": sd(5),
-                    "d91_120": sd(6),
-                    "d121_150": sd(7),
-                    "d151_180": sd(8),
-                    "d181_210": sd(9),
-                    "d211_240": sd(10),
-                    "d241_270": sd(11),
-                    "d271_300": sd(12),
-                    "d301_330": sd(13),
-                    "over_330": sd(14),
-                }
+                buckets = dict(zip(self.BUCKETS, amounts))
                 total = sum(buckets.values())
 
+                # Checked row by row: one bad cell must not fail the
+                # single bulk_create of the whole file.
+                error = _field_error(AgingReceivable, {
+                    "account": account, "account_code": account_code, **buckets, "total": total,
+                })
+                if error:
+                    errors.append(_row_error(i, error, row, dry_run))
+                    continue
+
                 lines.append(AgingReceivable(
                     snapshot=snapshot,
                     company=company,
@@ -601,17 +1174,20 @@ class AgingParser:
                     total=total,
                     **buckets,
                 ))
+            except SoftTimeLimitExceeded:
+                raise
             except Exception as e:
-                errors.append({"row": i, "error": str(e)})
+                errors.append(_row_error(i, str(e), row, dry_run))
 
-        with transaction.atomic():
-            AgingReceivable.objects.bulk_create(lines)
+        if not dry_run:
+            with phase(extra_context, "insert"), transaction.atomic():
+                AgingReceivable.objects.bulk_create(lines)
 
         return {
-            "total": len(data_rows),
+            "total": row_count,
             "created": len(lines),
             "updated": 0,
-            "snapshot_id": str(snapshot.id),
+            "snapshot_id": str(snapshot.id) if snapshot else None,
             "aging_year": aging_year,
             "errors": errors,
         }
@@ -639,30 +1215,87 @@ def parse_excel_file(
     company,
     file_type: str = None,
     extra_context: Dict = None,
+    load_method: str = None,
+    allowed_types: Set[str] = None,
+    reader_backend: str = None,
 ) -> Dict:
-    extra_context = extra_context or {}
+    """
+    Read an uploaded workbook and run the parser for its file type.
+
+    load_method selects how bulk rows (movements, inventory lines) are
+    written: "copy" (PostgreSQL COPY, ORM fallback elsewhere) or "orm".
+    Defaults to settings.DATA_IMPORT_LOAD_METHOD.
 
+    allowed_types, when given, rejects any other file type before a
+    single row is written.
+
+    reader_backend picks the workbook reader ("auto", "calamine",
+    "openpyxl"); defaults to settings.DATA_IMPORT_READER (see readers.py).
+
+    Before parsing starts, extra_context receives "file_type",
+    "header_row" and "expected_rows" (from the sheet dimensions, None when
+    unknown).  The
+    movements and inventory parsers then call extra_context["progress"]
+    (if set) with (rows_processed, rows_succeeded) after every chunk.
+
+    When extra_context["metrics"] holds an ImportMetrics (see metrics.py),
+    the time spent reading, converting, resolving dimensions, deleting and
+    inserting is recorded on it.
+
+    With extra_context["dry_run"] set, every row is converted and validated
+    but nothing is written: the result holds the counts the import would
+    report and its errors carry the failing rows' cells (see dry_run.py).
+    """
+    extra_context = extra_context or {}
+    extra_context["load_method"] = (
+        load_method
+        or extra_context.get("load_method")
+        or getattr(settings, "DATA_IMPORT_LOAD_METHOD", "orm")
+    )
+
+    # Rows are streamed from the worksheet straight into the parser — the
+    # workbook is never materialised as a list of tuples.
+    metrics = extra_context.get("metrics")
     try:
-        wb = openpyxl.load_workbook(file_obj, read_only=True, data_only=True)
-        ws = wb.active
-        rows = list(ws.iter_rows(values_only=True))
-        wb.close()
+        with phase(extra_context, "read"):
+            reader = get_reader(file_obj, reader_backend)
+            rows = reader.rows()
+            header_row = next(rows, None)
     except Exception as e:
         raise ValueError(f"Cannot read Excel file '{filename}': {e}")
 
-    if not rows:
-        raise ValueError("The uploaded file is empty.")
+    try:
+        if header_row is None:
+            raise ValueError("The uploaded file is empty.")
 
-    if not file_type:
-        file_type = detect_file_type(filename, rows[0])
         if not file_type:
-            raise ValueError(
-                f"Cannot determine file type for '{filename}'. "
-                "Rename the file to include one of: فروع, العملاء, حركة, جرد, اعمار — "
-                "or pass file_type explicitly."
+            file_type = detect_file_type(filename, header_row)
+            if not file_type:
+                raise ValueError(
+                    f"Cannot determine file type for '{filename}'. "
+                    "Rename the file to include one of: فروع, العملاء, حركة, جرد, اعمار — "
+                    "or pass file_type explicitly."
+                )
+
+        extra_context["file_type"] = file_type
+        extra_context["header_row"] = header_row
+        if allowed_types is not None and file_type not in allowed_types:
+            raise PermissionError(
+                f"You are not allowed to import '{file_type}' files. "
+                f"Allowed types: {', '.join(sorted(allowed_types))}."
             )
 
-    parser = get_parser(file_type)
-    result = parser.parse(rows, company, extra_context)
+        extra_context["expected_rows"] = reader.max_row - 1 if reader.max_row else None
+
+        parser = get_parser(file_type)
+        if metrics:
+            rows = metrics.timed_iter(rows, "read")
+            with metrics.parsing():
+                result = parser.parse(chain([header_row], rows), company, extra_context)
+        else:
+            result = parser.parse(chain([header_row], rows), company, extra_context)
+    finally:
+        reader.close()
+
     result["file_type"] = file_type
     return result
\ No newline at end of file
@@ -0,0 +1,100 @@
+"""
+apps/data_import/purge.py
+
+Background deletion of inventory and aging snapshots.
+
+A snapshot holds up to hundreds of thousands of lines; deleting it in
+one cascading DELETE holds row locks and bloats the transaction of the
+request (or re-import) that triggered it.  Instead:
+
+    discard_snapshots(qs)   — marks the snapshots deleted (one UPDATE on
+                              the snapshot rows) and, once the transaction
+                              commits, queues purge_snapshot_lines
+    purge_snapshot(...)     — run by the task: deletes the lines in
+                              batches of DATA_IMPORT_PURGE_BATCH_SIZE, each
+                              in its own short transaction, then the
+                              snapshot row itself
+
+Deleted snapshots are hidden by the snapshot models' default manager, and
+their lines by the line models' `live` manager (managers.py), from the
+moment they are marked, so readers never wait on the purge.  `python manage.py purge_deleted_snapshots` finishes any purge
+whose task was lost.
+"""
+
+import logging
+from typing import List, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Snapshot models purged in the background ("app_label.ModelName")
+SNAPSHOT_MODELS = ("inventory.InventorySnapshot", "aging.AgingSnapshot")
+
+
+def discard_snapshots(queryset) -> List:
+    """
+    Mark the snapshots of *queryset* deleted and schedule their purge.
+
+    Returns the ids of the snapshots marked (already deleted ones are
+    skipped).  The purge is queued on commit, so a rolled-back import or
+    request leaves the snapshots untouched.
+    """
+    model = queryset.model
+    ids = list(queryset.values_list("pk", flat=True))
+    if not ids:
+        return []
+    model.all_objects.filter(pk__in=ids, deleted_at__isnull=True).update(
+        deleted_at=timezone.now()
+    )
+
+    label = model._meta.label
+    transaction.on_commit(lambda: _queue_purge(label, ids))
+    return ids
+
+
+def _queue_purge(label: str, ids: List) -> None:
+    from celery_tasks.purge_tasks import purge_snapshot_lines
+
+    for snapshot_id in ids:
+        purge_snapshot_lines.delay(label, str(snapshot_id))
+
+
+def purge_snapshot(label: str, snapshot_id, batch_size: Optional[int] = None) -> int:
+    """
+    Delete the lines of the deleted snapshot *snapshot_id* of model *label*
+    in bounded batches, then the snapshot.  Returns the number of lines
+    deleted.  A snapshot that is not marked deleted is left alone.
+    """
+    model = apps.get_model(label)
+    if not model.all_objects.filter(pk=snapshot_id, deleted_at__isnull=False).exists():
+        return 0
+
+    line_model = model._meta.get_field("lines").related_model
+    batch_size = batch_size or settings.DATA_IMPORT_PURGE_BATCH_SIZE
+    lines = line_model.objects.filter(snapshot_id=snapshot_id)
+    purged = 0
+    while True:
+        batch = list(lines.values_list("pk", flat=True)[:batch_size])
+        if not batch:
+            break
+        with transaction.atomic():
+            deleted, _ = line_model.objects.filter(pk__in=batch).delete()
+        purged += deleted
+
+    model.all_objects.filter(pk=snapshot_id).delete()
+    logger.info(
+        "[purge_snapshot] %s %s purged (%d lines).", model.__name__, snapshot_id, purged
+    )
+    return purged
+
+
+def pending_purges():
+    """(label, snapshot_id) of every snapshot marked deleted but not yet purged."""
+    for label in SNAPSHOT_MODELS:
+        model = apps.get_model(label)
+        for snapshot_id in model.all_objects.filter(deleted_at__isnull=False).values_list("pk", flat=True):
+            yield label, snapshot_id
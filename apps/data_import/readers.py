@@ -0,0 +1,203 @@
+"""
+apps/data_import/readers.py
+
+Workbook readers used by the Excel import pipeline.
+
+A reader opens the first-displayed (active) worksheet of an uploaded file
+and yields its rows as tuples of cell values, exactly as openpyxl's
+``iter_rows(values_only=True)`` would:
+
+    - empty cells          → None
+    - whole numbers        → int, other numbers → float
+    - date / datetime cells → datetime
+    - rows start at column A and the sheet starts at row 1
+
+Backends:
+    CalamineReader  — python-calamine (Rust), several times faster but
+                      loads the whole sheet in memory; used for files up
+                      to DATA_IMPORT_CALAMINE_MAX_SIZE when installed.
+    OpenpyxlReader  — openpyxl read-only mode, streams the rows; always
+                      available.
+
+Usage:
+    with get_reader(file_obj) as reader:
+        reader.max_row          # rows declared by the sheet (None if unknown)
+        for row in reader.rows():
+            ...
+
+`manage.py check_reader_parity <files>` compares both backends cell by cell.
+"""
+
+import io
+import logging
+import re
+import zipfile
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from typing import Iterator, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class WorkbookReader(ABC):
+    """
+    Base class: context manager over one worksheet.  A backend implements
+    rows() and, if it holds resources, close(); it is registered in READERS.
+    """
+
+    name = ""
+
+    def __init__(self, file_obj):
+        self.file_obj = file_obj
+        self.max_row: Optional[int] = None
+
+    @abstractmethod
+    def rows(self) -> Iterator[tuple]:
+        """The sheet's rows, as openpyxl's iter_rows(values_only=True)."""
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class OpenpyxlReader(WorkbookReader):
+
+    name = "openpyxl"
+
+    def __init__(self, file_obj):
+        import openpyxl
+
+        super().__init__(file_obj)
+        self._wb = openpyxl.load_workbook(file_obj, read_only=True, data_only=True)
+        self._ws = self._wb.active
+        self.max_row = self._ws.max_row
+
+    def rows(self) -> Iterator[tuple]:
+        return self._ws.iter_rows(values_only=True)
+
+    def close(self) -> None:
+        self._wb.close()
+
+
+class CalamineReader(WorkbookReader):
+    """
+    python-calamine backend, normalised to openpyxl values.
+
+    calamine returns "" for empty cells, floats for every number, plain
+    dates for date-only cells and trims the empty columns before the first
+    used cell; each of these is mapped back here.
+    """
+
+    name = "calamine"
+
+    def __init__(self, file_obj):
+        from python_calamine import CalamineWorkbook
+
+        super().__init__(file_obj)
+        index = _active_sheet_index(file_obj)
+        if hasattr(file_obj, "seek"):
+            file_obj.seek(0)
+        self._wb = CalamineWorkbook.from_filelike(file_obj)
+        self._sheet = self._wb.get_sheet_by_index(index)
+        # iter_rows() starts at row 1 but at the first used column
+        self._first_col = self._sheet.start[1] if self._sheet.start else 0
+        self.max_row = self._sheet.end[0] + 1 if self._sheet.end else None
+
+    def rows(self) -> Iterator[tuple]:
+        pad = (None,) * self._first_col
+        for raw in self._sheet.iter_rows():
+            yield pad + tuple(_from_calamine(v) for v in raw)
+
+    def close(self) -> None:
+        self._wb.close()
+
+
+def _from_calamine(value):
+    if value == "":
+        return None
+    if isinstance(value, float):
+        # openpyxl yields int for whole numbers Excel stores without an
+        # exponent, i.e. below 1e16
+        return int(value) if value.is_integer() and abs(value) < 1e16 else value
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime(value.year, value.month, value.day)
+    return value
+
+
+_ACTIVE_TAB_RE = re.compile(rb'activeTab="(\d+)"')
+
+
+def _active_sheet_index(file_obj) -> int:
+    """Index of the sheet openpyxl's ``wb.active`` would return (xlsx only)."""
+    try:
+        if hasattr(file_obj, "seek"):
+            file_obj.seek(0)
+        with zipfile.ZipFile(file_obj) as archive:
+            match = _ACTIVE_TAB_RE.search(archive.read("xl/workbook.xml"))
+        return int(match.group(1)) if match else 0
+    except (zipfile.BadZipFile, KeyError):
+        return 0
+
+
+READERS = {
+    "calamine": CalamineReader,
+    "openpyxl": OpenpyxlReader,
+}
+
+
+def calamine_available() -> bool:
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _file_size(file_obj) -> Optional[int]:
+    size = getattr(file_obj, "size", None)
+    if size is not None:
+        return size
+    if not hasattr(file_obj, "seek"):
+        return None
+    size = file_obj.seek(0, io.SEEK_END)
+    file_obj.seek(0)
+    return size
+
+
+def get_reader(file_obj, backend: str = None) -> WorkbookReader:
+    """
+    Open *file_obj* with *backend* ("auto", "calamine" or "openpyxl").
+
+    Defaults to settings.DATA_IMPORT_READER.  "auto" uses calamine for
+    files up to settings.DATA_IMPORT_CALAMINE_MAX_SIZE bytes and openpyxl
+    (streaming) above, or when the size is unknown.  "calamine" falls back
+    to openpyxl when python-calamine is not installed.
+    """
+    backend = backend or getattr(settings, "DATA_IMPORT_READER", "auto")
+    if backend not in READERS and backend != "auto":
+        raise ValueError(f"Unknown workbook reader: '{backend}'")
+    if backend == "auto":
+        size = _file_size(file_obj)
+        max_size = getattr(settings, "DATA_IMPORT_CALAMINE_MAX_SIZE", 20 * 1024 * 1024)
+        if size is None or size > max_size:
+            backend = "openpyxl"
+    if backend in ("auto", "calamine"):
+        if calamine_available():
+            backend = "calamine"
+        else:
+            if backend == "calamine":
+                logger.warning(
+                    "[get_reader] 'python-calamine' package not installed — "
+                    "using openpyxl. Run: pip install python-calamine"
+                )
+            backend = "openpyxl"
+    if hasattr(file_obj, "seek"):
+        file_obj.seek(0)
+    return READERS[backend](file_obj)
@@ -1,7 +1,8 @@
 # apps/data_import/serializers.py
 from rest_framework import serializers
+from django.conf import settings
 from django.utils import timezone
-from .models import ImportLog
+from .models import ImportLog, UploadSession
 
 
 class ImportUploadSerializer(serializers.Serializer):
@@ -20,6 +21,21 @@ class ImportUploadSerializer(serializers.Serializer):
         allow_blank=True,
         help_text="Optional: force file type instead of auto-detection"
     )
+    load_method = serializers.ChoiceField(
+        choices=[("copy", "PostgreSQL COPY"), ("orm", "ORM bulk insert")],
+        required=False,
+        help_text="Optional: how bulk rows are written (default: server setting)"
+    )
+    force = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text="Re-import even if the same file was already imported successfully"
+    )
+    dry_run = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text="Validate only: nothing is imported, the failing rows are returned as xlsx"
+    )
     def validate_file(self, value):
         """
         Basic file validation before processing.
@@ -34,6 +50,15 @@ class ImportUploadSerializer(serializers.Serializer):
             )
         return value
 
+    def validate(self, attrs):
+        # A dry run is validated inside the request: bound its size
+        max_size = settings.DATA_IMPORT_DRY_RUN_MAX_SIZE
+        if attrs.get("dry_run") and attrs["file"].size > max_size:
+            raise serializers.ValidationError({
+                "file": f"File is too large for a dry run (maximum {max_size // (1024 * 1024)} MB)."
+            })
+        return attrs
+
 
 class ImportLogSerializer(serializers.ModelSerializer):
     """
@@ -78,6 +103,7 @@ class ImportLogSerializer(serializers.ModelSerializer):
             'file_type',
             'file_type_display',
             'original_filename',
+            'file_hash',
             'status',
             'status_display',
             'row_count',
@@ -92,7 +118,7 @@ class ImportLogSerializer(serializers.ModelSerializer):
         read_only_fields = [
             'id', 'company', 'imported_by', 'started_at', 'completed_at',
             'row_count', 'success_count', 'error_count', 'error_details',
-            'status', 'file_type', 'original_filename',
+            'status', 'file_type', 'original_filename', 'file_hash',
         ]
 
     def get_duration(self, obj):
@@ -124,4 +150,84 @@ class ImportLogMinimalSerializer(serializers.ModelSerializer):
             'error_count',
             'started_at',
             'completed_at',
-        ]
\ No newline at end of file
+        ]
+
+class UploadSessionInitSerializer(serializers.Serializer):
+    """
+    Serializer for POST /api/import/uploads/ (start a chunked upload).
+    The import options are stored on the session and applied on completion.
+    """
+    filename = serializers.CharField(max_length=500)
+    file_size = serializers.IntegerField(min_value=1)
+    chunk_size = serializers.IntegerField(
+        required=False,
+        min_value=64 * 1024,
+        help_text="Optional: bytes per chunk (default: server setting)"
+    )
+    file_type = serializers.ChoiceField(
+        choices=ImportLog.FileType.choices,
+        required=False,
+        allow_blank=True,
+        help_text="Optional: force file type instead of auto-detection"
+    )
+    load_method = serializers.ChoiceField(
+        choices=[("copy", "PostgreSQL COPY"), ("orm", "ORM bulk insert")],
+        required=False,
+        help_text="Optional: how bulk rows are written (default: server setting)"
+    )
+    force = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text="Re-import even if the same file was already imported successfully"
+    )
+
+    def validate_filename(self, value):
+        if not value.lower().endswith(('.xlsx', '.xls')):
+            raise serializers.ValidationError(
+                "Only .xlsx and .xls files are supported."
+            )
+        return value
+
+    def validate_file_size(self, value):
+        max_size = settings.DATA_IMPORT_UPLOAD_MAX_SIZE
+        if value > max_size:
+            raise serializers.ValidationError(
+                f"File is too large (maximum {max_size // (1024 * 1024)} MB)."
+            )
+        return value
+
+    def validate_chunk_size(self, value):
+        max_chunk = settings.DATA_IMPORT_UPLOAD_MAX_CHUNK_SIZE
+        if value > max_chunk:
+            raise serializers.ValidationError(
+                f"Chunk size cannot exceed {max_chunk} bytes."
+            )
+        return value
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """
+    Chunked upload state returned by the /api/import/uploads/ endpoints.
+    """
+    total_chunks = serializers.IntegerField(read_only=True)
+    missing_chunks = serializers.ListField(child=serializers.IntegerField(), read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id',
+            'original_filename',
+            'file_size',
+            'chunk_size',
+            'total_chunks',
+            'received_chunks',
+            'missing_chunks',
+            'file_type',
+            'load_method',
+            'force',
+            'status',
+            'import_log',
+            'created_at',
+            'updated_at',
+        ]
+        read_only_fields = fields
@@ -0,0 +1,591 @@
+"""
+apps/data_import/services.py
+
+Import job helpers shared by the upload view and the Celery import task.
+
+    save_upload()  — spool an uploaded file to DATA_IMPORT_SPOOL_DIR
+    purge_stale_upload_sessions() — drop abandoned chunked uploads
+    fail_stale_imports() — fail the imports whose task was killed
+    hash_file()    — streaming SHA-256 of a spooled file
+    find_duplicate() — previous successful import of the same file
+    queue_import() — create the PENDING ImportLog and enqueue the task
+    run_import()   — parse a spooled file and keep its ImportLog up to date
+                     (raises ImportBusy while the company's previous import
+                     of the same type is still queued or running)
+    finalize_log() — store a parser result on the ImportLog
+    build_message() / progress_percent() — values exposed by the API
+    import_stats() — throughput of finished imports over time
+"""
+
+import hashlib
+import io
+import logging
+import mmap
+import os
+import statistics
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+from django.db import transaction
+
+from .locks import import_lock
+from .metrics import PHASES, ImportMetrics
+from .models import ImportLog, UploadSession
+from .parsers.excel_parser import detect_file_type, parse_excel_file
+from .readers import get_reader
+
+logger = logging.getLogger(__name__)
+
+# Keys of the parser result persisted in ImportLog.import_context
+CONTEXT_KEYS = (
+    "date_range", "deleted_existing", "deleted_stale", "deactivated",
+    "inserted", "unchanged", "removed",
+)
+
+# Imports whose data is in the database
+DONE_STATUSES = (ImportLog.ImportStatus.SUCCESS, ImportLog.ImportStatus.PARTIAL)
+
+# import_context flag of a PENDING log whose file_type is still the
+# placeholder: it does not hold back other imports until detected.
+TYPE_PENDING_KEY = "file_type_pending"
+
+# import_context keys read by fail_stale_imports(): name of the spooled
+# file in DATA_IMPORT_SPOOL_DIR and when the import started processing.
+SPOOL_FILE_KEY = "spool_file"
+PROCESSING_SINCE_KEY = "processing_since"
+
+
+class ImportBusy(Exception):
+    """The company's previous import of the same file type is not done yet."""
+
+
+def save_upload(file_obj) -> Tuple[str, str]:
+    """
+    Write the uploaded file to the spool directory.
+
+    The SHA-256 is computed on the same pass over the upload chunks.
+    Returns (path, hex digest).
+    """
+    path = spool_path(file_obj.name.rsplit(".", 1)[-1].lower())
+    digest = hashlib.sha256()
+    with open(path, "wb") as fh:
+        for chunk in file_obj.chunks():
+            digest.update(chunk)
+            fh.write(chunk)
+    return path, digest.hexdigest()
+
+
+def spool_path(ext: str) -> str:
+    """New unique path in the spool directory (created if needed)."""
+    spool_dir = str(settings.DATA_IMPORT_SPOOL_DIR)
+    os.makedirs(spool_dir, exist_ok=True)
+    return os.path.join(spool_dir, f"{uuid.uuid4().hex}.{ext}")
+
+
+def purge_stale_upload_sessions(max_age: timedelta = None, user=None) -> int:
+    """
+    Delete the OPEN upload sessions that received nothing for *max_age*
+    (default: DATA_IMPORT_UPLOAD_SESSION_TTL seconds) and their spooled
+    files; only *user*'s sessions when given.  Returns the number deleted.
+    """
+    if max_age is None:
+        max_age = timedelta(seconds=settings.DATA_IMPORT_UPLOAD_SESSION_TTL)
+    sessions = UploadSession.objects.filter(
+        status=UploadSession.SessionStatus.OPEN,
+        updated_at__lt=datetime.now(tz=timezone.utc) - max_age,
+    )
+    if user is not None:
+        sessions = sessions.filter(created_by=user)
+
+    count = 0
+    for session in sessions.only("id", "spool_path"):
+        # Conditional delete: a chunk or completion landing meanwhile wins
+        deleted, _ = UploadSession.objects.filter(
+            id=session.id,
+            status=UploadSession.SessionStatus.OPEN,
+            updated_at__lt=datetime.now(tz=timezone.utc) - max_age,
+        ).delete()
+        if not deleted:
+            continue
+        try:
+            os.remove(session.spool_path)
+        except FileNotFoundError:
+            pass
+        count += 1
+    if count:
+        logger.info(f"[purge_stale_upload_sessions] {count} abandoned upload session(s) deleted.")
+    return count
+
+
+def fail_stale_imports() -> int:
+    """
+    Mark FAILED the imports still PROCESSING well past the task time limit
+    (DATA_IMPORT_TASK_TIME_LIMIT + DATA_IMPORT_TASK_GRACE seconds) and
+    remove their spooled files.
+
+    A worker killed by the hard time limit (or lost with its machine)
+    never finishes its log, which would otherwise block the company's
+    later imports of the same type for good (see _running_import).
+    Returns the number of logs failed.
+    """
+    limit = settings.DATA_IMPORT_TASK_TIME_LIMIT + settings.DATA_IMPORT_TASK_GRACE
+    cutoff = datetime.now(tz=timezone.utc) - timedelta(seconds=limit)
+
+    count = 0
+    # Processing starts after the log is created: started_at narrows it down
+    logs = ImportLog.objects.filter(status=ImportLog.ImportStatus.PROCESSING, started_at__lt=cutoff)
+    for log in logs:
+        since = log.import_context.get(PROCESSING_SINCE_KEY)
+        if since and datetime.fromisoformat(since) >= cutoff:
+            continue
+        with transaction.atomic():
+            # Conditional update: an import finishing meanwhile wins
+            updated = ImportLog.objects.filter(
+                id=log.id, status=ImportLog.ImportStatus.PROCESSING,
+            ).update(
+                status=ImportLog.ImportStatus.FAILED,
+                error_details=[{"error": f"Import did not finish within {limit} seconds."}],
+                error_count=1,
+                completed_at=datetime.now(tz=timezone.utc),
+            )
+        if not updated:
+            continue
+        spool_file = log.import_context.get(SPOOL_FILE_KEY)
+        if spool_file:
+            try:
+                os.remove(os.path.join(str(settings.DATA_IMPORT_SPOOL_DIR), spool_file))
+            except FileNotFoundError:
+                pass
+        count += 1
+    if count:
+        logger.warning(f"[fail_stale_imports] {count} interrupted import(s) marked failed.")
+    return count
+
+
+def hash_file(path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of the file at *path*, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_duplicate(company, file_hash: str, filename: str, file_type: str = None) -> Optional[ImportLog]:
+    """
+    Return the completed (SUCCESS / PARTIAL) ImportLog of an identical
+    file, or None.
+
+    The match must still be the latest finished import of its file type
+    for the company: if another file was imported since, re-importing this
+    one is not a no-op.
+    """
+    file_type = file_type or detect_file_type(filename, None)
+    qs = ImportLog.objects.filter(company=company, file_hash=file_hash)
+    if file_type:
+        qs = qs.filter(file_type=file_type)
+    # PARTIAL counts too: the same bytes would fail on the same rows again.
+    previous = qs.filter(status__in=DONE_STATUSES).order_by("-started_at").first()
+    if not previous:
+        return None
+
+    latest = (
+        ImportLog.objects
+        .filter(
+            company=company,
+            file_type=previous.file_type,
+            status__in=DONE_STATUSES,
+        )
+        .order_by("-started_at")
+        .only("id")
+        .first()
+    )
+    return previous if latest and latest.id == previous.id else None
+
+
+class MappedFile(io.RawIOBase):
+    """
+    Read-only, seekable file object over an mmap.
+
+    mmap has read/seek/tell but not the io interface (seekable(), readinto)
+    zipfile and the workbook readers check for.  Reads are served from the
+    page cache, shared by every worker importing the same file.
+    """
+
+    def __init__(self, mapped: mmap.mmap):
+        self._mapped = mapped
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._mapped.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._mapped.read(None if size is None or size < 0 else size)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self._mapped.seek(offset, whence)
+        return self._mapped.tell()
+
+    def tell(self) -> int:
+        return self._mapped.tell()
+
+
+def queue_import(
+    company,
+    user,
+    path: str,
+    filename: str,
+    file_hash: str,
+    file_type: str = None,
+    load_method: str = None,
+    allowed_types: Iterable[str] = None,
+) -> ImportLog:
+    """
+    Create a PENDING ImportLog for the spooled file at *path* and enqueue
+    the import task once the current transaction commits.
+    """
+    from celery_tasks.import_tasks import import_excel_file
+
+    log = ImportLog.objects.create(
+        company=company,
+        imported_by=user,
+        file_type=file_type or "movements",  # Placeholder until detected
+        original_filename=filename,
+        file_hash=file_hash,
+        status=ImportLog.ImportStatus.PENDING,
+        import_context={
+            SPOOL_FILE_KEY: os.path.basename(path),
+            **({} if file_type else {TYPE_PENDING_KEY: True}),
+        },
+    )
+    task_args = (
+        str(log.id),
+        path,
+        file_type or None,
+        load_method or None,
+        sorted(allowed_types) if allowed_types else None,
+    )
+    transaction.on_commit(lambda: import_excel_file.delay(*task_args))
+    logger.info(
+        f"[queue_import] Import queued: '{filename}' "
+        f"for company '{company.name}' (log {log.id})."
+    )
+    return log
+
+
+def run_import(
+    log_id,
+    path: str,
+    file_type: str = None,
+    load_method: str = None,
+    allowed_types: Iterable[str] = None,
+) -> ImportLog:
+    """
+    Import the spooled workbook at *path* for the ImportLog *log_id*.
+
+    The log moves PENDING → PROCESSING → SUCCESS / PARTIAL / FAILED;
+    row_count and success_count are saved after every committed chunk so
+    clients can poll the progress endpoint.
+
+    Imports of one file type run one at a time per company, in upload
+    order (see locks.py).  If an earlier one is still queued or running,
+    the log stays PENDING, records it in import_context["queued_behind"]
+    and ImportBusy is raised: the caller retries later.
+    """
+    log = ImportLog.objects.select_related("company", "imported_by").get(id=log_id)
+
+    # The lock is per file type: settle it before parsing starts
+    file_type = file_type or _peek_file_type(path, log.original_filename)
+    if file_type and (log.file_type != file_type or TYPE_PENDING_KEY in log.import_context):
+        log.file_type = file_type
+        log.import_context.pop(TYPE_PENDING_KEY, None)
+        log.save(update_fields=["file_type", "import_context"])
+
+    with import_lock(log.company_id, file_type) as acquired:
+        ahead = _pending_ahead(log) if acquired else _running_import(log)
+        if ahead or not acquired:
+            log.import_context["queued_behind"] = str(ahead.id) if ahead else None
+            log.save(update_fields=["import_context"])
+            raise ImportBusy(
+                f"Import of '{log.original_filename}' waits for the previous "
+                f"{log.file_type} import of company '{log.company.name}'."
+            )
+        log.import_context.pop("queued_behind", None)
+        return _run_import(log, path, file_type, load_method, allowed_types)
+
+
+def _run_import(log: ImportLog, path: str, file_type, load_method, allowed_types) -> ImportLog:
+    log.status = ImportLog.ImportStatus.PROCESSING
+    log.import_context[PROCESSING_SINCE_KEY] = datetime.now(tz=timezone.utc).isoformat()
+    log.save(update_fields=["status", "import_context"])
+
+    metrics = ImportMetrics()
+    extra_context: Dict = {
+        "user":     log.imported_by,
+        "filename": log.original_filename,
+        "metrics":  metrics,
+    }
+
+    def progress(processed: int, succeeded: int) -> None:
+        log.file_type = extra_context.get("file_type", log.file_type)
+        log.row_count = processed
+        log.success_count = succeeded
+        log.import_context["expected_rows"] = extra_context.get("expected_rows")
+        log.save(update_fields=["file_type", "row_count", "success_count", "import_context"])
+
+    extra_context["progress"] = progress
+
+    try:
+        # The spooled file is memory-mapped: the readers seek around the
+        # zip archive without a private copy of it in worker memory.
+        with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            result = parse_excel_file(
+                file_obj=MappedFile(mapped),
+                filename=log.original_filename,
+                company=log.company,
+                file_type=file_type,
+                extra_context=extra_context,
+                load_method=load_method,
+                allowed_types=set(allowed_types) if allowed_types is not None else None,
+            )
+    except SoftTimeLimitExceeded:
+        raise  # The task fails the log (see import_tasks.py)
+    except (ValueError, PermissionError) as e:
+        log.file_type = extra_context.get("file_type", log.file_type)
+        _fail(log, str(e))
+        return log
+    except Exception as e:
+        logger.exception(f"[run_import] Unexpected error on '{log.original_filename}': {e}")
+        _fail(log, f"Internal error: {str(e)}")
+        return log
+
+    finalize_log(log, result, metrics)
+    logger.info(
+        f"[run_import] Import complete: '{log.original_filename}' "
+        f"({log.file_type}) for company '{log.company.name}' "
+        f"— created={result.get('created', 0)} updated={result.get('updated', 0)} "
+        f"errors={log.error_count} "
+        f"rows/s={log.import_context['metrics']['rows_per_second']}."
+    )
+    return log
+
+
+def _peek_file_type(path: str, filename: str) -> Optional[str]:
+    """File type from the name, else from the header row (None if unknown)."""
+    file_type = detect_file_type(filename, None)
+    if file_type:
+        return file_type
+    try:
+        with open(path, "rb") as fh, get_reader(fh, "openpyxl") as reader:
+            return detect_file_type(filename, next(reader.rows(), None))
+    except Exception:
+        return None  # parse_excel_file reports unreadable files
+
+
+def _running_import(log: ImportLog) -> Optional[ImportLog]:
+    """The company's PROCESSING import of the same file type, if any."""
+    return (
+        ImportLog.objects
+        .filter(
+            company_id=log.company_id,
+            file_type=log.file_type,
+            status=ImportLog.ImportStatus.PROCESSING,
+        )
+        .exclude(id=log.id)
+        .order_by("-started_at")
+        .first()
+    )
+
+
+def _pending_ahead(log: ImportLog) -> Optional[ImportLog]:
+    """
+    The oldest PENDING import of the same company and file type queued
+    before *log* (imports run in upload order), if any.
+
+    Logs whose file type is not detected yet do not count, nor do logs
+    queued longer ago than the import task time limit: their task was
+    lost and will never run.
+    """
+    stale_after = timedelta(
+        seconds=settings.DATA_IMPORT_TASK_TIME_LIMIT + settings.DATA_IMPORT_LOCK_RETRY_DELAY
+    )
+    return (
+        ImportLog.objects
+        .filter(
+            company_id=log.company_id,
+            file_type=log.file_type,
+            status=ImportLog.ImportStatus.PENDING,
+            started_at__lt=log.started_at,
+            started_at__gte=datetime.now(tz=timezone.utc) - stale_after,
+        )
+        .exclude(import_context__has_key=TYPE_PENDING_KEY)
+        .order_by("started_at")
+        .first()
+    )
+
+
+def finalize_log(log: ImportLog, result: Dict, metrics: ImportMetrics = None) -> None:
+    """
+    Store the parser *result* on *log* and set its final status, with the
+    throughput *metrics* of the import in import_context["metrics"].
+    """
+    errors_list = result.get("errors", [])
+    has_errors  = len(errors_list) > 0
+
+    log.file_type     = result["file_type"]
+    log.row_count     = result["total"]
+    if result["file_type"] == "inventory":
+        log.success_count = result.get("products_count", result.get("total", 0))
+    else:
+        # Movements left untouched by an incremental re-import count as imported
+        log.success_count = (
+            result.get("created", 0) + result.get("updated", 0) + result.get("unchanged", 0)
+        )
+    log.error_count   = len(errors_list)
+    log.error_details = errors_list[:100]
+
+    # Persist extra upsert metadata (date_range, deactivated, etc.)
+    log.import_context.update({k: v for k, v in result.items() if k in CONTEXT_KEYS})
+    for key in ("snapshot_id", "inventory_year", "aging_year", "branches_detected"):
+        if result.get(key) is not None:
+            log.import_context[key] = result[key]
+
+    log.status = (
+        ImportLog.ImportStatus.PARTIAL  if has_errors and log.success_count > 0
+        else ImportLog.ImportStatus.FAILED   if has_errors and log.success_count == 0
+        else ImportLog.ImportStatus.SUCCESS
+    )
+    log.completed_at = datetime.now(tz=timezone.utc)
+    if metrics:
+        log.import_context["metrics"] = metrics.as_dict(log.row_count)
+    log.save()
+
+
+def fail_import(log_id, message: str) -> ImportLog:
+    """Mark the ImportLog *log_id* FAILED with *message*."""
+    log = ImportLog.objects.get(id=log_id)
+    _fail(log, message)
+    return log
+
+
+def _fail(log: ImportLog, message: str) -> None:
+    log.status = ImportLog.ImportStatus.FAILED
+    log.error_details = [{"error": message}]
+    log.error_count = 1
+    log.completed_at = datetime.now(tz=timezone.utc)
+    log.save()
+
+
+def build_message(log: ImportLog) -> str:
+    if log.status == ImportLog.ImportStatus.PENDING:
+        if "queued_behind" in log.import_context:
+            return (
+                f"Import of '{log.original_filename}' queued: waiting for the "
+                f"previous {log.file_type} import to finish."
+            )
+        return f"Import of '{log.original_filename}' queued."
+    if log.status == ImportLog.ImportStatus.PROCESSING:
+        return f"Importing '{log.original_filename}': {log.row_count} rows processed."
+    if log.status == ImportLog.ImportStatus.SUCCESS:
+        return (
+            f"Import successful: {log.success_count} records imported "
+            f"from '{log.original_filename}'."
+        )
+    if log.status == ImportLog.ImportStatus.PARTIAL:
+        return (
+            f"Partial import: {log.success_count} records imported, "
+            f"{log.error_count} rows failed."
+        )
+    return f"Import failed: {log.error_count} errors encountered."
+
+
+def progress_percent(log: ImportLog) -> Optional[int]:
+    """
+    Percent complete of *log*: 0 while queued, 100 once finished.
+
+    While processing, rows done / rows expected from the sheet dimensions,
+    capped at 99 until the log is finalized.  None when the sheet does not
+    declare its dimensions.
+    """
+    if log.status == ImportLog.ImportStatus.PENDING:
+        return 0
+    if log.status != ImportLog.ImportStatus.PROCESSING:
+        return 100
+    expected = log.import_context.get("expected_rows")
+    if not expected:
+        return None
+    return min(99, log.row_count * 100 // expected)
+
+
+def import_stats(company, days: int = 30, file_type: str = None, period: str = "day") -> Dict:
+    """
+    Throughput of the company's finished imports over the last *days*,
+    per file type and per *period* ("day" or "week"), from the metrics
+    stored by run_import().  Imports finished before metrics were recorded
+    are ignored.
+    """
+    since = datetime.now(tz=timezone.utc) - timedelta(days=days)
+    qs = ImportLog.objects.filter(
+        company=company, status__in=DONE_STATUSES, started_at__gte=since,
+    )
+    if file_type:
+        qs = qs.filter(file_type=file_type)
+
+    groups = defaultdict(list)     # (file_type, period start) → metrics
+    per_type = defaultdict(list)   # file_type → metrics
+    for log_type, started_at, row_count, context in qs.order_by("started_at").values_list(
+        "file_type", "started_at", "row_count", "import_context"
+    ):
+        metrics = (context or {}).get("metrics")
+        if not metrics:
+            continue
+        entry = dict(metrics, row_count=row_count)
+        day = started_at.date()
+        start = day - timedelta(days=day.weekday()) if period == "week" else day
+        groups[(log_type, start)].append(entry)
+        per_type[log_type].append(entry)
+
+    return {
+        "days":       days,
+        "period":     period,
+        "file_types": {
+            log_type: {
+                "summary": _summarize(entries),
+                "periods": [
+                    {"period_start": str(start), **_summarize(groups[(log_type, start)])}
+                    for (group_type, start) in groups
+                    if group_type == log_type
+                ],
+            }
+            for log_type, entries in per_type.items()
+        },
+    }
+
+
+def _summarize(entries: list) -> Dict:
+    """Aggregate the metrics of several imports."""
+    rates = [e["rows_per_second"] for e in entries if e.get("rows_per_second")]
+    memory = [e["peak_memory_mb"] for e in entries if e.get("peak_memory_mb") is not None]
+    return {
+        "imports":                len(entries),
+        "rows":                   sum(e["row_count"] for e in entries),
+        "median_rows_per_second": round(statistics.median(rates), 1) if rates else None,
+        "min_rows_per_second":    min(rates) if rates else None,
+        "avg_total_seconds":      round(statistics.mean(e["total_seconds"] for e in entries), 3),
+        "avg_timings": {
+            name: round(statistics.mean(e["timings"].get(name, 0.0) for e in entries), 3)
+            for name in PHASES
+        },
+        "max_peak_memory_mb":     max(memory) if memory else None,
+    }
@@ -0,0 +1,329 @@
+"""
+apps/data_import/tests.py
+"""
+
+import io
+import os
+import tempfile
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+import openpyxl
+from celery.exceptions import SoftTimeLimitExceeded
+from django.db import transaction
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.aging.models import AgingReceivable, AgingSnapshot
+from apps.authentication.models import User
+from apps.companies.models import Company
+from apps.inventory.models import InventorySnapshot, InventorySnapshotLine
+from apps.transactions.models import MaterialMovement, MaterialMovementStage
+from celery_tasks.import_tasks import import_excel_file
+
+from .models import ImportLog
+from .parallel import imap_bounded
+from .purge import discard_snapshots, purge_snapshot
+from .parsers.excel_parser import InventoryParser, MovementsParser
+from .readers import CalamineReader, OpenpyxlReader, calamine_available, get_reader
+from .services import PROCESSING_SINCE_KEY, SPOOL_FILE_KEY, fail_stale_imports
+
+
+def build_workbook() -> io.BytesIO:
+    """
+    Small workbook covering what the readers normalise: the active sheet is
+    not the first one, column A is empty, cells are missing in the middle
+    and at the end of rows, and numbers / dates come in every shape.
+    """
+    wb = openpyxl.Workbook()
+    wb.active.title = "Ignored"
+    wb.active["A1"] = "not the active sheet"
+    ws = wb.create_sheet("Data")
+    rows = [
+        (None, "الفهرس", "رمز المادة", "اسم المادة", "الكمية", "التاريخ"),
+        (None, "cat", "EC0020", "منتج 1", 5, date(2025, 1, 31)),
+        (None, "cat", "EC0021", None, 2.5, datetime(2025, 2, 1, 10, 30)),
+        (None, None, "EC0022", "منتج 3", 12345678901234, None),
+        (None,),
+        (None, "cat", "EC0023", "منتج 4", -0.125),
+        (None, "cat", 1141001, "  spaced  ", 0, date(2024, 12, 31)),
+    ]
+    for row in rows:
+        ws.append(row)
+    wb.active = wb.sheetnames.index("Data")
+
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def read_rows(reader_class, buffer) -> list:
+    buffer.seek(0)
+    with reader_class(buffer) as reader:
+        return [tuple(row) for row in reader.rows()]
+
+
+class OpenpyxlReaderTests(SimpleTestCase):
+
+    def test_reads_active_sheet_values(self):
+        rows = read_rows(OpenpyxlReader, build_workbook())
+        self.assertEqual(rows[0][2], "رمز المادة")
+        self.assertEqual(rows[1], (None, "cat", "EC0020", "منتج 1", 5, datetime(2025, 1, 31)))
+
+    def test_get_reader_forced_backend(self):
+        with get_reader(build_workbook(), "openpyxl") as reader:
+            self.assertEqual(reader.name, "openpyxl")
+
+
+@skipUnless(calamine_available(), "python-calamine is not installed")
+class ReaderParityTests(SimpleTestCase):
+    """The parsers must receive identical row tuples from both backends."""
+
+    def test_rows_identical(self):
+        buffer = build_workbook()
+        expected = read_rows(OpenpyxlReader, buffer)
+        actual = read_rows(CalamineReader, buffer)
+        self.assertEqual(len(actual), len(expected))
+        for number, (a, b) in enumerate(zip(expected, actual), start=1):
+            self.assertEqual(a, b, f"row {number}")
+
+    def test_value_types_identical(self):
+        buffer = build_workbook()
+        expected = read_rows(OpenpyxlReader, buffer)
+        actual = read_rows(CalamineReader, buffer)
+        self.assertEqual(
+            [[type(v) for v in row] for row in expected],
+            [[type(v) for v in row] for row in actual],
+        )
+
+
+class ParallelTransactionTests(TransactionTestCase):
+    """The worker pool must never start inside the caller's transaction."""
+
+    def test_workers_fall_back_to_one_inside_atomic(self):
+        self.assertEqual(MovementsParser._workers({"workers": 3}), 3)
+        with transaction.atomic():
+            self.assertEqual(MovementsParser._workers({"workers": 3}), 1)
+
+    def test_imap_bounded_refuses_inside_atomic(self):
+        with transaction.atomic():
+            with self.assertRaises(RuntimeError):
+                list(imap_bounded(abs, [-1], workers=2))
+
+
+@override_settings(DATA_IMPORT_TASK_TIME_LIMIT=600, DATA_IMPORT_TASK_GRACE=60)
+class InterruptedImportTests(TestCase):
+    """Imports stopped at the task time limit do not stay PROCESSING."""
+
+    def setUp(self):
+        self.company = Company.objects.create(name="ACME")
+        spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        self.enterContext(override_settings(DATA_IMPORT_SPOOL_DIR=spool_dir.name))
+        self.spool_dir = spool_dir.name
+
+    def make_log(self, name: str, processing_for: int) -> ImportLog:
+        path = os.path.join(self.spool_dir, name)
+        open(path, "wb").close()
+        since = datetime.now(tz=timezone.utc) - timedelta(seconds=processing_for)
+        log = ImportLog.objects.create(
+            company=self.company,
+            file_type="movements",
+            original_filename=name,
+            status=ImportLog.ImportStatus.PROCESSING,
+            import_context={SPOOL_FILE_KEY: name, PROCESSING_SINCE_KEY: since.isoformat()},
+        )
+        # started_at is auto_now_add: queued a while before processing started
+        ImportLog.objects.filter(id=log.id).update(started_at=since - timedelta(hours=1))
+        return log
+
+    def test_fail_stale_imports(self):
+        stale = self.make_log("stale.xlsx", processing_for=700)
+        running = self.make_log("running.xlsx", processing_for=500)
+
+        self.assertEqual(fail_stale_imports(), 1)
+
+        stale.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual(stale.status, ImportLog.ImportStatus.FAILED)
+        self.assertIsNotNone(stale.completed_at)
+        self.assertEqual(running.status, ImportLog.ImportStatus.PROCESSING)
+        self.assertFalse(os.path.exists(os.path.join(self.spool_dir, "stale.xlsx")))
+        self.assertTrue(os.path.exists(os.path.join(self.spool_dir, "running.xlsx")))
+
+    def test_soft_time_limit_fails_log(self):
+        log = self.make_log("slow.xlsx", processing_for=0)
+        path = os.path.join(self.spool_dir, "slow.xlsx")
+
+        with mock.patch("celery_tasks.import_tasks.run_import", side_effect=SoftTimeLimitExceeded()):
+            status = import_excel_file.apply(args=(str(log.id), path)).get()
+
+        self.assertEqual(status, ImportLog.ImportStatus.FAILED)
+        log.refresh_from_db()
+        self.assertIn("600 seconds", log.error_details[0]["error"])
+        self.assertFalse(os.path.exists(path))
+
+
+class SoftDeleteVisibilityTests(TestCase):
+    """Snapshots marked deleted disappear before their lines are purged."""
+
+    def setUp(self):
+        self.company = Company.objects.create(name="ACME")
+        self.inventory = InventorySnapshot.objects.create(company=self.company, company_name="ACME")
+        InventorySnapshotLine.objects.create(
+            snapshot=self.inventory, product_code="EC0020", product_name="منتج", branch_name="الرئيسي",
+        )
+        self.aging = AgingSnapshot.objects.create(company=self.company)
+        AgingReceivable.objects.create(snapshot=self.aging, company=self.company, account="1141001 - عميل")
+
+    def discard(self, snapshot) -> None:
+        with self.captureOnCommitCallbacks() as callbacks:
+            discard_snapshots(type(snapshot).objects.filter(pk=snapshot.pk))
+        self.assertEqual(len(callbacks), 1)  # The purge is queued on commit
+
+    def test_deleted_inventory_hidden(self):
+        self.discard(self.inventory)
+
+        self.assertFalse(InventorySnapshot.objects.exists())
+        self.assertTrue(InventorySnapshot.all_objects.filter(pk=self.inventory.pk).exists())
+        self.assertFalse(InventorySnapshotLine.live.exists())
+        self.assertEqual(InventorySnapshotLine.objects.count(), 1)  # Awaiting purge
+
+        self.assertEqual(purge_snapshot("inventory.InventorySnapshot", self.inventory.pk), 1)
+        self.assertFalse(InventorySnapshot.all_objects.exists())
+        self.assertFalse(InventorySnapshotLine.objects.exists())
+
+    def test_deleted_aging_hidden(self):
+        self.discard(self.aging)
+
+        self.assertFalse(AgingSnapshot.objects.exists())
+        self.assertFalse(AgingReceivable.live.filter(company=self.company).exists())
+        self.assertEqual(AgingReceivable.objects.count(), 1)
+
+        self.assertEqual(purge_snapshot("aging.AgingSnapshot", self.aging.pk), 1)
+        self.assertFalse(AgingReceivable.objects.exists())
+
+    def test_live_lines_of_live_snapshots(self):
+        self.assertEqual(InventorySnapshotLine.live.count(), 1)
+        self.assertEqual(AgingReceivable.live.count(), 1)
+        self.assertEqual(list(self.inventory.lines.all()), list(InventorySnapshotLine.objects.all()))
+
+
+class DryRunSizeTests(TestCase):
+    """Dry runs are validated in the request: their size is capped."""
+
+    def setUp(self):
+        company = Company.objects.create(name="ACME")
+        user = User.objects.create(email="manager@x.tn", company=company, role="manager")
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.workbook = build_workbook().getvalue()
+
+    def dry_run(self):
+        upload = SimpleUploadedFile("branches.xlsx", self.workbook)
+        return self.client.post(
+            reverse("data_import:upload"),
+            {"file": upload, "dry_run": "true", "file_type": "branches"},
+            format="multipart",
+        )
+
+    def test_within_limit(self):
+        with override_settings(DATA_IMPORT_DRY_RUN_MAX_SIZE=len(self.workbook)):
+            response = self.dry_run()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("X-Import-Rows", response)
+
+    def test_over_limit(self):
+        with override_settings(DATA_IMPORT_DRY_RUN_MAX_SIZE=len(self.workbook) - 1):
+            response = self.dry_run()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("file", response.data)
+
+
+MOVEMENTS_HEADER = (
+    "الفهرس", "رمز المادة", "رمز المختبر", "اسم المادة", "التاريخ", "نوع الحركة",
+    "كمية الادخالات", "سعر الادخالات", "اجمالي الادخالات",
+    "كمية الاخراجات", "سعر الاخراجات", "اجمالي الاخراجات",
+    "سعر الرصيد", "الفرع", "اسم العميل",
+)
+
+
+def movement(code: str, day: int, qty: int) -> tuple:
+    """One sale line of a movements sheet (columns of MovementsParser.COLUMNS)."""
+    return (
+        "cat", code, None, f"منتج {code}", date(2025, 1, day), "ف بيع",
+        None, None, None, qty, 10, qty * 10, 7, "الفرع الرئيسي", "عميل 1",
+    )
+
+
+class MovementsReimportTests(TestCase):
+    """Re-imports pair live and staged rows on (content_hash, occurrence)."""
+
+    def setUp(self):
+        self.company = Company.objects.create(name="ACME")
+
+    def load(self, *rows) -> dict:
+        return MovementsParser().parse(iter([MOVEMENTS_HEADER, *rows]), self.company, {"load_method": "orm"})
+
+    def counts(self, result: dict) -> tuple:
+        return result["inserted"], result["unchanged"], result["removed"]
+
+    def test_identical_reimport_is_unchanged(self):
+        rows = (movement("EC0020", 5, 2), movement("EC0020", 5, 2), movement("EC0021", 6, 1))
+        self.assertEqual(self.counts(self.load(*rows)), (3, 0, 0))
+        ids = set(MaterialMovement.objects.values_list("id", flat=True))
+
+        self.assertEqual(self.counts(self.load(*rows)), (0, 3, 0))
+        self.assertEqual(set(MaterialMovement.objects.values_list("id", flat=True)), ids)
+        self.assertFalse(MaterialMovementStage.objects.exists())
+
+    def test_duplicates_pair_one_to_one(self):
+        self.load(movement("EC0020", 5, 2), movement("EC0020", 5, 2), movement("EC0021", 6, 1))
+
+        # One of the two identical lines is gone and EC0021 changed
+        result = self.load(movement("EC0020", 5, 2), movement("EC0021", 6, 4))
+
+        self.assertEqual(self.counts(result), (1, 1, 2))
+        self.assertEqual(
+            sorted(MaterialMovement.objects.values_list("material_code", "qty_out")),
+            [("EC0020", Decimal("2")), ("EC0021", Decimal("4"))],
+        )
+
+
+class InventoryParserTests(TestCase):
+    """Repeated branches and products of an inventory sheet are melted once."""
+
+    HEADER = (
+        "الفهرس", "رمز المادة", "اسم المادة",
+        "فرع أ", "قيمة أ", "فرع ب", "قيمة ب", "فرع أ", "قيمة أ",
+        "إجمالي كمية", "كلفة الشركة",
+    )
+
+    def test_repeated_branch_and_product(self):
+        company = Company.objects.create(name="ACME")
+        rows = [
+            self.HEADER,
+            ("cat", "P1", "منتج 1", 1, 10, 2, 20, 99, 990, 3, 10),
+            ("cat", "P1", "منتج 1 مكرر", 5, 50, 5, 50, 5, 50, 15, 10),
+            ("cat", "P2", "منتج 2", 0, 0, 4, 40, 0, 0, 4, 10),
+        ]
+
+        result = InventoryParser().parse(iter(rows), company, {"filename": "جرد_2025.xlsx", "load_method": "orm"})
+
+        self.assertEqual(result["branches_detected"], ["فرع أ", "فرع ب"])
+        self.assertEqual(result["created"], 4)
+        self.assertEqual(result["errors"], [])
+        lines = InventorySnapshotLine.objects.filter(snapshot_id=result["snapshot_id"])
+        self.assertEqual(
+            sorted(lines.values_list("product_code", "product_name", "branch_name", "quantity")),
+            [
+                ("P1", "منتج 1", "فرع أ", Decimal("1")),
+                ("P1", "منتج 1", "فرع ب", Decimal("2")),
+                ("P2", "منتج 2", "فرع أ", Decimal("0")),
+                ("P2", "منتج 2", "فرع ب", Decimal("4")),
+            ],
+        )
@@ -0,0 +1,304 @@
+"""
+apps/data_import/upload_views.py
+
+Chunked, resumable uploads for large Excel files.
+
+The client opens a session, PUTs the file in fixed-size chunks (any order,
+retrying only the chunks that failed) and completes the session, which
+queues the import exactly like /api/import/upload/.  Chunks are written in
+place into a pre-allocated file in DATA_IMPORT_SPOOL_DIR: the upload never
+sits in web worker memory and completion does not copy it again.
+
+A user has at most DATA_IMPORT_UPLOAD_MAX_OPEN_SESSIONS sessions open.
+Sessions left without a chunk for DATA_IMPORT_UPLOAD_SESSION_TTL seconds
+are deleted with their file (purge_stale_upload_sessions, run hourly by
+celery beat and before opening a session).
+
+Endpoints:
+    POST   /api/import/uploads/                        — Start a session
+    GET    /api/import/uploads/{id}/                   — Session state (missing chunks)
+    DELETE /api/import/uploads/{id}/                   — Abort and discard the file
+    PUT    /api/import/uploads/{id}/chunks/{index}/    — Raw bytes of one chunk
+    POST   /api/import/uploads/{id}/complete/          — Queue the import (202)
+"""
+
+import logging
+import os
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import UploadSession
+from .serializers import UploadSessionInitSerializer, UploadSessionSerializer
+from .services import (
+    find_duplicate,
+    hash_file,
+    purge_stale_upload_sessions,
+    queue_import,
+    spool_path,
+)
+from .views import (
+    allowed_import_types,
+    duplicate_response,
+    forbidden_type_response,
+    queued_response,
+)
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the request body per write
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+def _get_session(request, session_id):
+    """The caller's session *session_id*, or None."""
+    return UploadSession.objects.filter(
+        id=session_id,
+        company=request.user.company,
+        created_by=request.user,
+    ).first()
+
+
+def _not_found():
+    return Response({"error": "Upload session not found."}, status=status.HTTP_404_NOT_FOUND)
+
+
+def _not_open(session):
+    return Response(
+        {"error": f"Upload session is {session.status}."},
+        status=status.HTTP_409_CONFLICT,
+    )
+
+
+class UploadSessionCreateView(APIView):
+    """
+    POST /api/import/uploads/
+
+    Body (JSON): filename, file_size, optional chunk_size, file_type,
+    load_method and force.  Returns 201 with the session, its total_chunks
+    and missing_chunks, or 429 while the user already has
+    DATA_IMPORT_UPLOAD_MAX_OPEN_SESSIONS sessions open.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = UploadSessionInitSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        company = request.user.company
+        if not company:
+            return Response(
+                {"error": "Your account is not linked to a company. Contact your administrator."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        denied = forbidden_type_response(allowed_import_types(request.user), data.get("file_type"))
+        if denied:
+            return denied
+
+        purge_stale_upload_sessions(user=request.user)
+        open_sessions = UploadSession.objects.filter(
+            created_by=request.user,
+            status=UploadSession.SessionStatus.OPEN,
+        ).count()
+        if open_sessions >= settings.DATA_IMPORT_UPLOAD_MAX_OPEN_SESSIONS:
+            return Response(
+                {
+                    "error": (
+                        f"You already have {open_sessions} uploads in progress. "
+                        f"Complete or abort one of them first."
+                    ),
+                },
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+            )
+
+        path = spool_path(data["filename"].rsplit(".", 1)[-1].lower())
+        try:
+            # Pre-allocate: chunks are then written at their offset
+            with open(path, "wb") as fh:
+                fh.truncate(data["file_size"])
+        except OSError as e:
+            logger.exception(f"[UploadSessionCreateView] Cannot spool '{data['filename']}': {e}")
+            return Response(
+                {"error": "An unexpected error occurred during upload. Please try again."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        session = UploadSession.objects.create(
+            company=company,
+            created_by=request.user,
+            original_filename=data["filename"],
+            file_size=data["file_size"],
+            chunk_size=data.get("chunk_size") or settings.DATA_IMPORT_UPLOAD_CHUNK_SIZE,
+            file_type=data.get("file_type") or "",
+            load_method=data.get("load_method") or "",
+            force=data.get("force", False),
+            spool_path=path,
+        )
+        logger.info(
+            f"[UploadSessionCreateView] Session {session.id} opened for "
+            f"'{session.original_filename}' ({session.total_chunks} chunks)."
+        )
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+
+class UploadSessionDetailView(APIView):
+    """
+    GET    /api/import/uploads/{id}/ — state, to resume an interrupted upload
+    DELETE /api/import/uploads/{id}/ — abort an open session
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, session_id):
+        session = _get_session(request, session_id)
+        if not session:
+            return _not_found()
+        return Response(UploadSessionSerializer(session).data)
+
+    def delete(self, request, session_id):
+        session = _get_session(request, session_id)
+        if not session:
+            return _not_found()
+        if session.status != UploadSession.SessionStatus.OPEN:
+            return _not_open(session)
+
+        session.status = UploadSession.SessionStatus.ABORTED
+        session.save(update_fields=["status", "updated_at"])
+        try:
+            os.remove(session.spool_path)
+        except FileNotFoundError:
+            pass
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadChunkView(APIView):
+    """
+    PUT /api/import/uploads/{id}/chunks/{index}/
+
+    The request body is the raw chunk (application/octet-stream).  Every
+    chunk but the last must be exactly chunk_size bytes.  Re-sending a
+    chunk overwrites it, so a failed PUT can simply be retried.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def put(self, request, session_id, index):
+        session = _get_session(request, session_id)
+        if not session:
+            return _not_found()
+        if session.status != UploadSession.SessionStatus.OPEN:
+            return _not_open(session)
+        if index >= session.total_chunks:
+            return Response(
+                {"error": f"Chunk index out of range (0–{session.total_chunks - 1})."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        expected = session.chunk_length(index)
+        written = 0
+        # Streamed from the socket straight to its offset in the spool file;
+        # request.data is never touched, so no parser buffers the body.
+        stream = request.stream
+        with open(session.spool_path, "r+b") as fh:
+            fh.seek(index * session.chunk_size)
+            while stream is not None and written <= expected:
+                block = stream.read(STREAM_BLOCK_SIZE)
+                if not block:
+                    break
+                # Never write past the chunk: an oversized body is rejected below
+                fh.write(block[:max(0, expected - written)])
+                written += len(block)
+
+        if written != expected:
+            return Response(
+                {"error": f"Chunk {index} must be {expected} bytes, received {written}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(id=session.id)
+            if index not in session.received_chunks:
+                session.received_chunks = sorted(session.received_chunks + [index])
+                session.save(update_fields=["received_chunks", "updated_at"])
+
+        return Response(
+            {
+                "index":           index,
+                "received":        len(session.received_chunks),
+                "total_chunks":    session.total_chunks,
+                "missing_chunks":  session.missing_chunks,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class UploadSessionCompleteView(APIView):
+    """
+    POST /api/import/uploads/{id}/complete/
+
+    Once every chunk is received, hashes the assembled file and either
+    returns the previous identical import (200, unless the session was
+    opened with force=true) or queues the import and returns 202 with the
+    PENDING ImportLog, as /api/import/upload/ does.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, session_id):
+        with transaction.atomic():
+            session = (
+                UploadSession.objects
+                .select_for_update()
+                .filter(id=session_id, company=request.user.company, created_by=request.user)
+                .first()
+            )
+            if not session:
+                return _not_found()
+            if session.status != UploadSession.SessionStatus.OPEN:
+                return _not_open(session)
+            if session.missing_chunks:
+                return Response(
+                    {
+                        "error":          "Upload is incomplete.",
+                        "missing_chunks": session.missing_chunks,
+                    },
+                    status=status.HTTP_409_CONFLICT,
+                )
+
+            file_hash = hash_file(session.spool_path)
+            file_type = session.file_type or None
+
+            if not session.force:
+                previous = find_duplicate(
+                    session.company, file_hash, session.original_filename, file_type
+                )
+                if previous:
+                    session.status = UploadSession.SessionStatus.COMPLETED
+                    session.import_log = previous
+                    session.save(update_fields=["status", "import_log", "updated_at"])
+                    try:
+                        os.remove(session.spool_path)
+                    except FileNotFoundError:
+                        pass
+                    return duplicate_response(previous, session.original_filename)
+
+            # The import task owns (and deletes) the spooled file from here
+            log = queue_import(
+                company=session.company,
+                user=request.user,
+                path=session.spool_path,
+                filename=session.original_filename,
+                file_hash=file_hash,
+                file_type=file_type,
+                load_method=session.load_method or None,
+                allowed_types=allowed_import_types(request.user),
+            )
+            session.status = UploadSession.SessionStatus.COMPLETED
+            session.import_log = log
+            session.save(update_fields=["status", "import_log", "updated_at"])
+
+        return queued_response(request, log)
@@ -5,20 +5,47 @@ from .views import (
     DetectFileTypeView,
     ImportLogListView,
     ImportLogDetailView,
+    ImportLogProgressView,
+    ImportLogStatsView,
+)
+from .upload_views import (
+    UploadSessionCreateView,
+    UploadSessionDetailView,
+    UploadChunkView,
+    UploadSessionCompleteView,
 )
 
 app_name = "data_import"
 
 urlpatterns = [
-    # POST /api/import/upload/    → Upload et traitement du fichier Excel
+    # POST /api/import/upload/    → Upload du fichier Excel, import en tâche de fond (202)
     path('upload/', ExcelUploadView.as_view(), name='upload'),
 
     # GET /api/import/logs/        → Liste des historiques d'import pour la société
     path('logs/', ImportLogListView.as_view(), name='logs-list'),
 
+    # GET /api/import/logs/stats/  → Débit des imports (lignes/s, durée par phase, mémoire)
+    path('logs/stats/', ImportLogStatsView.as_view(), name='logs-stats'),
+
     # GET /api/import/logs/{id}/   → Détails d'un import spécifique
     # DELETE /api/import/logs/{id}/ → Suppression d'un log d'import
-    path('logs/<int:log_id>/', ImportLogDetailView.as_view(), name='logs-detail'),
+    path('logs/<uuid:log_id>/', ImportLogDetailView.as_view(), name='logs-detail'),
+
+    # GET /api/import/logs/{id}/progress/ → Avancement d'un import en cours
+    path('logs/<uuid:log_id>/progress/', ImportLogProgressView.as_view(), name='logs-progress'),
+
+    # POST /api/import/uploads/    → Ouverture d'un upload par morceaux (gros fichiers)
+    path('uploads/', UploadSessionCreateView.as_view(), name='uploads-create'),
+
+    # GET /api/import/uploads/{id}/    → État de la session (morceaux manquants, reprise)
+    # DELETE /api/import/uploads/{id}/ → Abandon de l'upload
+    path('uploads/<uuid:session_id>/', UploadSessionDetailView.as_view(), name='uploads-detail'),
+
+    # PUT /api/import/uploads/{id}/chunks/{n}/ → Envoi du morceau n (octets bruts)
+    path('uploads/<uuid:session_id>/chunks/<int:index>/', UploadChunkView.as_view(), name='uploads-chunk'),
+
+    # POST /api/import/uploads/{id}/complete/ → Fin de l'upload, import en tâche de fond (202)
+    path('uploads/<uuid:session_id>/complete/', UploadSessionCompleteView.as_view(), name='uploads-complete'),
 
     # POST /api/import/detect/     → Détection du type de fichier + preview (sans import)
     path('detect/', DetectFileTypeView.as_view(), name='detect'),
@@ -4,26 +4,45 @@ apps/data_import/views.py
 Upload and import endpoints for Excel files.
 
 Endpoints:
-    POST   /api/import/upload/        — Upload and process a single Excel file
+    POST   /api/import/upload/        — Upload a single Excel file (imported asynchronously)
+                                        or, with dry_run=true, validate it and get the failing rows
     GET    /api/import/logs/          — List import history for the company
     GET    /api/import/logs/{id}/     — Detail of a single import log
     DELETE /api/import/logs/{id}/     — Remove an import log record
+    GET    /api/import/logs/{id}/progress/ — Status and percent complete of an import
+    GET    /api/import/logs/stats/    — Import throughput per file type over time
     GET    /api/import/detect/        — Detect file type without importing (preview)
+
+Chunked uploads of large files: see upload_views.py (/api/import/uploads/).
 """
 
 import logging
-from datetime import datetime, timezone
+import os
+import tempfile
+from itertools import islice
 
+from django.conf import settings
+from django.http import FileResponse
+from django.urls import reverse
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .dry_run import validate_upload, write_error_workbook
 from .models import ImportLog
 from .serializers import ImportLogSerializer, ImportUploadSerializer
-from .parsers.excel_parser import parse_excel_file, detect_file_type
-import openpyxl
+from .parsers.excel_parser import detect_file_type
+from .readers import get_reader
+from .services import (
+    build_message,
+    find_duplicate,
+    import_stats,
+    progress_percent,
+    queue_import,
+    save_upload,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -33,8 +52,20 @@ class ExcelUploadView(APIView):
     POST /api/import/upload/
 
     Accepts a multipart form upload with an Excel file.
-    Automatically detects the file type and triggers the appropriate parser.
-    Creates an ImportLog entry and returns the result.
+    The file is spooled to disk and imported in the background by a Celery
+    task; the response is 202 Accepted with the PENDING ImportLog, whose
+    progress can be polled on /api/import/logs/{id}/progress/.
+
+    If the same file (SHA-256) is the company's latest successful import
+    of its type, the previous ImportLog is returned with 200 and nothing is
+    re-imported, unless force=true is sent.
+
+    With dry_run=true nothing is queued or written: the file is converted
+    and validated right away and the response (200) is an xlsx of the rows
+    the import would reject, each with its Excel row number and error
+    (only the header row when the file is clean).  The X-Import-Rows and
+    X-Import-Errors headers carry the row and error counts.  It runs in the
+    request, so files over DATA_IMPORT_DRY_RUN_MAX_SIZE are refused (400).
 
     Access rules:
         - Admin   : can import any file type
@@ -44,8 +75,6 @@ class ExcelUploadView(APIView):
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
-    AGENT_ALLOWED_TYPES = {"movements", "inventory"}
-
     def post(self, request):
         serializer = ImportUploadSerializer(data=request.data)
         if not serializer.is_valid():
@@ -60,139 +89,142 @@ class ExcelUploadView(APIView):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        # Create import log (pending)
-        log = ImportLog.objects.create(
-            company=company,
-            imported_by=request.user,
-            file_type=file_type_override or "movements",  # Placeholder until detected
-            original_filename=file_obj.name,
-            status=ImportLog.ImportStatus.PROCESSING,
-            import_context={},
-        )
+        # Enforce agent file type restrictions up front when the type is
+        # forced; detected types are checked by the task before parsing.
+        allowed_types = allowed_import_types(request.user)
+        denied = forbidden_type_response(allowed_types, file_type_override)
+        if denied:
+            return denied
+
+        if serializer.validated_data.get("dry_run"):
+            return self._dry_run(request, file_obj, file_type_override, allowed_types)
 
         try:
-            result = parse_excel_file(
-                file_obj=file_obj,
-                filename=file_obj.name,
-                company=company,
-                file_type=file_type_override,
-                extra_context={"user": request.user, "filename": file_obj.name},
+            path, file_hash = save_upload(file_obj)
+        except OSError as e:
+            logger.exception(f"[ExcelUploadView] Cannot spool '{file_obj.name}': {e}")
+            return Response(
+                {"error": "An unexpected error occurred during import. Please try again."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
-            # Enforce agent file type restrictions
-            detected_type = result["file_type"]
-            if (
-                request.user.is_agent
-                and detected_type not in self.AGENT_ALLOWED_TYPES
-            ):
-                log.status = ImportLog.ImportStatus.FAILED
-                log.error_details = [{"error": "Agents can only import movements and inventory files."}]
-                log.completed_at = datetime.now(tz=timezone.utc)
-                log.save()
-                return Response(
-                    {
-                        "error": (
-                            f"As an agent, you are not allowed to import "
-                            f"'{detected_type}' files. Allowed types: "
-                            f"{', '.join(self.AGENT_ALLOWED_TYPES)}."
-                        )
-                    },
-                    status=status.HTTP_403_FORBIDDEN,
-                )
+        # ── Identical file already imported → return the previous result ──
+        if not serializer.validated_data.get("force"):
+            previous = find_duplicate(company, file_hash, file_obj.name, file_type_override)
+            if previous:
+                os.remove(path)
+                return duplicate_response(previous, file_obj.name)
 
-            # ── Update ImportLog with results ──────────────────────────
-            errors_list = result.get("errors", [])
-            has_errors  = len(errors_list) > 0
-
-            log.file_type     = detected_type
-            log.row_count     = result["total"]
-            if result["file_type"] == "inventory":
-                log.success_count = result.get("products_count", result.get("total", 0))
-            else:
-                log.success_count = result.get("created", 0) + result.get("updated", 0)
-            log.error_count   = len(errors_list)
-            log.error_details = errors_list[:100]
-
-            # Persist extra upsert metadata (date_range, deactivated, etc.)
-            log.import_context.update({
-                k: v for k, v in result.items()
-                if k in ("date_range", "deleted_existing", "deleted_stale",
-                         "deactivated")
-            })
-
-            log.status = (
-                ImportLog.ImportStatus.PARTIAL  if has_errors and log.success_count > 0
-                else ImportLog.ImportStatus.FAILED   if has_errors and log.success_count == 0
-                else ImportLog.ImportStatus.SUCCESS
-            )
-            log.completed_at = datetime.now(tz=timezone.utc)
-            log.save()
-
-            logger.info(
-                f"[ExcelUploadView] Import complete: '{file_obj.name}' "
-                f"({detected_type}) for company '{company.name}' "
-                f"— created={result.get('created', 0)} updated={result.get('updated', 0)} "
-                f"errors={log.error_count}."
-            )
+        log = queue_import(
+            company=company,
+            user=request.user,
+            path=path,
+            filename=file_obj.name,
+            file_hash=file_hash,
+            file_type=file_type_override,
+            load_method=serializer.validated_data.get("load_method"),
+            allowed_types=allowed_types,
+        )
+        return queued_response(request, log)
 
-            return Response(
-                {
-                    "message":    self._build_message(log),
-                    "import_log": ImportLogSerializer(log).data,
-                    "result": {
-                        "file_type":      detected_type,
-                        "total_rows":     result["total"],
-                        "created":        result.get("created", 0),
-                        "updated":        result.get("updated", 0),
-                        # Type-specific metadata
-                        "deactivated":        result.get("deactivated"),        # customers
-                        "deleted_stale":      result.get("deleted_stale"),      # aging
-                        "deleted_existing":   result.get("deleted_existing"),   # movements
-                        "date_range":         result.get("date_range"),         # movements
-                        "snapshot_id":        result.get("snapshot_id"),        # inventory / aging
-                        "inventory_year":     result.get("inventory_year"),     # inventory
-                        "aging_year":         result.get("aging_year"),         # aging
-                        "branches_detected":  result.get("branches_detected"),  # inventory
-                        "errors":             errors_list[:20],
-                    },
-                },
-                status=status.HTTP_201_CREATED,
+    def _dry_run(self, request, file_obj, file_type, allowed_types):
+        try:
+            result = validate_upload(
+                file_obj,
+                file_obj.name,
+                request.user.company,
+                user=request.user,
+                file_type=file_type,
+                allowed_types=allowed_types,
             )
-
+        except PermissionError as e:
+            return Response({"error": str(e)}, status=status.HTTP_403_FORBIDDEN)
         except ValueError as e:
-            log.status = ImportLog.ImportStatus.FAILED
-            log.error_details = [{"error": str(e)}]
-            log.completed_at = datetime.now(tz=timezone.utc)
-            log.save()
-            return Response(
-                {"error": str(e), "import_log_id": str(log.id)},
-                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            )
-
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            logger.exception(f"[ExcelUploadView] Unexpected error: {e}")
-            log.status = ImportLog.ImportStatus.FAILED
-            log.error_details = [{"error": f"Internal error: {str(e)}"}]
-            log.completed_at = datetime.now(tz=timezone.utc)
-            log.save()
+            logger.exception(f"[ExcelUploadView] Dry run failed on '{file_obj.name}': {e}")
             return Response(
-                {"error": "An unexpected error occurred during import. Please try again."},
+                {"error": "An unexpected error occurred during validation. Please try again."},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
-    @staticmethod
-    def _build_message(log: ImportLog) -> str:
-        if log.status == ImportLog.ImportStatus.SUCCESS:
-            return (
-                f"Import successful: {log.success_count} records imported "
-                f"from '{log.original_filename}'."
-            )
-        if log.status == ImportLog.ImportStatus.PARTIAL:
-            return (
-                f"Partial import: {log.success_count} records imported, "
-                f"{log.error_count} rows failed."
-            )
-        return f"Import failed: {log.error_count} errors encountered."
+        # Built on disk and streamed; the file is removed once sent
+        os.makedirs(settings.DATA_IMPORT_SPOOL_DIR, exist_ok=True)
+        fh = tempfile.TemporaryFile(dir=settings.DATA_IMPORT_SPOOL_DIR, suffix=".xlsx")
+        error_count = write_error_workbook(result, fh)
+        fh.seek(0)
+
+        logger.info(
+            f"[ExcelUploadView] Dry run of '{file_obj.name}' ({result['file_type']}): "
+            f"{result.get('total', 0)} rows, {error_count} errors."
+        )
+        response = FileResponse(
+            fh,
+            as_attachment=True,
+            filename=f"{os.path.splitext(file_obj.name)[0]}_errors.xlsx",
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+        response["X-Import-File-Type"] = result["file_type"]
+        response["X-Import-Rows"] = str(result.get("total", 0))
+        response["X-Import-Errors"] = str(error_count)
+        return response
+
+
+# ── Shared by the upload endpoints (see also upload_views.py) ────────────────
+
+AGENT_ALLOWED_TYPES = {"movements", "inventory"}
+
+
+def allowed_import_types(user):
+    """File types *user* may import, or None for no restriction."""
+    return AGENT_ALLOWED_TYPES if user.is_agent else None
+
+
+def forbidden_type_response(allowed_types, file_type):
+    if allowed_types and file_type and file_type not in allowed_types:
+        return Response(
+            {
+                "error": (
+                    f"As an agent, you are not allowed to import "
+                    f"'{file_type}' files. Allowed types: "
+                    f"{', '.join(allowed_types)}."
+                )
+            },
+            status=status.HTTP_403_FORBIDDEN,
+        )
+    return None
+
+
+def duplicate_response(previous: ImportLog, filename: str) -> Response:
+    logger.info(f"[upload] '{filename}' is identical to import {previous.id} — skipped.")
+    return Response(
+        {
+            "message": (
+                f"This file was already imported on "
+                f"{previous.started_at:%Y-%m-%d %H:%M}. "
+                f"Nothing to do — send force=true to import it again."
+            ),
+            "duplicate_of":  str(previous.id),
+            "import_log_id": str(previous.id),
+            "import_log":    ImportLogSerializer(previous).data,
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+def queued_response(request, log: ImportLog) -> Response:
+    log.refresh_from_db()
+    return Response(
+        {
+            "message":       build_message(log),
+            "import_log_id": str(log.id),
+            "import_log":    ImportLogSerializer(log).data,
+            "progress_url":  request.build_absolute_uri(
+                reverse("data_import:logs-progress", args=[log.id])
+            ),
+        },
+        status=status.HTTP_202_ACCEPTED,
+    )
 
 
 class DetectFileTypeView(APIView):
@@ -202,10 +234,16 @@ class DetectFileTypeView(APIView):
     Accepts a file upload and returns the detected file type + preview
     of the first 5 rows WITHOUT persisting any data.
     Useful for UI validation before actual import.
+
+    Only the header and the preview rows are read, so the call takes the
+    same time whatever the file size; total_rows_estimate comes from the
+    sheet dimension (a streaming count is used when the file has none).
     """
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
+    PREVIEW_ROWS = 5
+
     def post(self, request):
         file_obj = request.FILES.get("file")
         if not file_obj:
@@ -222,35 +260,36 @@ class DetectFileTypeView(APIView):
             )
 
         try:
-            wb = openpyxl.load_workbook(file_obj, read_only=True, data_only=True)
-            ws = wb.active
-            all_rows = list(ws.iter_rows(values_only=True))
-            wb.close()
+            # openpyxl on purpose: its read-only mode parses rows lazily,
+            # whereas calamine loads the whole sheet up front.
+            with get_reader(file_obj, "openpyxl") as reader:
+                rows = reader.rows()
+                header_row = next(rows, None)
+                preview_rows = list(islice(rows, self.PREVIEW_ROWS))
+
+                if reader.max_row:
+                    total_rows_estimate = max(reader.max_row - 1, 0)
+                else:
+                    # No <dimension> in the file → count rows without
+                    # looking at their cells
+                    total_rows_estimate = len(preview_rows) + sum(1 for _ in rows)
         except Exception as e:
             return Response(
                 {"error": f"Cannot read file: {e}"},
                 status=status.HTTP_422_UNPROCESSABLE_ENTITY,
             )
 
-        if not all_rows:
+        if header_row is None:
             return Response(
                 {"error": "The uploaded file is empty."},
                 status=status.HTTP_422_UNPROCESSABLE_ENTITY,
             )
 
-        header_row = all_rows[0]
         detected_type = detect_file_type(file_obj.name, header_row)
 
-        # Compte uniquement les lignes de données non vides (hors en-tête)
-        data_rows = [
-            r for r in all_rows[1:]
-            if r and any(cell is not None and str(cell).strip() != "" for cell in r)
-        ]
-        actual_row_count = len(data_rows)
-
         headers = [str(h or "") for h in header_row]
         preview = []
-        for row in all_rows[1:6]:
+        for row in preview_rows:
             preview.append(dict(zip(headers, [str(v or "") for v in row])))
 
         return Response({
@@ -258,7 +297,7 @@ class DetectFileTypeView(APIView):
             "detected_file_type": detected_type,
             "headers": headers,
             "preview_rows": preview,
-            "total_rows_estimate": actual_row_count,
+            "total_rows_estimate": total_rows_estimate,
         })
 
 class ImportLogListView(APIView):
@@ -313,3 +352,61 @@ class ImportLogDetailView(APIView):
             return Response({"error": "Import log not found."}, status=status.HTTP_404_NOT_FOUND)
         log.delete()
         return Response({"message": "Import log deleted."}, status=status.HTTP_200_OK)
+
+
+class ImportLogProgressView(APIView):
+    """
+    GET /api/import/logs/{id}/progress/
+    Lightweight polling endpoint for a running import.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, log_id):
+        try:
+            log = ImportLog.objects.get(id=log_id, company=request.user.company)
+        except ImportLog.DoesNotExist:
+            return Response({"error": "Import log not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            "id":            str(log.id),
+            "status":        log.status,
+            "file_type":     log.file_type,
+            "row_count":     log.row_count,
+            "success_count": log.success_count,
+            "error_count":   log.error_count,
+            "expected_rows": log.import_context.get("expected_rows"),
+            "percent":       progress_percent(log),
+            "message":       build_message(log),
+            "completed_at":  log.completed_at,
+        })
+
+
+class ImportLogStatsView(APIView):
+    """
+    GET /api/import/logs/stats/?days=30&period=day|week&file_type=movements
+
+    Throughput of the company's finished imports: rows/second, phase
+    timings (read, convert, dimensions, delete, insert, post) and peak
+    memory, per file type and per day or week — to track ingest
+    performance and spot regressions.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            days = int(request.query_params.get("days", 30))
+        except ValueError:
+            return Response({"error": "days must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= days <= 366:
+            return Response({"error": "days must be between 1 and 366."}, status=status.HTTP_400_BAD_REQUEST)
+
+        period = request.query_params.get("period", "day")
+        if period not in ("day", "week"):
+            return Response({"error": "period must be 'day' or 'week'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(import_stats(
+            request.user.company,
+            days=days,
+            file_type=request.query_params.get("file_type") or None,
+            period=period,
+        ))
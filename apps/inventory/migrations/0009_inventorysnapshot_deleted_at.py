@@ -0,0 +1,18 @@
+# Generated by Django 5.0.4 on 2026-10-16 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_alter_inventorysnapshot_label'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventorysnapshot',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Set when the snapshot is deleted; its lines are purged in the background.', null=True, verbose_name='Deleted At'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.4 on 2026-10-16 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_inventorysnapshot_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventorysnapshotline',
+            name='product_name_key',
+            field=models.CharField(blank=True, default='', editable=False, help_text='product_name stripped and lower-cased: join key with movements.', max_length=500, verbose_name='Product Name Key'),
+        ),
+        migrations.AddIndex(
+            model_name='inventorysnapshotline',
+            index=models.Index(fields=['snapshot', 'product_name_key'], name='inventory_s_snapsho_2617ba_idx'),
+        ),
+    ]
@@ -2,6 +2,8 @@ import uuid
 from django.conf import settings
 from django.db import models
 
+from apps.data_import.managers import LiveLineManager, LiveSnapshotManager
+
 
 class InventorySnapshot(models.Model):
     """
@@ -9,6 +11,10 @@ class InventorySnapshot(models.Model):
 
     Fully autonomous — no FK to companies_company, no FK to branches_branch.
     company_name and branch names are stored as plain text.
+
+    Deleting a snapshot (API or re-import) only sets deleted_at; its lines
+    are purged in the background (apps/data_import/purge.py).  `objects`
+    never returns deleted snapshots, `all_objects` does.
     """
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -67,6 +73,16 @@ class InventorySnapshot(models.Model):
         related_name="inventory_snapshots",
         verbose_name="Uploaded By",
     )
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Deleted At",
+        help_text="Set when the snapshot is deleted; its lines are purged in the background.",
+    )
+
+    objects = LiveSnapshotManager()
+    all_objects = models.Manager()
 
     class Meta:
         db_table = "inventory_snapshot"
@@ -84,6 +100,9 @@ class InventorySnapshotLine(models.Model):
 
     Produced by melting a horizontal Excel row into vertical lines.
     branch_name is plain text — no FK to branches_branch.
+
+    `objects` includes the lines of deleted snapshots awaiting purge; use
+    `live` unless the query is scoped to a live snapshot.
     """
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -118,6 +137,14 @@ class InventorySnapshotLine(models.Model):
     line_value = models.DecimalField(
         max_digits=18, decimal_places=4, default=0, verbose_name="Line Value",
     )
+    product_name_key = models.CharField(
+        max_length=500, blank=True, default="", editable=False,
+        verbose_name="Product Name Key",
+        help_text="product_name stripped and lower-cased: join key with movements.",
+    )
+
+    objects = models.Manager()
+    live = LiveLineManager()
 
     class Meta:
         db_table = "inventory_snapshot_line"
@@ -125,6 +152,9 @@ class InventorySnapshotLine(models.Model):
         verbose_name_plural = "Inventory Snapshot Lines"
         ordering = ["product_code", "branch_name"]
         unique_together = [("snapshot", "product_code", "branch_name")]
+        indexes = [
+            models.Index(fields=["snapshot", "product_name_key"]),
+        ]
 
     def __str__(self):
         return f"{self.product_code} | {self.branch_name} | qty={self.quantity}"
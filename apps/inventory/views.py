@@ -112,7 +112,9 @@ class InventoryDetailView(APIView):
             )
         except InventorySnapshot.DoesNotExist:
             return Response({"error": "Snapshot not found."}, status=status.HTTP_404_NOT_FOUND)
-        snapshot.delete()
+        # Hidden at once; its lines are purged in the background
+        from apps.data_import.purge import discard_snapshots
+        discard_snapshots(InventorySnapshot.objects.filter(pk=snapshot.pk))
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -203,7 +205,7 @@ class InventoryBranchSummaryView(APIView):
         if err:
             return err
 
-        qs = InventorySnapshotLine.objects.filter(
+        qs = InventorySnapshotLine.live.filter(
             snapshot__company_name=company_name,
         )
 
@@ -271,7 +273,7 @@ class InventoryCategoryBreakdownView(APIView):
         if err:
             return err
 
-        qs = InventorySnapshotLine.objects.filter(
+        qs = InventorySnapshotLine.live.filter(
             snapshot__company_name=company_name,
         )
 
@@ -0,0 +1,170 @@
+"""
+apps/kpi/facts.py
+
+Maintenance of the DailySalesFact and MonthlySalesFact rollups.
+
+    refresh_sales_facts(company_id, date_from, date_to)
+        — deletes the company's daily facts in [date_from, date_to] and
+          rebuilds them from the movements with one
+          INSERT ... SELECT ... GROUP BY, then rebuilds the monthly facts
+          of every month the range touches from the daily facts
+
+MovementsParser calls it for the imported date range as soon as the
+transaction that promotes an import commits, and backfill_classification
+once the classification columns are rewritten.
+`python manage.py rebuild_sales_facts` rebuilds every company's facts
+(after the migration that adds the tables, or to repair them).
+
+Monthly charts read monthly_facts(), which falls back to the daily facts
+when the requested range does not cover whole months.
+"""
+
+from datetime import date, timedelta
+
+from django.db import connection, transaction
+from django.db.models import BooleanField, Case, Q, Sum, Value, When
+from django.db.models.functions import TruncMonth
+
+from .models import DailySalesFact, MonthlySalesFact
+
+# Fact column → movement expression; the first KEY_COLUMNS are grouped on
+KEY_COLUMNS = (
+    ("company_id",        "company_id"),
+    ("date",              "movement_date"),
+    ("branch_id",         "branch_id"),
+    ("material_code",     "material_code"),
+    ("material_name",     "material_name"),
+    ("material_name_key", "material_name_key"),
+    ("category",          "category"),
+    ("customer_name",     "customer_name"),
+    ("movement_kind",     "movement_kind"),
+    ("is_cash_customer",  "is_cash_customer"),
+)
+MEASURE_COLUMNS = (
+    ("qty_in",     "SUM(qty_in)"),
+    ("qty_out",    "SUM(qty_out)"),
+    ("total_in",   "SUM(total_in)"),
+    ("total_out",  "SUM(total_out)"),
+    ("sale_value", "SUM(COALESCE(price_out, 0) * COALESCE(qty_out, 0))"),
+    ("cost",       "SUM(COALESCE(balance_price, 0) * COALESCE(qty_out, 0))"),
+    ("line_count", "COUNT(*)"),
+)
+
+
+def refresh_sales_facts(company_id, date_from: date, date_to: date) -> int:
+    """
+    Rebuild the daily facts of *company_id* for [date_from, date_to] from
+    its movements, then the monthly facts of the months concerned.
+    Returns the number of daily fact rows written.
+    """
+    from apps.transactions.models import MaterialMovement
+
+    quote = connection.ops.quote_name
+    columns = KEY_COLUMNS + MEASURE_COLUMNS
+    sql = f"""
+        INSERT INTO {quote(DailySalesFact._meta.db_table)}
+            ({", ".join(quote(column) for column, _ in columns)})
+        SELECT {", ".join(expression for _, expression in columns)}
+        FROM {quote(MaterialMovement._meta.db_table)}
+        WHERE company_id = %s AND movement_date BETWEEN %s AND %s
+        GROUP BY {", ".join(expression for _, expression in KEY_COLUMNS)}
+    """
+    params = [
+        MaterialMovement._meta.get_field("company").get_db_prep_value(company_id, connection),
+        date_from,
+        date_to,
+    ]
+    with transaction.atomic():
+        DailySalesFact.objects.filter(company_id=company_id, date__range=(date_from, date_to)).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            written = cursor.rowcount
+        refresh_monthly_facts(company_id, date_from, date_to)
+    return written
+
+
+def refresh_monthly_facts(company_id, date_from: date, date_to: date) -> int:
+    """
+    Rebuild the monthly facts of *company_id* for every month overlapping
+    [date_from, date_to] from the daily facts.  Returns the number of
+    monthly fact rows written.
+    """
+    first, last = date_from.replace(day=1), _month_end(date_to)
+    rows = (
+        DailySalesFact.objects
+        .filter(company_id=company_id, date__range=(first, last))
+        .annotate(
+            fact_month=TruncMonth("date"),
+            named=Case(
+                When(Q(customer_name__isnull=True) | Q(customer_name=""), then=Value(False)),
+                default=Value(True),
+                output_field=BooleanField(),
+            ),
+        )
+        .values("fact_month", "branch_id", "category", "movement_kind", "named")
+        .annotate(
+            sum_qty_in=Sum("qty_in"),
+            sum_qty_out=Sum("qty_out"),
+            sum_total_in=Sum("total_in"),
+            sum_total_out=Sum("total_out"),
+            sum_sale_value=Sum("sale_value"),
+            sum_cost=Sum("cost"),
+            sum_line_count=Sum("line_count"),
+        )
+        .order_by()
+    )
+    facts = [
+        MonthlySalesFact(
+            company_id=company_id,
+            month=row["fact_month"],
+            branch_id=row["branch_id"],
+            category=row["category"],
+            movement_kind=row["movement_kind"],
+            has_customer=row["named"],
+            qty_in=row["sum_qty_in"],
+            qty_out=row["sum_qty_out"],
+            total_in=row["sum_total_in"],
+            total_out=row["sum_total_out"],
+            sale_value=row["sum_sale_value"],
+            cost=row["sum_cost"],
+            line_count=row["sum_line_count"],
+        )
+        for row in rows
+    ]
+    with transaction.atomic():
+        MonthlySalesFact.objects.filter(company_id=company_id, month__range=(first, last)).delete()
+        MonthlySalesFact.objects.bulk_create(facts, batch_size=1000)
+    return len(facts)
+
+
+def monthly_facts(company, date_from: date = None, date_to: date = None):
+    """
+    Facts of *company* in [date_from, date_to] (either bound optional),
+    each with a "month" (first day of the month) to group on.
+
+    MonthlySalesFact when the range covers whole months, else the daily
+    facts truncated to the month: both carry branch, category,
+    movement_kind and the same measures.
+    """
+    whole_months = (
+        (date_from is None or date_from.day == 1)
+        and (date_to is None or date_to == _month_end(date_to))
+    )
+    if whole_months:
+        qs = MonthlySalesFact.objects.filter(company=company)
+        if date_from:
+            qs = qs.filter(month__gte=date_from)
+        if date_to:
+            qs = qs.filter(month__lte=date_to)
+        return qs
+
+    qs = DailySalesFact.objects.filter(company=company).annotate(month=TruncMonth("date"))
+    if date_from:
+        qs = qs.filter(date__gte=date_from)
+    if date_to:
+        qs = qs.filter(date__lte=date_to)
+    return qs
+
+
+def _month_end(day: date) -> date:
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
@@ -0,0 +1,61 @@
+"""
+apps/kpi/management/commands/rebuild_sales_facts.py
+
+Rebuilds the DailySalesFact and MonthlySalesFact rollups (see
+apps/kpi/facts.py) from the movements already in the database, one company and one year at a time,
+each in its own transaction.
+
+Imports keep the facts up to date; run this once after the migration
+that adds a table, or to repair the facts of a company.
+
+Usage:
+    python manage.py rebuild_sales_facts
+    python manage.py rebuild_sales_facts --company <company_id>
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+
+from apps.kpi.facts import refresh_sales_facts
+from apps.kpi.models import DailySalesFact, MonthlySalesFact
+from apps.transactions.models import MaterialMovement
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily sales facts from the movements."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", help="Only rebuild this company (id).")
+
+    def handle(self, *args, **options):
+        movements = MaterialMovement.objects.all()
+        facts = DailySalesFact.objects.all()
+        months = MonthlySalesFact.objects.all()
+        if options["company"]:
+            movements = movements.filter(company_id=options["company"])
+            facts = facts.filter(company_id=options["company"])
+            months = months.filter(company_id=options["company"])
+
+        ranges = {
+            row["company_id"]: (row["first"], row["last"])
+            for row in movements.values("company_id").annotate(
+                first=Min("movement_date"), last=Max("movement_date"),
+            )
+        }
+        # Facts of companies without movements any more
+        facts.exclude(company_id__in=list(ranges)).delete()
+        months.exclude(company_id__in=list(ranges)).delete()
+
+        for company_id, (first, last) in ranges.items():
+            facts.filter(company_id=company_id).exclude(date__range=(first, last)).delete()
+            months.filter(company_id=company_id).exclude(month__range=(first.replace(day=1), last)).delete()
+            written = 0
+            for year in range(first.year, last.year + 1):
+                written += refresh_sales_facts(
+                    company_id, max(first, date(year, 1, 1)), min(last, date(year, 12, 31)),
+                )
+            self.stdout.write(f"Company {company_id}: {written} fact rows ({first} → {last}).")
+
+        self.stdout.write(self.style.SUCCESS("Sales facts rebuilt."))
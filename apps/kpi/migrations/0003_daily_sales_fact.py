@@ -0,0 +1,46 @@
+# Generated by Django 5.0.4 on 2026-10-16 19:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0004_branchalias'),
+        ('companies', '0004_company_city_company_country_company_current_erp'),
+        ('kpi', '0002_drop_snapshot_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('material_code', models.CharField(max_length=100, verbose_name='Material Code')),
+                ('material_name', models.CharField(max_length=500, verbose_name='Material Name')),
+                ('material_name_key', models.CharField(blank=True, default='', max_length=500, verbose_name='Material Name Key')),
+                ('category', models.CharField(blank=True, max_length=255, null=True, verbose_name='Category')),
+                ('customer_name', models.CharField(blank=True, max_length=500, null=True, verbose_name='Customer Name')),
+                ('movement_kind', models.PositiveSmallIntegerField(choices=[(0, 'Other'), (1, 'Sale'), (2, 'Purchase'), (3, 'Sale return'), (4, 'Purchase return'), (5, 'Opening balance'), (6, 'Main entry'), (7, 'Other purchase')], default=0, verbose_name='Movement Kind')),
+                ('is_cash_customer', models.BooleanField(default=False, verbose_name='Cash Customer')),
+                ('qty_in', models.DecimalField(blank=True, decimal_places=4, max_digits=18, null=True, verbose_name='Quantity In')),
+                ('qty_out', models.DecimalField(blank=True, decimal_places=4, max_digits=18, null=True, verbose_name='Quantity Out')),
+                ('total_in', models.DecimalField(blank=True, decimal_places=4, max_digits=20, null=True, verbose_name='Total In (LYD)')),
+                ('total_out', models.DecimalField(blank=True, decimal_places=4, max_digits=20, null=True, verbose_name='Total Out (LYD)')),
+                ('sale_value', models.DecimalField(decimal_places=8, default=0, max_digits=30, verbose_name='Σ price_out × qty_out (LYD)')),
+                ('cost', models.DecimalField(decimal_places=8, default=0, help_text='Gross profit = sale_value - cost.', max_digits=30, verbose_name='Σ balance_price × qty_out (LYD)')),
+                ('line_count', models.PositiveIntegerField(default=0, verbose_name='Movement lines')),
+                ('branch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_sales_facts', to='branches.branch', verbose_name='Branch')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales_facts', to='companies.company', verbose_name='Company')),
+            ],
+            options={
+                'verbose_name': 'Daily Sales Fact',
+                'verbose_name_plural': 'Daily Sales Facts',
+                'db_table': 'kpi_daily_sales_fact',
+                'ordering': ['-date', 'material_code'],
+                'indexes': [models.Index(fields=['company', 'date'], name='kpi_daily_s_company_5e3a63_idx'), models.Index(fields=['company', 'movement_kind', 'date'], name='kpi_daily_s_company_922090_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.4 on 2026-10-16 19:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0004_branchalias'),
+        ('companies', '0004_company_city_company_country_company_current_erp'),
+        ('kpi', '0003_daily_sales_fact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySalesFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month.', verbose_name='Month')),
+                ('category', models.CharField(blank=True, max_length=255, null=True, verbose_name='Category')),
+                ('movement_kind', models.PositiveSmallIntegerField(choices=[(0, 'Other'), (1, 'Sale'), (2, 'Purchase'), (3, 'Sale return'), (4, 'Purchase return'), (5, 'Opening balance'), (6, 'Main entry'), (7, 'Other purchase')], default=0, verbose_name='Movement Kind')),
+                ('has_customer', models.BooleanField(default=True, verbose_name='Has Customer Name')),
+                ('qty_in', models.DecimalField(blank=True, decimal_places=4, max_digits=18, null=True, verbose_name='Quantity In')),
+                ('qty_out', models.DecimalField(blank=True, decimal_places=4, max_digits=18, null=True, verbose_name='Quantity Out')),
+                ('total_in', models.DecimalField(blank=True, decimal_places=4, max_digits=20, null=True, verbose_name='Total In (LYD)')),
+                ('total_out', models.DecimalField(blank=True, decimal_places=4, max_digits=20, null=True, verbose_name='Total Out (LYD)')),
+                ('sale_value', models.DecimalField(decimal_places=8, default=0, max_digits=30, verbose_name='Σ price_out × qty_out (LYD)')),
+                ('cost', models.DecimalField(decimal_places=8, default=0, help_text='Gross profit = sale_value - cost.', max_digits=30, verbose_name='Σ balance_price × qty_out (LYD)')),
+                ('line_count', models.PositiveIntegerField(default=0, verbose_name='Movement lines')),
+                ('branch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='monthly_sales_facts', to='branches.branch', verbose_name='Branch')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_sales_facts', to='companies.company', verbose_name='Company')),
+            ],
+            options={
+                'verbose_name': 'Monthly Sales Fact',
+                'verbose_name_plural': 'Monthly Sales Facts',
+                'db_table': 'kpi_monthly_sales_fact',
+                'ordering': ['-month'],
+                'indexes': [models.Index(fields=['company', 'movement_kind', 'month'], name='kpi_monthly_company_f20069_idx')],
+            },
+        ),
+    ]
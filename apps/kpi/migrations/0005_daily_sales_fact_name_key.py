@@ -0,0 +1,19 @@
+# Generated by Django 5.0.4 on 2026-10-16 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0004_branchalias'),
+        ('companies', '0004_company_city_company_country_company_current_erp'),
+        ('kpi', '0004_monthly_sales_fact'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailysalesfact',
+            index=models.Index(fields=['company', 'material_name_key'], name='kpi_daily_s_company_310814_idx'),
+        ),
+    ]
@@ -1 +1,155 @@
-"""KPI app has no persistent ORM models; metrics are computed live from source tables."""
\ No newline at end of file
+"""
+apps/kpi/models.py
+
+KPI rollup tables.  They are derived from the source tables (see
+facts.py) and never edited directly: any row can be rebuilt from the
+movements with `python manage.py rebuild_sales_facts`.
+"""
+
+from django.db import models
+
+from apps.transactions.classification import MovementKind
+
+
+class DailySalesFact(models.Model):
+    """
+    Movements summed per day and per (branch, material, customer, kind).
+
+    One row replaces every movement line sharing that key, so sales, stock
+    and analyzer queries scan thousands of fact rows instead of millions
+    of movement lines.  Every movement kind is kept: purchases and opening
+    balances feed the stock and supply figures.
+
+    material_name, material_name_key and category are part of the key so
+    that grouping by them gives exactly the figures of the movements.
+    Sums of columns that are NULL on every line stay NULL, as SUM() does.
+
+    Refreshed for the imported date range by MovementsParser (see
+    apps/kpi/facts.py).
+    """
+
+    company = models.ForeignKey(
+        "companies.Company",
+        on_delete=models.CASCADE,
+        related_name="daily_sales_facts",
+        verbose_name="Company",
+    )
+    date = models.DateField(verbose_name="Date")
+    branch = models.ForeignKey(
+        "branches.Branch",
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name="daily_sales_facts",
+        verbose_name="Branch",
+    )
+
+    # ── Key (movement columns) ────────────────────────────────────────────────
+
+    material_code = models.CharField(max_length=100, verbose_name="Material Code")
+    material_name = models.CharField(max_length=500, verbose_name="Material Name")
+    material_name_key = models.CharField(max_length=500, blank=True, default="", verbose_name="Material Name Key")
+    category = models.CharField(max_length=255, blank=True, null=True, verbose_name="Category")
+    customer_name = models.CharField(max_length=500, blank=True, null=True, verbose_name="Customer Name")
+    movement_kind = models.PositiveSmallIntegerField(
+        choices=MovementKind.choices,
+        default=MovementKind.OTHER,
+        verbose_name="Movement Kind",
+    )
+    is_cash_customer = models.BooleanField(default=False, verbose_name="Cash Customer")
+
+    # ── Measures ──────────────────────────────────────────────────────────────
+
+    qty_in = models.DecimalField(max_digits=18, decimal_places=4, null=True, blank=True, verbose_name="Quantity In")
+    qty_out = models.DecimalField(max_digits=18, decimal_places=4, null=True, blank=True, verbose_name="Quantity Out")
+    total_in = models.DecimalField(max_digits=20, decimal_places=4, null=True, blank=True, verbose_name="Total In (LYD)")
+    total_out = models.DecimalField(max_digits=20, decimal_places=4, null=True, blank=True, verbose_name="Total Out (LYD)")
+    sale_value = models.DecimalField(
+        max_digits=30, decimal_places=8, default=0,
+        verbose_name="Σ price_out × qty_out (LYD)",
+    )
+    cost = models.DecimalField(
+        max_digits=30, decimal_places=8, default=0,
+        verbose_name="Σ balance_price × qty_out (LYD)",
+        help_text="Gross profit = sale_value - cost.",
+    )
+    line_count = models.PositiveIntegerField(default=0, verbose_name="Movement lines")
+
+    class Meta:
+        db_table = "kpi_daily_sales_fact"
+        verbose_name = "Daily Sales Fact"
+        verbose_name_plural = "Daily Sales Facts"
+        ordering = ["-date", "material_code"]
+        indexes = [
+            models.Index(fields=["company", "date"]),
+            models.Index(fields=["company", "movement_kind", "date"]),
+            models.Index(fields=["company", "material_name_key"]),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.material_code} — {self.customer_name or '-'} ({self.line_count} lines)"
+
+
+class MonthlySalesFact(models.Model):
+    """
+    Daily facts summed per month and per (branch, category, kind): the
+    source of the monthly charts, a few hundred rows per year whatever
+    the number of movements.
+
+    has_customer separates the lines without a customer name, which the
+    analyzers leave out.  Rebuilt from DailySalesFact for every month an
+    import touches (see apps/kpi/facts.py).
+    """
+
+    company = models.ForeignKey(
+        "companies.Company",
+        on_delete=models.CASCADE,
+        related_name="monthly_sales_facts",
+        verbose_name="Company",
+    )
+    month = models.DateField(verbose_name="Month", help_text="First day of the month.")
+    branch = models.ForeignKey(
+        "branches.Branch",
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name="monthly_sales_facts",
+        verbose_name="Branch",
+    )
+
+    # ── Key ───────────────────────────────────────────────────────────────────
+
+    category = models.CharField(max_length=255, blank=True, null=True, verbose_name="Category")
+    movement_kind = models.PositiveSmallIntegerField(
+        choices=MovementKind.choices,
+        default=MovementKind.OTHER,
+        verbose_name="Movement Kind",
+    )
+    has_customer = models.BooleanField(default=True, verbose_name="Has Customer Name")
+
+    # ── Measures (as on DailySalesFact) ───────────────────────────────────────
+
+    qty_in = models.DecimalField(max_digits=18, decimal_places=4, null=True, blank=True, verbose_name="Quantity In")
+    qty_out = models.DecimalField(max_digits=18, decimal_places=4, null=True, blank=True, verbose_name="Quantity Out")
+    total_in = models.DecimalField(max_digits=20, decimal_places=4, null=True, blank=True, verbose_name="Total In (LYD)")
+    total_out = models.DecimalField(max_digits=20, decimal_places=4, null=True, blank=True, verbose_name="Total Out (LYD)")
+    sale_value = models.DecimalField(
+        max_digits=30, decimal_places=8, default=0,
+        verbose_name="Σ price_out × qty_out (LYD)",
+    )
+    cost = models.DecimalField(
+        max_digits=30, decimal_places=8, default=0,
+        verbose_name="Σ balance_price × qty_out (LYD)",
+        help_text="Gross profit = sale_value - cost.",
+    )
+    line_count = models.PositiveIntegerField(default=0, verbose_name="Movement lines")
+
+    class Meta:
+        db_table = "kpi_monthly_sales_fact"
+        verbose_name = "Monthly Sales Fact"
+        verbose_name_plural = "Monthly Sales Facts"
+        ordering = ["-month"]
+        indexes = [
+            models.Index(fields=["company", "movement_kind", "month"]),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.category or '-'} ({self.line_count} lines)"
@@ -0,0 +1,68 @@
+"""
+apps/kpi/tests.py
+"""
+
+from datetime import date
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.authentication.models import User
+from apps.companies.models import Company
+from apps.data_import.parsers.excel_parser import MovementsParser
+
+HEADER = ("category", "code", "lab", "name", "date", "type", *range(7), "branch", "customer")
+
+
+def sales(count: int, year: int = 2025) -> list:
+    """*count* sale lines spread over products, customers, branches and months."""
+    return [
+        (
+            "cat", f"P{i % 7}", None, f"Product {i % 7}", date(year, i % 12 + 1, i % 28 + 1), "ف بيع",
+            None, None, None, 2, 10, 20, 7, f"Branch {i % 3}", f"Customer {i % 5}",
+        )
+        for i in range(count)
+    ]
+
+
+class SalesKPIViewTests(TestCase):
+    """SalesKPIView reads the facts in a fixed number of statements."""
+
+    def setUp(self):
+        self.company = Company.objects.create(name="ACME")
+        user = User.objects.create(email="manager@x.tn", company=self.company, role="manager")
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def load(self, rows: list) -> None:
+        MovementsParser().parse(iter([HEADER, *rows]), self.company, {"load_method": "orm"})
+
+    def get(self, **params):
+        return self.client.get(reverse("kpi:sales-kpis"), params)
+
+    def test_query_count_independent_of_data(self):
+        self.load(sales(30) + sales(10, year=2024))
+        # Sales figures of both years + monthly series
+        with self.assertNumQueries(2):
+            small = self.get(year=2025)
+        self.assertEqual(small.status_code, 200)
+        self.assertEqual(small.data["ca"]["total"], 600.0)
+        self.assertEqual(small.data["ca"]["previous"], 200.0)
+
+        self.load(sales(300) + sales(10, year=2024))
+        with self.assertNumQueries(2):
+            large = self.get(year=2025)
+        self.assertEqual(large.data["ca"]["total"], 6000.0)
+
+    def test_latest_year_lookup(self):
+        self.load(sales(5))
+        with self.assertNumQueries(3):
+            response = self.get()
+        self.assertEqual(response.data["year"], 2025)
+
+    def test_no_company(self):
+        self.client.force_authenticate(User.objects.create(email="admin@x.tn", role="admin"))
+        with self.assertNumQueries(0):
+            response = self.get()
+        self.assertEqual(response.status_code, 403)
@@ -37,7 +37,8 @@ BUCKET_MIDPOINTS = {
     "over_330": 360,
 }
 
-# Keywords that identify CASH (non-credit) transactions
+# Keywords that identify CASH (non-credit) transactions — stored on each
+# movement as is_cash_customer (see apps/transactions/classification.py)
 CASH_KEYWORDS = ["نقدي", "قطاعي"]
 
 
@@ -56,6 +57,7 @@ class CreditKPIView(APIView):
     def get(self, request):
         from apps.aging.models import AgingReceivable, AgingSnapshot
         from apps.customers.models import Customer
+        from apps.transactions.classification import MovementKind
         from apps.transactions.models import MaterialMovement
 
         company = request.user.company
@@ -95,25 +97,15 @@ class CreditKPIView(APIView):
         # = (CA à crédit / CA total) × 100
         # CA total = SUM(total_out) for all sales
         # CA à crédit = SUM(total_out) for sales to named, non-cash customers
-        SALE_LABELS = ["ف بيع"]
-
-        sales_qs = MaterialMovement.objects.filter(
-            company=company,
-            movement_type__in=SALE_LABELS,
-        )
-
-        SALE_LABELS = ["ف بيع"]
-        CASH_KEYWORDS_FILTER = Q(customer_name__icontains="نقدي") | Q(customer_name__icontains="قطاعي")
-
         sales_qs = MaterialMovement.objects.filter(
             company=company,
-            movement_type__in=SALE_LABELS,
+            movement_kind=MovementKind.SALE,
         )
 
         ca_total_agg = sales_qs.aggregate(ca=Coalesce(Sum("total_out"), Decimal("0")))
         ca_total = float(ca_total_agg["ca"])
 
-        ca_credit_agg = sales_qs.exclude(CASH_KEYWORDS_FILTER).exclude(
+        ca_credit_agg = sales_qs.exclude(is_cash_customer=True).exclude(
             Q(customer_name__isnull=True) | Q(customer_name="")
         ).aggregate(ca=Coalesce(Sum("total_out"), Decimal("0")))
         ca_credit = float(ca_credit_agg["ca"])
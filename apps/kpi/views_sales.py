@@ -22,27 +22,119 @@ Where:
   balance_price = unit cost price   (col سعر الرصيد)
   qty_out       = quantity sold     (col كمية الاخراجات)
   total_revenue = price_out × qty_out = total_out
+
+Every figure is read from the DailySalesFact rollup (apps/kpi/facts.py)
+in a single statement (_sales_figures), the monthly trend from
+MonthlySalesFact; gross profit is sale_value - cost:
+  sale_value = Σ price_out × qty_out      cost = Σ balance_price × qty_out
 """
 
 import logging
 from decimal import Decimal
 from datetime import date
 
-from django.db.models import Sum, Count, Q, F, Value, DecimalField, ExpressionWrapper
-from django.db.models.functions import Coalesce, TruncMonth
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.transactions.classification import MovementKind
+
 logger = logging.getLogger(__name__)
 
-SALE_TYPES     = ["ف بيع"]
-PURCHASE_TYPES = ["ف شراء", "ادخال رئيسي"]
+SALE_KINDS     = [MovementKind.SALE]
+PURCHASE_KINDS = [MovementKind.PURCHASE, MovementKind.MAIN_ENTRY]
 
 CALENDAR_MONTHS = ["", "Jan", "Feb", "Mar", "Apr", "May", "Jun",
                    "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
 
 
+def _sales_figures(company, branch: str, period_from: date, period_to: date,
+                   prev_from: date, prev_to: date, top_n: int) -> dict:
+    """
+    Every period figure of SalesKPIView in one statement.
+
+    The sales facts of the period and of the previous year are read once
+    (the "facts" CTE, materialised by PostgreSQL as it is used three
+    times), then grouped three ways and returned with UNION ALL:
+
+        total    — revenue and qty of the period, revenue of the previous year
+        product  — per (material_code, material_name): every product
+        client   — per customer_name: the top_n by profit, then revenue
+
+    Returns {"total": [row], "product": [rows], "client": [rows]}; each row
+    is a dict of key, name, revenue, qty, profit, sale_value, cost, lines
+    and prev_revenue (NULL where a group does not use them).
+    """
+    from django.db import connection
+
+    from apps.branches.models import Branch
+    from apps.kpi.models import DailySalesFact
+
+    quote = connection.ops.quote_name
+    day = quote("date")
+    kinds = ", ".join(["%s"] * len(SALE_KINDS))
+    branch_filter = ""
+    branch_params = []
+    if branch:
+        branch_filter = f"AND branch_id IN (SELECT id FROM {quote(Branch._meta.db_table)} WHERE name = %s)"
+        branch_params = [branch]
+
+    sql = f"""
+        WITH facts AS (
+            SELECT material_code, material_name, customer_name,
+                   total_out, qty_out, sale_value, cost, line_count,
+                   CASE WHEN {day} >= %s THEN 1 ELSE 0 END AS in_period
+            FROM {quote(DailySalesFact._meta.db_table)}
+            WHERE company_id = %s
+              AND movement_kind IN ({kinds})
+              AND ({day} BETWEEN %s AND %s OR {day} BETWEEN %s AND %s)
+              {branch_filter}
+        )
+        SELECT 'total', NULL, NULL,
+               SUM(CASE WHEN in_period = 1 THEN total_out END),
+               SUM(CASE WHEN in_period = 1 THEN qty_out END),
+               NULL, NULL, NULL, NULL,
+               SUM(CASE WHEN in_period = 0 THEN total_out END)
+        FROM facts
+        UNION ALL
+        SELECT 'product', material_code, material_name,
+               COALESCE(SUM(total_out), 0), COALESCE(SUM(qty_out), 0), SUM(sale_value - cost),
+               SUM(sale_value), SUM(cost), SUM(line_count), NULL
+        FROM facts
+        WHERE in_period = 1
+        GROUP BY material_code, material_name
+        UNION ALL
+        SELECT * FROM (
+            SELECT 'client', customer_name, NULL,
+                   COALESCE(SUM(total_out), 0), NULL, SUM(sale_value - cost),
+                   NULL, NULL, SUM(line_count), NULL
+            FROM facts
+            WHERE in_period = 1 AND customer_name IS NOT NULL AND customer_name <> ''
+            GROUP BY customer_name
+            ORDER BY 6 DESC, 4 DESC
+            LIMIT %s
+        ) clients
+    """
+    params = [
+        period_from,
+        DailySalesFact._meta.get_field("company").get_db_prep_value(company.pk, connection),
+        *(int(kind) for kind in SALE_KINDS),
+        period_from, period_to, prev_from, prev_to,
+        *branch_params,
+        top_n,
+    ]
+    columns = ("key", "name", "revenue", "qty", "profit", "sale_value", "cost", "lines", "prev_revenue")
+    figures = {"total": [], "product": [], "client": []}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for group, *values in cursor.fetchall():
+            figures[group].append(dict(zip(columns, values)))
+    return figures
+
+
 class SalesKPIView(APIView):
     """
     GET /api/kpi/sales/
@@ -58,9 +150,15 @@ class SalesKPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        from apps.transactions.models import MaterialMovement
+        from apps.kpi.facts import monthly_facts
+        from apps.kpi.models import DailySalesFact
 
         company = request.user.company
+        if not company:
+            return Response(
+                {"error": "No company linked to this account."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
 
         # ── Resolve date range ────────────────────────────────────────────────
         year_param = request.query_params.get("year")
@@ -69,7 +167,7 @@ class SalesKPIView(APIView):
         branch     = (request.query_params.get("branch") or "").strip()
         top_n      = min(50, max(1, int(request.query_params.get("top_n", 10))))
 
-        base_qs = MaterialMovement.objects.filter(company=company)
+        base_qs = DailySalesFact.objects.filter(company=company)
         if branch:
             base_qs = base_qs.filter(branch__name=branch)
 
@@ -84,8 +182,8 @@ class SalesKPIView(APIView):
             year        = period_from.year
         else:
             latest = (
-                base_qs.order_by("-movement_date")
-                .values_list("movement_date", flat=True)
+                base_qs.order_by("-date")
+                .values_list("date", flat=True)
                 .first()
             )
             year        = latest.year if latest else date.today().year
@@ -96,43 +194,13 @@ class SalesKPIView(APIView):
         prev_from = date(year - 1, 1, 1)
         prev_to   = date(year - 1, 12, 31)
 
-        # ── Sales querysets ───────────────────────────────────────────────────
-        sales_qs     = base_qs.filter(movement_type__in=SALE_TYPES)
-        sales_period = sales_qs.filter(movement_date__gte=period_from, movement_date__lte=period_to)
-        sales_prev   = sales_qs.filter(movement_date__gte=prev_from,   movement_date__lte=prev_to)
+        # ── Sales figures: one statement over the period's facts ──────────────
+        figures = _sales_figures(company, branch, period_from, period_to, prev_from, prev_to, top_n)
+        totals  = figures["total"][0]
 
-        zero_decimal = Value(
-            Decimal("0.0000"),
-            output_field=DecimalField(max_digits=18, decimal_places=4),
-        )
-
-        # ── Gross profit expression ───────────────────────────────────────────
-        # Formula: (سعر الاخراجات - سعر الرصيد) × كمية الاخراجات
-        #        = (price_out     - balance_price) × qty_out
-        profit_expression = ExpressionWrapper(
-            (
-                Coalesce(F("price_out"),     zero_decimal)
-                - Coalesce(F("balance_price"), zero_decimal)
-            )
-            * Coalesce(F("qty_out"), zero_decimal),
-            output_field=DecimalField(max_digits=18, decimal_places=4),
-        )
-        sum_price_out_x_qty = ExpressionWrapper(
-            Coalesce(F("price_out"), zero_decimal) * Coalesce(F("qty_out"), zero_decimal),
-            output_field=DecimalField(max_digits=18, decimal_places=4),
-        )
-
-        sum_balance_price_x_qty = ExpressionWrapper(
-            Coalesce(F("balance_price"), zero_decimal) * Coalesce(F("qty_out"), zero_decimal),
-            output_field=DecimalField(max_digits=18, decimal_places=4),
-        )
         # ── 1.1 Total Revenue ─────────────────────────────────────────────────
-        ca_total = float(
-            sales_period.aggregate(ca=Coalesce(Sum("total_out"), Decimal("0")))["ca"]
-        )
-        ca_prev = float(
-            sales_prev.aggregate(ca=Coalesce(Sum("total_out"), Decimal("0")))["ca"]
-        )
+        ca_total = float(totals["revenue"] or 0)
+        ca_prev  = float(totals["prev_revenue"] or 0)
 
         # ── 1.2 Sales Evolution % ─────────────────────────────────────────────
         if ca_prev > 0:
@@ -140,40 +208,37 @@ class SalesKPIView(APIView):
         else:
             sales_evolution = None  # No previous year data
 
-        # ── 1.3 Top Products ──────────────────────────────────────────────────
-        top_products_qs = (
-            sales_period
-            .values("material_code", "material_name")
-            .annotate(
-                total_revenue=Coalesce(Sum("total_out"),  Decimal("0")),
-                total_qty=Coalesce(Sum("qty_out"),        Decimal("0")),
-                transaction_count=Count("id"),
-            )
-            .order_by("-total_revenue")[:top_n]
+        # Products of the period by revenue: top products and margins
+        products = sorted(
+            figures["product"],
+            key=lambda row: (-float(row["revenue"] or 0), row["key"] or "", row["name"] or ""),
         )
 
+        # ── 1.3 Top Products ──────────────────────────────────────────────────
         top_products = [
             {
-                "material_code":     row["material_code"],
-                "material_name":     row["material_name"],
-                "total_revenue":     float(row["total_revenue"]),
-                "total_qty":         float(row["total_qty"]),
-                "transaction_count": row["transaction_count"],
-                "revenue_share":     round(float(row["total_revenue"]) / ca_total * 100, 2)
+                "material_code":     row["key"],
+                "material_name":     row["name"],
+                "total_revenue":     float(row["revenue"] or 0),
+                "total_qty":         float(row["qty"] or 0),
+                "transaction_count": row["lines"],
+                "revenue_share":     round(float(row["revenue"] or 0) / ca_total * 100, 2)
                                      if ca_total > 0 else 0.0,
             }
-            for row in top_products_qs
+            for row in products[:top_n]
         ]
 
         # ── 1.4 Monthly Sales ─────────────────────────────────────────────────
+        monthly_base = monthly_facts(company, period_from, period_to).filter(movement_kind__in=SALE_KINDS)
+        if branch:
+            monthly_base = monthly_base.filter(branch__name=branch)
         monthly_qs = (
-            sales_period
-            .annotate(month=TruncMonth("movement_date"))
+            monthly_base
             .values("month")
             .annotate(
                 total_revenue=Coalesce(Sum("total_out"), Decimal("0")),
                 total_qty=Coalesce(Sum("qty_out"),       Decimal("0")),
-                count=Count("id"),
+                count=Sum("line_count"),
             )
             .order_by("month")
         )
@@ -193,31 +258,18 @@ class SalesKPIView(APIView):
         # ── 1.5 Product Margins ───────────────────────────────────────────────
         # gross_profit = (price_out - balance_price) × qty_out
         # margin_pct   = (gross_profit / total_revenue) × 100
-        top_margins_qs = (
-            sales_period
-            .values("material_code", "material_name")
-            .annotate(
-                total_revenue=Coalesce(Sum("total_out"), Decimal("0")),
-                total_qty=Coalesce(Sum("qty_out"),       Decimal("0")),
-                total_profit=Coalesce(Sum(profit_expression), Decimal("0")),
-                total_price_out_x_qty=Coalesce(Sum(sum_price_out_x_qty),     Decimal("0")),
-                total_balance_price_x_qty=Coalesce(Sum(sum_balance_price_x_qty), Decimal("0"))
-            )
-            .order_by("-total_revenue")
-        )
-
         product_margins = []
-        for row in top_margins_qs:
-            total_revenue = float(row["total_revenue"] or 0)
-            total_profit  = float(row["total_profit"]  or 0)
-            total_qty     = float(row["total_qty"]     or 0)
+        for row in products:
+            total_revenue = float(row["revenue"] or 0)
+            total_profit  = float(row["profit"]  or 0)
+            total_qty     = float(row["qty"]     or 0)
 
-            total_price_out_x_qty     = float(row["total_price_out_x_qty"]     or 0)
-            total_balance_price_x_qty = float(row["total_balance_price_x_qty"] or 0)
+            total_price_out_x_qty     = float(row["sale_value"] or 0)
+            total_balance_price_x_qty = float(row["cost"]       or 0)
 
             product_margins.append({
-                "material_code":    row["material_code"],
-                "material_name":    row["material_name"],
+                "material_code":    row["key"],
+                "material_name":    row["name"],
                 "total_revenue":    round(total_revenue, 2),
                 "total_qty":        total_qty,
                 "total_profit":     round(total_profit, 2),   # gross profit in LYD
@@ -229,34 +281,25 @@ class SalesKPIView(APIView):
             })
 
         # ── 1.6 Top Clients ───────────────────────────────────────────────────
-        top_clients_qs = (
-            sales_period
-            .exclude(Q(customer_name__isnull=True) | Q(customer_name=""))
-            .values("customer_name")
-            .annotate(
-                total_revenue=Coalesce(Sum("total_out"), Decimal("0")),
-                total_profit=Coalesce(Sum(profit_expression), Decimal("0")),
-                transaction_count=Count("id"),
-            )
-            .order_by("-total_profit", "-total_revenue")[:top_n]
-        )
-
         top_clients = [
             {
-                "customer_name":     row["customer_name"],
-                "total_revenue":     float(row["total_revenue"]),
-                "total_profit":      float(row["total_profit"] or 0),
-                "transaction_count": row["transaction_count"],
-                "revenue_share":     round(float(row["total_revenue"]) / ca_total * 100, 2)
+                "customer_name":     row["key"],
+                "total_revenue":     float(row["revenue"] or 0),
+                "total_profit":      float(row["profit"] or 0),
+                "transaction_count": row["lines"],
+                "revenue_share":     round(float(row["revenue"] or 0) / ca_total * 100, 2)
                                      if ca_total > 0 else 0.0,
             }
-            for row in top_clients_qs
+            for row in sorted(
+                figures["client"],
+                key=lambda row: (-float(row["profit"] or 0), -float(row["revenue"] or 0)),
+            )
         ]
 
         # ── 1.7 Sales Velocity ────────────────────────────────────────────────
         n_days = max(1, (period_to - period_from).days + 1)
 
-        total_qty_sold    = float(sales_period.aggregate(qty=Coalesce(Sum("qty_out"), Decimal("0")))["qty"])
+        total_qty_sold    = float(totals["qty"] or 0)
         avg_daily_qty     = total_qty_sold / n_days if n_days > 0 else 0
         avg_daily_revenue = ca_total / n_days if n_days > 0 else 0
 
@@ -11,42 +11,255 @@ Stock KPIs:
 FORMULA (corrected):
   Taux de rotation = Quantité Vendue / (Stock Initial + Achats)
 
-  Where (all read from transactions_movement for the given year):
-    - Stock Initial = SUM(qty_in)  WHERE movement_type = 'ف.أول المدة'
-    - Achats        = SUM(qty_in)  WHERE movement_type = 'ف شراء'
-    - Quantité vendue = SUM(qty_out) WHERE movement_type = 'ف بيع'
+  Where (all read from the DailySalesFact rollup for the given year):
+    - Stock Initial = SUM(qty_in)  WHERE movement_kind = OPENING_BALANCE ('ف.أول المدة')
+    - Achats        = SUM(qty_in)  WHERE movement_kind = PURCHASE        ('ف شراء')
+    - Quantité vendue = SUM(qty_out) WHERE movement_kind = SALE          ('ف بيع')
 
-  All three are grouped by material_name (same join key used elsewhere).
+  All three are grouped by material_name_key (same join key used elsewhere).
 
 FIX: Join sales/opening/purchases → inventory by material_name (NOT material_code).
      Movements file uses short codes (e.g. "EC0020") while inventory uses full codes
      (e.g. "AS-FD-In-AD-EC0020") → code join = 0% match.
      Product names are identical in both files → use name as join key.
+     The key (stripped, lower-cased name) is computed at import time:
+     material_name_key on movements, product_name_key on inventory lines.
 
 FIX2: avg_unit_cost computed in Python (not chained ORM annotation)
       to avoid NameError: unit_cost_sum not defined at queryset eval time.
+FIX3: The inventory / movement join, status classification, summary counts
+      and top-N slices run in the database on the indexed name keys
+      (_products_cte); reorder_list and zero_stock_products are paginated.
 """
 
 import logging
-from decimal import Decimal
 from datetime import date
 
-from django.db.models import Sum, DecimalField
-from django.db.models.functions import Coalesce
+from django.db import connection
+from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.transactions.classification import MovementKind
+
 logger = logging.getLogger(__name__)
 
-SALE_TYPES            = ["ف بيع"]
-OPENING_BALANCE_TYPES = ["ف.أول المدة"]
-PURCHASE_TYPES        = ["ف شراء"]
+SALE_KINDS            = [MovementKind.SALE]
+OPENING_BALANCE_KINDS = [MovementKind.OPENING_BALANCE]
+PURCHASE_KINDS        = [MovementKind.PURCHASE]
 
 LOW_ROTATION_THRESHOLD = 0.5
 DEFAULT_LEAD_TIME_DAYS = 14
 SAFETY_FACTOR          = 0.5
 
+STATUSES = ("out", "critical", "low", "ok")   # reorder_list order
+
+MAX_PAGE_SIZE = 200
+
+# Rows of the product statement, in column order
+PRODUCT_COLUMNS = (
+    "slice", "product_name", "product_code", "product_category",
+    "stock_qty", "stock_value", "unit_cost_sum",
+    "qty_sold", "revenue", "qty_opening", "qty_purchased",
+    "rotation_rate", "min_stock", "status_rank",
+)
+
+
+def _kinds(kinds) -> str:
+    return ", ".join(str(int(kind)) for kind in kinds)
+
+
+def _products_cte(branch: str) -> str:
+    """
+    The per-product CTEs shared by both statements of StockKPIView:
+
+        inv        — inventory lines of the company's live snapshots,
+                     summed per product (name, code, category, name key)
+        mv         — the year's sale / opening / purchase quantities of the
+                     daily facts, summed per material_name_key
+        products   — inv LEFT JOIN mv on the name key, as floats
+        kpis       — rotation rate, min stock and coverage (the formulas of
+                     _product_kpis(), in double precision); rotation rate
+                     and min stock are cast to NUMERIC before ROUND, which
+                     rounds half away from zero on PostgreSQL and SQLite
+                     alike (round(double precision) rounds half to even)
+        classified — kpis + status_rank (index in STATUSES)
+
+    Placeholders: company, branch?, company, date_from, date_to, branch?,
+    n_days.
+    """
+    from apps.branches.models import Branch
+    from apps.inventory.models import InventorySnapshot, InventorySnapshotLine
+    from apps.kpi.models import DailySalesFact
+
+    quote = connection.ops.quote_name
+    line_branch = "AND l.branch_name = %s" if branch else ""
+    fact_branch = (
+        f"AND branch_id IN (SELECT id FROM {quote(Branch._meta.db_table)} WHERE name = %s)"
+        if branch else ""
+    )
+    lead_factor = DEFAULT_LEAD_TIME_DAYS / 30.0
+    return f"""
+        WITH inv AS (
+            SELECT l.product_name, l.product_code, l.product_category, l.product_name_key,
+                   COALESCE(SUM(l.quantity), 0)   AS stock_qty,
+                   COALESCE(SUM(l.line_value), 0) AS stock_value,
+                   COALESCE(SUM(l.unit_cost), 0)  AS unit_cost_sum
+            FROM {quote(InventorySnapshotLine._meta.db_table)} l
+            JOIN {quote(InventorySnapshot._meta.db_table)} s ON s.id = l.snapshot_id
+            WHERE s.company_id = %s AND s.deleted_at IS NULL {line_branch}
+            GROUP BY l.product_name, l.product_code, l.product_category, l.product_name_key
+        ),
+        mv AS (
+            SELECT material_name_key,
+                   SUM(CASE WHEN movement_kind IN ({_kinds(SALE_KINDS)}) THEN qty_out END)          AS qty_sold,
+                   SUM(CASE WHEN movement_kind IN ({_kinds(SALE_KINDS)}) THEN total_out END)        AS revenue,
+                   SUM(CASE WHEN movement_kind IN ({_kinds(OPENING_BALANCE_KINDS)}) THEN qty_in END) AS qty_opening,
+                   SUM(CASE WHEN movement_kind IN ({_kinds(PURCHASE_KINDS)}) THEN qty_in END)       AS qty_purchased
+            FROM {quote(DailySalesFact._meta.db_table)}
+            WHERE company_id = %s AND {quote("date")} BETWEEN %s AND %s
+              AND movement_kind IN ({_kinds(SALE_KINDS + OPENING_BALANCE_KINDS + PURCHASE_KINDS)})
+              AND material_name_key <> '' {fact_branch}
+            GROUP BY material_name_key
+        ),
+        products AS (
+            SELECT inv.product_name, inv.product_code, inv.product_category,
+                   CAST(inv.stock_qty AS DOUBLE PRECISION)                       AS stock_qty,
+                   CAST(inv.stock_value AS DOUBLE PRECISION)                     AS stock_value,
+                   CAST(inv.unit_cost_sum AS DOUBLE PRECISION)                   AS unit_cost_sum,
+                   CAST(COALESCE(mv.qty_sold, 0) AS DOUBLE PRECISION)            AS qty_sold,
+                   CAST(COALESCE(mv.revenue, 0) AS DOUBLE PRECISION)             AS revenue,
+                   CAST(COALESCE(mv.qty_opening, 0) AS DOUBLE PRECISION)         AS qty_opening,
+                   CAST(COALESCE(mv.qty_purchased, 0) AS DOUBLE PRECISION)       AS qty_purchased
+            FROM inv
+            LEFT JOIN mv ON mv.material_name_key = inv.product_name_key
+        ),
+        kpis AS (
+            SELECT products.*,
+                   ROUND(CAST(CASE
+                       WHEN qty_opening + qty_purchased > 0 THEN qty_sold / (qty_opening + qty_purchased)
+                       WHEN stock_qty > 0 THEN qty_sold / stock_qty
+                       ELSE 0
+                   END AS NUMERIC), 4)                                             AS rotation_rate,
+                   ROUND(CAST((qty_sold / 12.0) * {lead_factor!r} + (qty_sold / 12.0) * {SAFETY_FACTOR!r}
+                        AS NUMERIC))                                               AS min_stock,
+                   CASE WHEN qty_sold > 0 THEN stock_qty / (qty_sold / %s) END    AS coverage_days
+            FROM products
+        ),
+        classified AS (
+            SELECT kpis.*,
+                   CASE
+                       WHEN stock_qty = 0 THEN 0
+                       WHEN min_stock > 0 AND stock_qty <= min_stock THEN 1
+                       WHEN min_stock > 0 AND stock_qty <= min_stock * 1.5 THEN 2
+                       ELSE 3
+                   END AS status_rank
+            FROM kpis
+        )
+    """
+
+
+def _cte_params(company, branch: str, period_from: date, period_to: date, n_days: int) -> list:
+    from apps.inventory.models import InventorySnapshot
+    from apps.kpi.models import DailySalesFact
+
+    branch_params = [branch] if branch else []
+    return [
+        InventorySnapshot._meta.get_field("company").get_db_prep_value(company.pk, connection),
+        *branch_params,
+        DailySalesFact._meta.get_field("company").get_db_prep_value(company.pk, connection),
+        period_from,
+        period_to,
+        *branch_params,
+        n_days,
+    ]
+
+
+def _page_params(request, prefix: str = "") -> tuple:
+    """(page, page_size) from the <prefix>page / <prefix>page_size params."""
+    page      = max(1, int(request.query_params.get(f"{prefix}page", 1)))
+    page_size = min(MAX_PAGE_SIZE, max(1, int(request.query_params.get(f"{prefix}page_size", 50))))
+    return page, page_size
+
+
+def _pagination(count: int, page: int, page_size: int) -> dict:
+    return {
+        "count":       count,
+        "page":        page,
+        "page_size":   page_size,
+        "total_pages": max(1, (count + page_size - 1) // page_size),
+    }
+
+
+def _product_kpis(row: dict, n_days: int) -> dict:
+    """
+    KPIs of one product row of the product statement (floats).
+
+    rotation_rate, min_stock and the status are the values the database
+    sorted and classified the row with (_products_cte); the other KPIs
+    are derived here.
+    """
+    stock_qty        = row["stock_qty"]
+    stock_val        = row["stock_value"]
+    qty_sold         = row["qty_sold"]
+    qty_sum          = stock_qty
+    cost_price       = (row["unit_cost_sum"] / qty_sum) if qty_sum > 0 else 0.0
+
+    # ── CORRECTED ROTATION FORMULA (computed in _products_cte) ────────────────
+    # Taux de rotation = Quantité vendue / (Stock Initial + Achats)
+    #
+    # Stock Initial = opening balance qty (ف.أول المدة)
+    # Achats        = purchased qty      (ف شراء)
+    #
+    # If opening balance and purchases are both 0 for this product
+    # (e.g. the product was already in stock before the year started
+    # and nothing was bought this year), fall back to the current
+    # snapshot stock_qty so the ratio stays meaningful.
+    qty_opening   = row["qty_opening"]
+    qty_purchased = row["qty_purchased"]
+    denominator   = qty_opening + qty_purchased
+    rotation_rate = float(row["rotation_rate"])
+
+    # ── Other KPIs ────────────────────────────────────────────────────────────
+    monthly_usage   = qty_sold / 12.0
+    min_stock       = int(row["min_stock"])   # lead time + safety stock
+    max_stock       = int(round(monthly_usage * 3))
+    reorder_qty     = max(0.0, max_stock - stock_qty)
+
+    avg_daily_sales = qty_sold / n_days if n_days > 0 else 0
+    coverage_days   = (
+        round(stock_qty / avg_daily_sales, 1)
+        if avg_daily_sales > 0 else None
+    )
+    days_of_stock   = (
+        round((stock_qty / monthly_usage) * 30)
+        if monthly_usage > 0 else None
+    )
+
+    return {
+        "material_code":  row["product_code"]     or "",
+        "product_name":   row["product_name"]     or "",
+        "category":       row["product_category"] or "",
+        "stock_qty":      stock_qty,
+        "stock_value":    stock_val,
+        "cost_price":     cost_price,
+        # Rotation components (visible in UI for transparency)
+        "qty_sold":       qty_sold,
+        "qty_opening":    qty_opening,
+        "qty_purchased":  qty_purchased,
+        "denominator":    denominator,        # Stock Initial + Achats
+        "monthly_usage":  round(monthly_usage, 2),
+        "revenue":        row["revenue"],
+        "rotation_rate":  rotation_rate,      # corrected formula
+        "coverage_days":  coverage_days,
+        "min_stock":      min_stock,
+        "max_stock":      max_stock,
+        "reorder_qty":    round(reorder_qty, 0),
+        "days_of_stock":  days_of_stock,
+        "status":         STATUSES[row["status_rank"]],
+    }
+
 
 class StockKPIView(APIView):
     """
@@ -56,238 +269,113 @@ class StockKPIView(APIView):
         year=<int>                     — year for sales/purchases data (default: current year)
         branch=<str>                   — optional exact branch filter
         low_rotation_threshold=<float> — rotation threshold (default: 0.5)
+        page=<int>   page_size=<int>   — reorder_list page (default 50, max 200)
+        zero_page=<int>  zero_page_size=<int>
+                                       — zero_stock_products page (same defaults)
+
+    The product join, the status classification, the summary counts and
+    the top-N slices are computed by the database (_products_cte): the
+    view only formats the rows it returns.
     """
 
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        from apps.inventory.models import InventorySnapshot, InventorySnapshotLine
-        from apps.transactions.models import MaterialMovement
-
         company = request.user.company
+        if not company:
+            return Response(
+                {"error": "No company linked to this account."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
 
         year = int(request.query_params.get("year", date.today().year))
         branch = (request.query_params.get("branch") or "").strip()
         rotation_threshold = float(
             request.query_params.get("low_rotation_threshold", LOW_ROTATION_THRESHOLD)
         )
+        page, page_size           = _page_params(request)
+        zero_page, zero_page_size = _page_params(request, "zero_")
 
         period_from = date(year, 1, 1)
         period_to   = date(year, 12, 31)
         n_days      = (period_to - period_from).days + 1
 
-        # ── Base movement queryset for the period ────────────────────────────
-        base_mvt = MaterialMovement.objects.filter(
-            company=company,
-            movement_date__gte=period_from,
-            movement_date__lte=period_to,
-        )
-        if branch:
-            base_mvt = base_mvt.filter(branch__name=branch)
-
-        # ── 1. Quantité vendue — grouped by material_name ────────────────────
-        sales_qs = (
-            base_mvt
-            .filter(movement_type__in=SALE_TYPES)
-            .values("material_name")
-            .annotate(
-                qty_sold=Coalesce(Sum("qty_out"), Decimal("0")),
-                revenue=Coalesce(Sum("total_out"), Decimal("0")),
-            )
-        )
-        sales_by_name: dict = {}
-        for row in sales_qs:
-            key = (row["material_name"] or "").strip().lower()
-            if key:
-                sales_by_name[key] = {
-                    "qty_sold": float(row["qty_sold"]),
-                    "revenue":  float(row["revenue"]),
-                }
-
-        # ── 2. Stock Initial — ف.أول المدة, grouped by material_name ─────────
-        opening_qs = (
-            base_mvt
-            .filter(movement_type__in=OPENING_BALANCE_TYPES)
-            .values("material_name")
-            .annotate(
-                qty_opening=Coalesce(Sum("qty_in"), Decimal("0")),
-            )
-        )
-        opening_by_name: dict = {}
-        for row in opening_qs:
-            key = (row["material_name"] or "").strip().lower()
-            if key:
-                opening_by_name[key] = float(row["qty_opening"])
-
-        # ── 3. Achats — ف شراء, grouped by material_name ────────────────────
-        purchase_qs = (
-            base_mvt
-            .filter(movement_type__in=PURCHASE_TYPES)
-            .values("material_name")
-            .annotate(
-                qty_purchased=Coalesce(Sum("qty_in"), Decimal("0")),
-            )
-        )
-        purchase_by_name: dict = {}
-        for row in purchase_qs:
-            key = (row["material_name"] or "").strip().lower()
-            if key:
-                purchase_by_name[key] = float(row["qty_purchased"])
-
-        # ── 4. Inventory snapshot lines — grouped by product_name ────────────
-        inv_lines = InventorySnapshotLine.objects.filter(snapshot__company=company)
-        if branch:
-            inv_lines = inv_lines.filter(branch_name=branch)
-
-        inv_lines = (
-            inv_lines
-            .values("product_name", "product_code", "product_category")
-            .annotate(
-                total_qty=Coalesce(Sum("quantity"), Decimal("0")),
-                total_value=Coalesce(Sum("line_value"), Decimal("0")),
-                qty_sum=Coalesce(
-                    Sum("quantity", output_field=DecimalField()), Decimal("0")
-                ),
-                unit_cost_sum=Coalesce(
-                    Sum("unit_cost", output_field=DecimalField()), Decimal("0")
-                ),
-            )
-        )
-
-        # ── 5. Per-product KPIs ──────────────────────────────────────────────
-        all_products      = []
-        zero_stock        = []
-        low_rotation      = []
-        total_stock_value = 0.0
-        total_stock_qty   = 0.0
-
-        for line in inv_lines:
-            stock_qty        = float(line["total_qty"])
-            stock_val        = float(line["total_value"])
-            product_name     = line["product_name"]     or ""
-            product_code     = line["product_code"]     or ""
-            product_category = line["product_category"] or ""
-
-            # avg_unit_cost in Python to avoid chained-annotation NameError
-            qty_sum       = float(line["qty_sum"])
-            unit_cost_sum = float(line["unit_cost_sum"])
-            cost_price    = (unit_cost_sum / qty_sum) if qty_sum > 0 else 0.0
-
-            total_stock_value += stock_val
-            total_stock_qty   += stock_qty
-
-            name_key  = product_name.strip().lower()
-            sales     = sales_by_name.get(name_key, {"qty_sold": 0.0, "revenue": 0.0})
-            qty_sold  = sales["qty_sold"]
-
-            # ── CORRECTED ROTATION FORMULA ────────────────────────────────────
-            # Taux de rotation = Quantité vendue / (Stock Initial + Achats)
-            #
-            # Stock Initial = opening balance qty (ف.أول المدة)
-            # Achats        = purchased qty      (ف شراء)
-            #
-            # If opening balance and purchases are both 0 for this product
-            # (e.g. the product was already in stock before the year started
-            # and nothing was bought this year), fall back to the current
-            # snapshot stock_qty so the ratio stays meaningful.
-            qty_opening  = opening_by_name.get(name_key, 0.0)
-            qty_purchased = purchase_by_name.get(name_key, 0.0)
-            denominator  = qty_opening + qty_purchased
-
-            if denominator > 0:
-                rotation_rate = round(qty_sold / denominator, 4)
-            elif stock_qty > 0:
-                # Fallback: use current snapshot stock when no movement data
-                rotation_rate = round(qty_sold / stock_qty, 4)
-            else:
-                rotation_rate = 0.0
-
-            # ── Other KPIs ────────────────────────────────────────────────────
-            monthly_usage   = qty_sold / 12.0
-            safety_stock    = monthly_usage * SAFETY_FACTOR
-            min_stock       = int(round(
-                monthly_usage * (DEFAULT_LEAD_TIME_DAYS / 30.0) + safety_stock
-            ))
-            max_stock       = int(round(monthly_usage * 3))
-            reorder_qty     = max(0.0, max_stock - stock_qty)
-
-            avg_daily_sales = qty_sold / n_days if n_days > 0 else 0
-            coverage_days   = (
-                round(stock_qty / avg_daily_sales, 1)
-                if avg_daily_sales > 0 else None
-            )
-            days_of_stock   = (
-                round((stock_qty / monthly_usage) * 30)
-                if monthly_usage > 0 else None
-            )
-
-            if stock_qty == 0:
-                stock_status = "out"
-            elif min_stock > 0 and stock_qty <= min_stock:
-                stock_status = "critical"
-            elif min_stock > 0 and stock_qty <= min_stock * 1.5:
-                stock_status = "low"
-            else:
-                stock_status = "ok"
-
-            product_data = {
-                "material_code":  product_code,
-                "product_name":   product_name,
-                "category":       product_category,
-                "stock_qty":      stock_qty,
-                "stock_value":    stock_val,
-                "cost_price":     cost_price,
-                # Rotation components (visible in UI for transparency)
-                "qty_sold":       qty_sold,
-                "qty_opening":    qty_opening,
-                "qty_purchased":  qty_purchased,
-                "denominator":    denominator,        # Stock Initial + Achats
-                "monthly_usage":  round(monthly_usage, 2),
-                "revenue":        sales["revenue"],
-                "rotation_rate":  rotation_rate,      # corrected formula
-                "coverage_days":  coverage_days,
-                "min_stock":      min_stock,
-                "max_stock":      max_stock,
-                "reorder_qty":    round(reorder_qty, 0),
-                "days_of_stock":  days_of_stock,
-                "status":         stock_status,
-            }
-            all_products.append(product_data)
-
-            if stock_qty == 0:
-                zero_stock.append({
-                    "material_code": product_code,
-                    "product_name":  product_name,
-                    "category":      product_category,
-                    "qty_sold":      qty_sold,
-                })
-
-            if stock_qty > 0 and rotation_rate < rotation_threshold:
-                low_rotation.append({
-                    "material_code":  product_code,
-                    "product_name":   product_name,
-                    "category":       product_category,
-                    "stock_qty":      stock_qty,
-                    "stock_value":    stock_val,
-                    "qty_sold":       qty_sold,
-                    "qty_opening":    qty_opening,
-                    "qty_purchased":  qty_purchased,
-                    "rotation_rate":  rotation_rate,
-                    "coverage_days":  coverage_days,
-                })
-
-        low_rotation.sort(key=lambda x: -x["stock_value"])
-
-        top_rotation = sorted(
-            [p for p in all_products if p["stock_qty"] > 0],
-            key=lambda x: -x["rotation_rate"]
-        )[:20]
-
-        products_with_stock = [p for p in all_products if p["stock_qty"] > 0]
-        avg_rotation = (
-            sum(p["rotation_rate"] for p in products_with_stock) / len(products_with_stock)
-            if products_with_stock else 0.0
-        )
+        cte    = _products_cte(branch)
+        params = _cte_params(company, branch, period_from, period_to, n_days)
+        product_columns = ", ".join(PRODUCT_COLUMNS[1:])
+
+        # ── 1. Summary ───────────────────────────────────────────────────────
+        summary_sql = cte + """
+            SELECT COUNT(*),
+                   SUM(stock_qty),
+                   SUM(stock_value),
+                   SUM(CASE WHEN stock_qty = 0 THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN stock_qty > 0 AND rotation_rate < %s THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN status_rank = 1 THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN status_rank = 2 THEN 1 ELSE 0 END),
+                   AVG(CASE WHEN stock_qty > 0 THEN rotation_rate END)
+            FROM classified
+        """
+        # ── 2. Product slices ────────────────────────────────────────────────
+        # Each slice is ordered and cut by the database; ties are broken on
+        # name and code so pages are stable.
+        slices_sql = cte + f"""
+            SELECT * FROM (
+                SELECT 'top', {product_columns} FROM classified
+                WHERE stock_qty > 0
+                ORDER BY rotation_rate DESC, product_name, product_code LIMIT 20
+            ) top_rotation
+            UNION ALL
+            SELECT * FROM (
+                SELECT 'low', {product_columns} FROM classified
+                WHERE stock_qty > 0 AND rotation_rate < %s
+                ORDER BY stock_value DESC, product_name, product_code LIMIT 50
+            ) low_rotation
+            UNION ALL
+            SELECT * FROM (
+                SELECT 'zero', {product_columns} FROM classified
+                WHERE stock_qty = 0
+                ORDER BY product_name, product_code LIMIT %s OFFSET %s
+            ) zero_stock
+            UNION ALL
+            SELECT * FROM (
+                SELECT 'risk', {product_columns} FROM classified
+                WHERE stock_qty > 0 AND coverage_days IS NOT NULL
+                ORDER BY coverage_days, product_name, product_code LIMIT 20
+            ) coverage_at_risk
+            UNION ALL
+            SELECT * FROM (
+                SELECT 'reorder', {product_columns} FROM classified
+                ORDER BY status_rank, product_name, product_code LIMIT %s OFFSET %s
+            ) reorder_page
+        """
+
+        with connection.cursor() as cursor:
+            cursor.execute(summary_sql, params + [rotation_threshold])
+            (total_products, total_stock_qty, total_stock_value, zero_stock_count,
+             low_rotation_count, critical_count, low_count, avg_rotation) = cursor.fetchone()
+
+            cursor.execute(slices_sql, params + [
+                rotation_threshold,
+                zero_page_size, (zero_page - 1) * zero_page_size,
+                page_size, (page - 1) * page_size,
+            ])
+            slices = {"top": [], "low": [], "zero": [], "risk": [], "reorder": []}
+            for values in cursor.fetchall():
+                row = dict(zip(PRODUCT_COLUMNS, values))
+                slices[row["slice"]].append(_product_kpis(row, n_days))
+
+        low_rotation = [
+            {key: p[key] for key in (
+                "material_code", "product_name", "category", "stock_qty", "stock_value",
+                "qty_sold", "qty_opening", "qty_purchased", "rotation_rate", "coverage_days",
+            )}
+            for p in slices["low"]
+        ]
+        zero_stock = [
+            {key: p[key] for key in ("material_code", "product_name", "category", "qty_sold")}
+            for p in slices["zero"]
+        ]
 
         return Response({
             "snapshot_date": None,
@@ -295,24 +383,20 @@ class StockKPIView(APIView):
             "period":        {"from": str(period_from), "to": str(period_to)},
             "rotation_formula": "qty_sold / (stock_initial + achats)",
             "stock_summary": {
-                "total_products":     len(all_products),
-                "total_stock_qty":    round(total_stock_qty, 2),
-                "total_stock_value":  round(total_stock_value, 2),
-                "zero_stock_count":   len(zero_stock),
-                "low_rotation_count": len(low_rotation),
-                "critical_count":     sum(1 for p in all_products if p["status"] == "critical"),
-                "low_count":          sum(1 for p in all_products if p["status"] == "low"),
-                "avg_rotation_rate":  round(avg_rotation, 4),
+                "total_products":     total_products,
+                "total_stock_qty":    round(float(total_stock_qty or 0), 2),
+                "total_stock_value":  round(float(total_stock_value or 0), 2),
+                "zero_stock_count":   zero_stock_count or 0,
+                "low_rotation_count": low_rotation_count or 0,
+                "critical_count":     critical_count or 0,
+                "low_count":          low_count or 0,
+                "avg_rotation_rate":  round(float(avg_rotation or 0), 4),
             },
-            "top_rotation_products": top_rotation,
-            "low_rotation_products": low_rotation[:50],
+            "top_rotation_products": slices["top"],
+            "low_rotation_products": low_rotation,
             "zero_stock_products":   zero_stock,
-            "coverage_at_risk": sorted(
-                [p for p in products_with_stock if p["coverage_days"] is not None],
-                key=lambda x: x["coverage_days"]
-            )[:20],
-            "reorder_list": sorted(
-                all_products,
-                key=lambda x: {"out": 0, "critical": 1, "low": 2, "ok": 3}.get(x["status"], 4)
-            ),
-        })
\ No newline at end of file
+            "zero_stock_pagination": _pagination(zero_stock_count or 0, zero_page, zero_page_size),
+            "coverage_at_risk":      slices["risk"],
+            "reorder_list":          slices["reorder"],
+            "reorder_pagination":    _pagination(total_products, page, page_size),
+        })
@@ -1,6 +1,12 @@
 # apps/kpi/views_supply.py
 # ══════════════════════════════════════════════════════════════════
 # Supply Policy API  —  GET /api/kpi/supply/
+# v6: Every figure is computed by the database from the company's
+#     purchase facts (DailySalesFact, movement_kind = PURCHASE):
+#     filters, group-bys and top-N slices run in SQL, lead times use
+#     a LAG() window over the distinct (supplier, date) orders, and
+#     branch_month reads the monthly rollup (MonthlySalesFact).
+#
 # v5: Lead times now deduplicate by (supplier, date) — multiple
 #     product lines on the same day = ONE order, not N.
 #
@@ -14,23 +20,88 @@
 # ══════════════════════════════════════════════════════════════════
 
 from collections import defaultdict
-from datetime import datetime
+from datetime import date
+
+from django.db import connection
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, NullIf, Trim, TruncMonth
+from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from apps.transactions.models import MaterialMovement
+from apps.kpi.models import DailySalesFact, MonthlySalesFact
+from apps.transactions.classification import MovementKind
 
-def resolve_branch(fk_name: str | None) -> str:
+
+def branch_label():
     """
     Priority order:
-    1. Branch FK name  (Branch.name — set at import time)
+    1. Branch FK name  (Branch.name — set at import time), trimmed
     2. 'Unknown'
     """
-    fk  = (fk_name  or '').strip()
-    if fk:
-        return fk
-    return 'Unknown'
+    return Coalesce(NullIf(Trim(F('branch__name')), Value('')), Value('Unknown'))
+
+
+def supplier_label():
+    return Coalesce(NullIf(Trim(F('customer_name')), Value('')), Value('Unknown'))
+
+
+def apply_filters(qs, year_param: str, branch_param: str, cat_param: str, date_field: str):
+    """Filter facts annotated with `branch_label` on the year / branch / category params."""
+    if year_param != 'all':
+        qs = qs.filter(**{f'{date_field}__year': int(year_param)}) if year_param.isdigit() else qs.none()
+    if branch_param != 'all':
+        qs = qs.filter(branch_label=branch_param)
+    if cat_param != 'all':
+        qs = qs.filter(category=cat_param)
+    return qs
+
+
+def supplier_orders(company, year=None):
+    """
+    (supplier, date, previous order date) of every distinct purchase order
+    of *company* (optionally of one year), previous from LAG() — None for
+    a supplier's first order.
+    """
+    quote = connection.ops.quote_name
+    day = quote('date')
+    year_filter = f'AND {day} BETWEEN %s AND %s' if year else ''
+    sql = f"""
+        WITH orders AS (
+            SELECT DISTINCT COALESCE(NULLIF(TRIM(customer_name), ''), 'Unknown') AS supplier,
+                   {day} AS order_date
+            FROM {quote(DailySalesFact._meta.db_table)}
+            WHERE company_id = %s AND movement_kind = %s {year_filter}
+        )
+        SELECT supplier, order_date,
+               LAG(order_date) OVER (PARTITION BY supplier ORDER BY order_date)
+        FROM orders
+    """
+    params = [
+        DailySalesFact._meta.get_field('company').get_db_prep_value(company.pk, connection),
+        int(MovementKind.PURCHASE),
+    ]
+    if year:
+        params += [date(year, 1, 1), date(year, 12, 31)]
+    to_date = DailySalesFact._meta.get_field('date').to_python
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for supplier, order_date, previous in cursor.fetchall():
+            yield supplier, to_date(order_date), to_date(previous)
+
+
+def totals(**extra):
+    return {'value': Sum('total_in'), 'qty': Sum('qty_in'), **extra}
+
+
+def as_totals(row: dict, *keys: str) -> dict:
+    out = {key: row[key] for key in keys}
+    out['value'] = float(row['value'] or 0)
+    out['qty']   = float(row['qty']   or 0)
+    if 'count' in row:
+        out['count'] = row['count'] or 0
+    return out
 
 
 @api_view(['GET'])
@@ -40,217 +111,136 @@ def supply_kpi_view(request):
     branch_param = request.query_params.get('branch',   'all')
     cat_param    = request.query_params.get('category', 'all')
 
-    # ── 1. Base queryset: purchases only ─────────────────────────
-    qs = MaterialMovement.objects.filter(movement_type='ف شراء')
-
-    # ── 2. Single DB query ────────────────────────────────────────
-    rows = qs.values(
-        'movement_date',
-        'branch__name',    # FK-resolved branch name
-        'customer_name',   # supplier name
-        'category',
-        'material_name',
-        'qty_in',
-        'total_in',
+    company = request.user.company
+    if not company:
+        return Response(
+            {'error': 'No company linked to this account.'},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+    # ── 1. Base queryset: the company's purchases ─────────────────
+    base = DailySalesFact.objects.filter(
+        company=company, movement_kind=MovementKind.PURCHASE,
+    ).annotate(branch_label=branch_label(), supplier=supplier_label())
+
+    # ── 2. Filter options (unfiltered) ────────────────────────────
+    all_years      = [str(d.year) for d in base.dates('date', 'year')]
+    all_branches   = sorted(base.values_list('branch_label', flat=True).distinct().order_by())
+    all_categories = sorted(
+        base.exclude(Q(category__isnull=True) | Q(category=''))
+        .values_list('category', flat=True).distinct().order_by()
     )
 
-    # ── 3. Parse all rows ─────────────────────────────────────────
-    all_years      = set()
-    all_branches   = set()
-    all_categories = set()
-    parsed         = []
-
-    for r in rows:
-        date = r['movement_date']
-        if hasattr(date, 'year'):
-            y = str(date.year)
-            m = date.strftime('%Y-%m')
-        else:
-            try:
-                dt = datetime.fromisoformat(str(date))
-                y  = str(dt.year)
-                m  = dt.strftime('%Y-%m')
-            except Exception:
-                continue
-
-        branch   = resolve_branch(r.get('branch__name'))
-        supplier = (r.get('customer_name') or '').strip() or 'Unknown'
-        category = (r.get('category')      or '').strip()
-        material = (r.get('material_name') or '').strip()
-        qty      = float(r.get('qty_in')   or 0)
-        total    = float(r.get('total_in') or 0)
-
-        all_years.add(y)
-        all_branches.add(branch)
-        if category:
-            all_categories.add(category)
-
-        parsed.append({
-            'year': y, 'month': m,
-            'branch': branch, 'supplier': supplier,
-            'category': category, 'material': material,
-            'qty': qty, 'total': total,
-        })
-
-    # ── 4. Apply filters ──────────────────────────────────────────
-    filtered = parsed
-    if year_param != 'all':
-        filtered = [r for r in filtered if r['year'] == year_param]
-    if branch_param != 'all':
-        filtered = [r for r in filtered if r['branch'] == branch_param]
-    if cat_param != 'all':
-        filtered = [r for r in filtered if r['category'] == cat_param]
+    # ── 3. Apply filters ──────────────────────────────────────────
+    filtered = apply_filters(base, year_param, branch_param, cat_param, 'date')
 
-    # ── 5. Aggregate ──────────────────────────────────────────────
+    # ── 4. Aggregate ──────────────────────────────────────────────
 
     # Meta KPIs
-    total_value      = sum(r['total'] for r in filtered)
-    total_qty        = sum(r['qty']   for r in filtered)
-    unique_suppliers = len({r['supplier'] for r in filtered})
-    unique_skus      = len({r['material'] for r in filtered})
+    meta = filtered.aggregate(
+        total_value=Sum('total_in'),
+        total_qty=Sum('qty_in'),
+        unique_suppliers=Count('supplier', distinct=True),
+        unique_skus=Count('material_name', distinct=True),
+        total_transactions=Sum('line_count'),
+    )
+
+    count = Sum('line_count')
 
     # Monthly
-    monthly_map: dict = defaultdict(lambda: {'value': 0.0, 'qty': 0.0, 'count': 0})
-    for r in filtered:
-        monthly_map[r['month']]['value'] += r['total']
-        monthly_map[r['month']]['qty']   += r['qty']
-        monthly_map[r['month']]['count'] += 1
-    monthly = [{'month': k, **v} for k, v in sorted(monthly_map.items())]
+    monthly = [
+        {'month': row['month'].strftime('%Y-%m'), **as_totals(row)}
+        for row in filtered.values(month=TruncMonth('date'))
+        .annotate(**totals(count=count)).order_by('month')
+    ]
 
     # By branch
-    branch_map: dict = defaultdict(lambda: {'value': 0.0, 'qty': 0.0, 'count': 0})
-    for r in filtered:
-        branch_map[r['branch']]['value'] += r['total']
-        branch_map[r['branch']]['qty']   += r['qty']
-        branch_map[r['branch']]['count'] += 1
-    by_branch = sorted(
-        [{'branch': k, **v} for k, v in branch_map.items()],
-        key=lambda x: x['value'], reverse=True
-    )
+    by_branch = [
+        {'branch': row['branch_label'], **as_totals(row)}
+        for row in filtered.values('branch_label')
+        .annotate(**totals(count=count)).order_by('-value')
+    ]
 
     # By supplier (top 20)
-    sup_map: dict = defaultdict(lambda: {'value': 0.0, 'qty': 0.0, 'count': 0, 'skus': set()})
-    for r in filtered:
-        sup_map[r['supplier']]['value'] += r['total']
-        sup_map[r['supplier']]['qty']   += r['qty']
-        sup_map[r['supplier']]['count'] += 1
-        sup_map[r['supplier']]['skus'].add(r['material'])
-    by_supplier = sorted(
-        [{'name': k, 'value': v['value'], 'qty': v['qty'],
-          'count': v['count'], 'sku_count': len(v['skus'])}
-         for k, v in sup_map.items()],
-        key=lambda x: x['value'], reverse=True
-    )[:20]
+    by_supplier = [
+        {'name': row['supplier'], **as_totals(row), 'sku_count': row['sku_count']}
+        for row in filtered.values('supplier')
+        .annotate(**totals(count=count, sku_count=Count('material_name', distinct=True)))
+        .order_by('-value')[:20]
+    ]
 
     # By category (top 20)
-    cat_map: dict = defaultdict(lambda: {'value': 0.0, 'qty': 0.0, 'count': 0})
-    for r in filtered:
-        c = r['category'] or 'Other'
-        cat_map[c]['value'] += r['total']
-        cat_map[c]['qty']   += r['qty']
-        cat_map[c]['count'] += 1
-    by_category = sorted(
-        [{'name': k, **v} for k, v in cat_map.items()],
-        key=lambda x: x['value'], reverse=True
-    )[:20]
-
-    # Branch × Month
-    bxm_map: dict = defaultdict(lambda: {'value': 0.0, 'qty': 0.0})
-    for r in filtered:
-        key = (r['branch'], r['month'])
-        bxm_map[key]['value'] += r['total']
-        bxm_map[key]['qty']   += r['qty']
-    branch_month = sorted(
-        [{'branch': k[0], 'month': k[1], **v} for k, v in bxm_map.items()],
-        key=lambda x: (x['branch'], x['month'])
+    by_category = [
+        {'name': row['name'], **as_totals(row)}
+        for row in filtered.values(name=Coalesce(NullIf(F('category'), Value('')), Value('Other')))
+        .annotate(**totals(count=count)).order_by('-value')[:20]
+    ]
+
+    # Branch × Month (monthly rollup, same filters)
+    bxm_qs = apply_filters(
+        MonthlySalesFact.objects.filter(company=company, movement_kind=MovementKind.PURCHASE)
+        .annotate(branch_label=branch_label()),
+        year_param, branch_param, cat_param, 'month',
     )
+    branch_month = [
+        {'branch': row['branch_label'], 'month': row['month'].strftime('%Y-%m'), **as_totals(row)}
+        for row in bxm_qs.values('month', 'branch_label')
+        .annotate(**totals()).order_by('branch_label', 'month')
+    ]
 
     # Supplier × top SKUs (top 10 suppliers × top 5 SKUs each)
     top_sup_names = [s['name'] for s in by_supplier[:10]]
-    sup_sku_map: dict[str, dict] = {
-        n: defaultdict(lambda: {'value': 0.0, 'qty': 0.0})
-        for n in top_sup_names
-    }
-    for r in filtered:
-        if r['supplier'] in sup_sku_map:
-            sup_sku_map[r['supplier']][r['material']]['value'] += r['total']
-            sup_sku_map[r['supplier']][r['material']]['qty']   += r['qty']
-    supplier_skus = []
-    for sup_name in top_sup_names:
-        items = sorted(
-            [{'name': mat, **vals} for mat, vals in sup_sku_map[sup_name].items()],
-            key=lambda x: x['value'], reverse=True
-        )[:5]
-        supplier_skus.append({'supplier': sup_name, 'items': items})
-
-    # ── 6. Lead times ─────────────────────────────────────────────
+    sup_sku_map: dict = defaultdict(list)
+    for row in (
+        filtered.filter(supplier__in=top_sup_names)
+        .values('supplier', name=F('material_name'))
+        .annotate(**totals()).order_by('supplier', '-value')
+    ):
+        if len(sup_sku_map[row['supplier']]) < 5:
+            sup_sku_map[row['supplier']].append(as_totals(row, 'name'))
+    supplier_skus = [
+        {'supplier': sup_name, 'items': sup_sku_map[sup_name]}
+        for sup_name in top_sup_names
+    ]
+
+    # ── 5. Lead times ─────────────────────────────────────────────
     # A "commande" = unique (supplier, date) pair.
     # Multiple product lines on the same day for the same supplier
-    # count as ONE order — deduplicate before computing gaps.
-    date_qs = MaterialMovement.objects.filter(
-        movement_type='ف شراء'
-    ).values('customer_name', 'movement_date').distinct()
-
-    if year_param != 'all':
-        try:
-            date_qs = date_qs.filter(movement_date__year=int(year_param))
-        except (ValueError, TypeError):
-            pass
-
-    # Use a set per supplier so duplicate (supplier, date) rows are ignored
-    sup_order_dates: dict[str, set] = defaultdict(set)
-    for r in date_qs:
-        sup_name = (r.get('customer_name') or '').strip() or 'Unknown'
-        d = r['movement_date']
-        if not d:
-            continue
-        # Normalise to a plain date so same-day datetime variants collapse
-        if hasattr(d, 'date'):
-            order_date = d.date()       # datetime → date
-        elif hasattr(d, 'year'):
-            order_date = d              # already a date
-        else:
-            try:
-                order_date = datetime.fromisoformat(str(d)).date()
-            except Exception:
-                continue
-        sup_order_dates[sup_name].add(order_date)
+    # count as ONE order: the orders are the distinct (supplier, date)
+    # pairs and LAG() gives each the date of the supplier's previous one.
+    year = int(year_param) if year_param != 'all' and year_param.isdigit() else None
+    sup_orders: dict = defaultdict(lambda: {'orders': 0, 'gaps': []})
+    for sup_name, order_date, previous in supplier_orders(company, year):
+        sup_orders[sup_name]['orders'] += 1
+        if previous is not None:
+            sup_orders[sup_name]['gaps'].append((order_date - previous).days)
 
     lead_times = []
-    for sup_name, date_set in sup_order_dates.items():
+    for sup_name, stats in sup_orders.items():
         # Need at least 2 distinct order dates to compute a gap
-        if len(date_set) < 2:
-            continue
-        dates_sorted = sorted(date_set)
-        gaps = [
-            (dates_sorted[i + 1] - dates_sorted[i]).days
-            for i in range(len(dates_sorted) - 1)
-        ]
-        # After dedup, gaps should all be > 0, but guard just in case
-        positive_gaps = [g for g in gaps if g > 0]
+        positive_gaps = [g for g in stats['gaps'] if g > 0]
         if not positive_gaps:
             continue
-        avg_days = round(sum(positive_gaps) / len(positive_gaps))
         lead_times.append({
             'supplier': sup_name,
-            'orders':   len(date_set),   # number of distinct order dates
-            'avg_days': avg_days,
+            'orders':   stats['orders'],   # number of distinct order dates
+            'avg_days': round(sum(positive_gaps) / len(positive_gaps)),
         })
 
-    lead_times.sort(key=lambda x: x['avg_days'])
+    lead_times.sort(key=lambda x: (x['avg_days'], x['supplier']))
     lead_times = lead_times[:15]
 
-    # ── 7. Response ───────────────────────────────────────────────
+    # ── 6. Response ───────────────────────────────────────────────
     return Response({
         'meta': {
-            'total_value':        round(total_value, 2),
-            'total_qty':          round(total_qty, 2),
-            'unique_suppliers':   unique_suppliers,
-            'unique_skus':        unique_skus,
-            'total_transactions': len(filtered),
-            'years':              sorted(all_years),
-            'branches':           sorted(all_branches),
-            'categories':         sorted(all_categories),
+            'total_value':        round(float(meta['total_value'] or 0), 2),
+            'total_qty':          round(float(meta['total_qty']   or 0), 2),
+            'unique_suppliers':   meta['unique_suppliers'],
+            'unique_skus':        meta['unique_skus'],
+            'total_transactions': meta['total_transactions'] or 0,
+            'years':              all_years,
+            'branches':           all_branches,
+            'categories':         all_categories,
         },
         'monthly':       monthly,
         'by_branch':     by_branch,
@@ -259,4 +249,4 @@ def supply_kpi_view(request):
         'branch_month':  branch_month,
         'supplier_skus': supplier_skus,
         'lead_times':    lead_times,
-    })
\ No newline at end of file
+    })
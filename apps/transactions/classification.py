@@ -0,0 +1,112 @@
+"""
+apps/transactions/classification.py
+
+Classification columns derived from the raw Excel labels at import time.
+
+    movement_kind     — MovementKind of the raw movement_type label
+    is_cash_customer  — customer_name is a walk-in / cash account
+    *_name_key        — name join key (stripped, lower-cased), used to match
+                        movements with inventory lines by product name
+
+Each rule exists twice: as a Python function, applied row by row by the
+importers (apps/data_import/parsers/excel_parser.py), and as an SQL
+expression, applied to existing rows by
+`python manage.py backfill_classification`.  Both must stay in step.
+
+Queries then filter on small indexed columns instead of raw Arabic
+strings:
+
+    .filter(movement_kind=MovementKind.SALE)            # movement_type="ف بيع"
+    .filter(movement_kind__in=ANY_PURCHASE_KINDS)       # movement_type__contains="شراء"
+    .exclude(is_cash_customer=True)                     # customer_name__icontains="نقدي" | "قطاعي"
+"""
+
+from typing import Optional
+
+from django.db import models
+from django.db.models import Case, Q, Value, When
+from django.db.models.functions import Lower, Trim
+
+
+class MovementKind(models.IntegerChoices):
+    OTHER           = 0, "Other"
+    SALE            = 1, "Sale"
+    PURCHASE        = 2, "Purchase"
+    SALE_RETURN     = 3, "Sale return"
+    PURCHASE_RETURN = 4, "Purchase return"
+    OPENING_BALANCE = 5, "Opening balance"
+    MAIN_ENTRY      = 6, "Main entry"
+    OTHER_PURCHASE  = 7, "Other purchase"
+
+
+# Raw movement_type labels (as stored, i.e. stripped) → kind
+MOVEMENT_KIND_LABELS = {
+    "ف بيع":       MovementKind.SALE,
+    "ف شراء":      MovementKind.PURCHASE,
+    "مردودات بيع": MovementKind.SALE_RETURN,
+    "مردود شراء":  MovementKind.PURCHASE_RETURN,
+    "ف.أول المدة": MovementKind.OPENING_BALANCE,
+    "ادخال رئيسي": MovementKind.MAIN_ENTRY,
+}
+
+# Any other label containing this word is an OTHER_PURCHASE
+PURCHASE_WORD = "شراء"
+
+# Every kind whose label contains "شراء"
+ANY_PURCHASE_KINDS = (
+    MovementKind.PURCHASE,
+    MovementKind.PURCHASE_RETURN,
+    MovementKind.OTHER_PURCHASE,
+)
+
+# Customer names containing one of these are cash (non-credit) sales
+CASH_KEYWORDS = ("نقدي", "قطاعي")
+
+
+# ── Row by row (import) ──────────────────────────────────────────────────────
+
+def movement_kind(movement_type: Optional[str]) -> int:
+    if not movement_type:
+        return MovementKind.OTHER
+    kind = MOVEMENT_KIND_LABELS.get(movement_type)
+    if kind is not None:
+        return kind
+    if PURCHASE_WORD in movement_type:
+        return MovementKind.OTHER_PURCHASE
+    return MovementKind.OTHER
+
+
+def is_cash_customer(customer_name: Optional[str]) -> bool:
+    return bool(customer_name) and any(kw in customer_name for kw in CASH_KEYWORDS)
+
+
+def name_key(name: Optional[str]) -> str:
+    """Join key of a product name: the key StockKPIView used to build in Python."""
+    return (name or "").strip().lower()
+
+
+# ── SQL (backfill) ───────────────────────────────────────────────────────────
+
+def movement_kind_expression(field: str = "movement_type") -> Case:
+    return Case(
+        *(When(**{field: label}, then=Value(int(kind))) for label, kind in MOVEMENT_KIND_LABELS.items()),
+        When(**{f"{field}__contains": PURCHASE_WORD}, then=Value(int(MovementKind.OTHER_PURCHASE))),
+        default=Value(int(MovementKind.OTHER)),
+        output_field=models.PositiveSmallIntegerField(),
+    )
+
+
+def cash_customer_expression(field: str = "customer_name") -> Case:
+    matches = Q()
+    for kw in CASH_KEYWORDS:
+        matches |= Q(**{f"{field}__contains": kw})
+    return Case(
+        When(matches, then=Value(True)),
+        default=Value(False),
+        output_field=models.BooleanField(),
+    )
+
+
+def name_key_expression(field: str):
+    # Names are stripped by the importers' to_str(), so TRIM matches strip()
+    return Lower(Trim(field))
@@ -0,0 +1,73 @@
+"""
+apps/transactions/management/commands/backfill_classification.py
+
+Recomputes the classification columns (see classification.py) of rows
+already in the database: movement_kind, is_cash_customer and
+material_name_key on movements, product_name_key on inventory lines.
+The sales facts, grouped on these columns, are then rebuilt
+(rebuild_sales_facts).
+
+Run it once after the migration that adds the columns, and again after
+changing a rule in classification.py: re-imports only rewrite the rows
+whose content changed.
+
+Usage:
+    python manage.py backfill_classification
+    python manage.py backfill_classification --batch-size 5000
+"""
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from apps.inventory.models import InventorySnapshotLine
+from apps.transactions.classification import (
+    cash_customer_expression,
+    movement_kind_expression,
+    name_key_expression,
+)
+from apps.transactions.models import MaterialMovement
+
+
+class Command(BaseCommand):
+    help = "Backfill movement_kind, is_cash_customer and the name keys of existing rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000, help="Rows updated per statement.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        count = self._backfill(MaterialMovement.objects, batch_size, {
+            "movement_kind":     movement_kind_expression("movement_type"),
+            "is_cash_customer":  cash_customer_expression("customer_name"),
+            "material_name_key": name_key_expression("material_name"),
+        })
+        self.stdout.write(f"Movements: {count} rows updated.")
+        if count:
+            call_command("rebuild_sales_facts", stdout=self.stdout)
+
+        count = self._backfill(InventorySnapshotLine.objects, batch_size, {
+            "product_name_key": name_key_expression("product_name"),
+        })
+        self.stdout.write(f"Inventory lines: {count} rows updated.")
+
+        self.stdout.write(self.style.SUCCESS("Classification backfill complete."))
+
+    @staticmethod
+    def _backfill(manager, batch_size: int, assignments: dict) -> int:
+        """
+        UPDATE the rows of *manager* in primary-key order, batch_size at a
+        time, each batch in its own short statement so readers and
+        imports are never blocked for long.
+        """
+        updated = 0
+        last_pk = None
+        while True:
+            qs = manager.order_by("pk")
+            if last_pk is not None:
+                qs = qs.filter(pk__gt=last_pk)
+            pks = list(qs.values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                return updated
+            updated += manager.filter(pk__in=pks).update(**assignments)
+            last_pk = pks[-1]
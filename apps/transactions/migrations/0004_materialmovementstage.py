@@ -0,0 +1,50 @@
+# Generated by Django 5.0.4 on 2026-10-16 18:22
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0004_branchalias'),
+        ('companies', '0004_company_city_company_country_company_current_erp'),
+        ('customers', '0003_alter_customer_name'),
+        ('products', '0001_initial'),
+        ('transactions', '0003_trim_movement_types'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaterialMovementStage',
+            fields=[
+                ('category', models.CharField(blank=True, max_length=255, null=True, verbose_name='Category')),
+                ('material_code', models.CharField(max_length=100, verbose_name='Material Code')),
+                ('lab_code', models.CharField(blank=True, max_length=100, null=True, verbose_name='Lab Code')),
+                ('material_name', models.CharField(max_length=500, verbose_name='Material Name')),
+                ('movement_date', models.DateField(db_index=True, verbose_name='Movement Date')),
+                ('movement_type', models.CharField(blank=True, db_index=True, default='', max_length=100, verbose_name='Movement Type')),
+                ('qty_in', models.DecimalField(blank=True, decimal_places=4, max_digits=14, null=True, verbose_name='Quantity In')),
+                ('price_in', models.DecimalField(blank=True, decimal_places=4, max_digits=14, null=True, verbose_name='Unit Price In (LYD)')),
+                ('total_in', models.DecimalField(blank=True, decimal_places=4, max_digits=18, null=True, verbose_name='Total In (LYD)')),
+                ('qty_out', models.DecimalField(blank=True, decimal_places=4, max_digits=14, null=True, verbose_name='Quantity Out')),
+                ('price_out', models.DecimalField(blank=True, decimal_places=4, max_digits=14, null=True, verbose_name='Unit Price Out (LYD)')),
+                ('total_out', models.DecimalField(blank=True, decimal_places=4, max_digits=18, null=True, verbose_name='Total Out (LYD)')),
+                ('balance_price', models.DecimalField(blank=True, decimal_places=4, max_digits=14, null=True, verbose_name='Balance Price (LYD)')),
+                ('customer_name', models.CharField(blank=True, help_text='Raw customer name from Excel.', max_length=500, null=True, verbose_name='Customer Name')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('batch_id', models.UUIDField(db_index=True, verbose_name='Import Batch')),
+                ('branch', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='branches.branch', verbose_name='Branch')),
+                ('company', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='companies.company', verbose_name='Company')),
+                ('customer', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='customers.customer', verbose_name='Customer')),
+                ('product', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='products.product', verbose_name='Product')),
+            ],
+            options={
+                'verbose_name': 'Staged Material Movement',
+                'verbose_name_plural': 'Staged Material Movements',
+                'db_table': 'transactions_movement_stage',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.4 on 2026-10-16 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0004_branchalias'),
+        ('companies', '0004_company_city_company_country_company_current_erp'),
+        ('customers', '0003_alter_customer_name'),
+        ('products', '0001_initial'),
+        ('transactions', '0004_materialmovementstage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materialmovement',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32, verbose_name='Content Hash'),
+        ),
+        migrations.AddField(
+            model_name='materialmovementstage',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32, verbose_name='Content Hash'),
+        ),
+        migrations.AddIndex(
+            model_name='materialmovement',
+            index=models.Index(fields=['company', 'content_hash'], name='transaction_company_c8ec9a_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.4 on 2026-10-16 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0004_branchalias'),
+        ('companies', '0004_company_city_company_country_company_current_erp'),
+        ('customers', '0003_alter_customer_name'),
+        ('products', '0001_initial'),
+        ('transactions', '0005_movement_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materialmovement',
+            name='is_cash_customer',
+            field=models.BooleanField(default=False, editable=False, help_text='customer_name is a cash / walk-in account (نقدي, قطاعي).', verbose_name='Cash Customer'),
+        ),
+        migrations.AddField(
+            model_name='materialmovement',
+            name='material_name_key',
+            field=models.CharField(blank=True, default='', editable=False, help_text='material_name stripped and lower-cased: join key with inventory lines.', max_length=500, verbose_name='Material Name Key'),
+        ),
+        migrations.AddField(
+            model_name='materialmovement',
+            name='movement_kind',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Other'), (1, 'Sale'), (2, 'Purchase'), (3, 'Sale return'), (4, 'Purchase return'), (5, 'Opening balance'), (6, 'Main entry'), (7, 'Other purchase')], default=0, editable=False, help_text='Kind of the raw movement_type label.', verbose_name='Movement Kind'),
+        ),
+        migrations.AddField(
+            model_name='materialmovementstage',
+            name='is_cash_customer',
+            field=models.BooleanField(default=False, editable=False, help_text='customer_name is a cash / walk-in account (نقدي, قطاعي).', verbose_name='Cash Customer'),
+        ),
+        migrations.AddField(
+            model_name='materialmovementstage',
+            name='material_name_key',
+            field=models.CharField(blank=True, default='', editable=False, help_text='material_name stripped and lower-cased: join key with inventory lines.', max_length=500, verbose_name='Material Name Key'),
+        ),
+        migrations.AddField(
+            model_name='materialmovementstage',
+            name='movement_kind',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Other'), (1, 'Sale'), (2, 'Purchase'), (3, 'Sale return'), (4, 'Purchase return'), (5, 'Opening balance'), (6, 'Main entry'), (7, 'Other purchase')], default=0, editable=False, help_text='Kind of the raw movement_type label.', verbose_name='Movement Kind'),
+        ),
+        migrations.AddIndex(
+            model_name='materialmovement',
+            index=models.Index(fields=['company', 'movement_kind', 'movement_date'], name='transaction_company_297e00_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='materialmovement',
+            index=models.Index(fields=['company', 'material_name_key'], name='transaction_company_404451_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.4 on 2026-10-16 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0006_materialmovement_is_cash_customer_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='materialmovementstage',
+            name='movement_date',
+            field=models.DateField(verbose_name='Movement Date'),
+        ),
+        migrations.AlterField(
+            model_name='materialmovementstage',
+            name='movement_type',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='Movement Type'),
+        ),
+    ]
@@ -1,36 +1,18 @@
 import uuid
 from django.db import models
 
+from .classification import MovementKind
 
-class MaterialMovement(models.Model):
-    """
-    Represents a single material movement transaction imported from
-    the Excel movements file (حركة_المادة_2025).
 
-    movement_type stores the raw Arabic label directly from Excel.
-    No mapping is applied at import time — filtering happens at query level.
+class MovementData(models.Model):
     """
+    Columns shared by MaterialMovement and its import staging table.
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-
-    company = models.ForeignKey(
-        "companies.Company",
-        on_delete=models.CASCADE,
-        related_name="material_movements",
-        verbose_name="Company",
-    )
-
-    # ── Product reference ─────────────────────────────────────────────────────
+    Foreign keys are declared on each concrete model (the staging table
+    must not add reverse relations to Product / Branch / Customer).
+    """
 
-    product = models.ForeignKey(
-        "products.Product",
-        on_delete=models.SET_NULL,
-        null=True,
-        blank=True,
-        related_name="movements",
-        verbose_name="Product",
-        help_text="Linked product (resolved from product_code during import).",
-    )
+    # ── Material ──────────────────────────────────────────────────────────────
 
     category      = models.CharField(max_length=255, blank=True, null=True, verbose_name="Category")
     material_code = models.CharField(max_length=100, verbose_name="Material Code")
@@ -66,7 +48,84 @@ class MaterialMovement(models.Model):
 
     balance_price = models.DecimalField(max_digits=14, decimal_places=4, null=True, blank=True, verbose_name="Balance Price (LYD)")
 
-    # ── Branch & customer ─────────────────────────────────────────────────────
+    # ── Customer ──────────────────────────────────────────────────────────────
+
+    customer_name = models.CharField(
+        max_length=500, blank=True, null=True,
+        verbose_name="Customer Name",
+        help_text="Raw customer name from Excel.",
+    )
+    # ── Derived at import (see classification.py) ─────────────────────────────
+
+    movement_kind = models.PositiveSmallIntegerField(
+        choices=MovementKind.choices,
+        default=MovementKind.OTHER,
+        editable=False,
+        verbose_name="Movement Kind",
+        help_text="Kind of the raw movement_type label.",
+    )
+    is_cash_customer = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name="Cash Customer",
+        help_text="customer_name is a cash / walk-in account (نقدي, قطاعي).",
+    )
+    material_name_key = models.CharField(
+        max_length=500,
+        blank=True,
+        default="",
+        editable=False,
+        verbose_name="Material Name Key",
+        help_text="material_name stripped and lower-cased: join key with inventory lines.",
+    )
+
+    # Fingerprint of the source row (natural key, values and resolved
+    # product / branch / customer ids), set by the importer; re-imports
+    # only touch rows whose fingerprint changed.
+    content_hash = models.CharField(
+        max_length=32,
+        blank=True,
+        default="",
+        editable=False,
+        verbose_name="Content Hash",
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        abstract = True
+
+
+class MaterialMovement(MovementData):
+    """
+    Represents a single material movement transaction imported from
+    the Excel movements file (حركة_المادة_2025).
+
+    movement_type stores the raw Arabic label directly from Excel.
+    Queries filter on movement_kind, is_cash_customer and
+    material_name_key, derived from the raw values at import time.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    company = models.ForeignKey(
+        "companies.Company",
+        on_delete=models.CASCADE,
+        related_name="material_movements",
+        verbose_name="Company",
+    )
+
+    # ── Product / branch / customer references ────────────────────────────────
+
+    product = models.ForeignKey(
+        "products.Product",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="movements",
+        verbose_name="Product",
+        help_text="Linked product (resolved from product_code during import).",
+    )
 
     branch = models.ForeignKey(
         "branches.Branch",
@@ -76,11 +135,6 @@ class MaterialMovement(models.Model):
         verbose_name="Branch",
     )
 
-    customer_name = models.CharField(
-        max_length=500, blank=True, null=True,
-        verbose_name="Customer Name",
-        help_text="Raw customer name from Excel.",
-    )
     customer = models.ForeignKey(
         "customers.Customer",
         on_delete=models.SET_NULL,
@@ -89,8 +143,6 @@ class MaterialMovement(models.Model):
         verbose_name="Customer",
     )
 
-    created_at = models.DateTimeField(auto_now_add=True)
-
     class Meta:
         db_table = "transactions_movement"
         verbose_name = "Material Movement"
@@ -100,10 +152,53 @@ class MaterialMovement(models.Model):
             models.Index(fields=["company", "movement_date"]),
             models.Index(fields=["company", "movement_type"]),
             models.Index(fields=["company", "material_code"]),
+            models.Index(fields=["company", "content_hash"]),
+            models.Index(fields=["company", "movement_kind", "movement_date"]),
+            models.Index(fields=["company", "material_name_key"]),
         ]
 
     def __str__(self):
         return (
             f"[{self.movement_type}] {self.material_name} "
             f"({self.movement_date}) — {self.branch.name if self.branch else 'No branch'}"
-        )
\ No newline at end of file
+        )
+
+
+class MaterialMovementStage(MovementData):
+    """
+    Staging table for movement imports.
+
+    MovementsParser loads a file's rows here under a fresh batch_id while
+    MaterialMovement stays untouched, then promotes the batch in one short
+    transaction (delete the date range + INSERT ... SELECT).  Rows are
+    removed from the stage once the batch is promoted or abandoned.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    batch_id = models.UUIDField(db_index=True, verbose_name="Import Batch")
+
+    # Plain references, no constraints or indexes: staged rows are
+    # short-lived and are checked again when promoted into MaterialMovement.
+    movement_date = models.DateField(verbose_name="Movement Date")
+    movement_type = models.CharField(max_length=100, verbose_name="Movement Type", blank=True, default="")
+    company = models.ForeignKey(
+        "companies.Company", on_delete=models.DO_NOTHING,
+        db_constraint=False, db_index=False, related_name="+", verbose_name="Company",
+    )
+    product = models.ForeignKey(
+        "products.Product", on_delete=models.DO_NOTHING, null=True, blank=True,
+        db_constraint=False, db_index=False, related_name="+", verbose_name="Product",
+    )
+    branch = models.ForeignKey(
+        "branches.Branch", on_delete=models.DO_NOTHING, null=True, blank=True,
+        db_constraint=False, db_index=False, related_name="+", verbose_name="Branch",
+    )
+    customer = models.ForeignKey(
+        "customers.Customer", on_delete=models.DO_NOTHING, null=True, blank=True,
+        db_constraint=False, db_index=False, related_name="+", verbose_name="Customer",
+    )
+
+    class Meta:
+        db_table = "transactions_movement_stage"
+        verbose_name = "Staged Material Movement"
+        verbose_name_plural = "Staged Material Movements"
@@ -1,3 +1,4 @@
+from datetime import date
 from decimal import Decimal
 
 from django.db.models import Q, Sum, Count, F, Value, DecimalField, ExpressionWrapper
@@ -7,6 +8,9 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.kpi.facts import monthly_facts
+
+from .classification import MOVEMENT_KIND_LABELS, MovementKind
 from .models import MaterialMovement
 from .serializers import (
     MovementListSerializer,
@@ -128,11 +132,11 @@ class TransactionListView(APIView):
 
         # ── Totals computed on the full filtered queryset ─────────────────────
         sale_total_out = (
-            qs.filter(movement_type="ف بيع")
+            qs.filter(movement_kind=MovementKind.SALE)
             .aggregate(v=Sum("total_out"))["v"] or 0
         )
         purchase_total_in = (
-            qs.filter(movement_type="ف شراء")
+            qs.filter(movement_kind=MovementKind.PURCHASE)
             .aggregate(v=Sum("total_in"))["v"] or 0
         )
         totals = {
@@ -418,6 +422,10 @@ class TransactionBranchMonthlyView(APIView):
     GET /api/transactions/branch-monthly/
     Monthly sales breakdown per branch — powers the per-branch line chart.
 
+    Read from the monthly sales rollup (apps/kpi/facts.py) for the six
+    labels that have a movement kind of their own; any other label is
+    aggregated from the movements.
+
     Query params:
         movement_type=<arabic_value>  — default: "ف بيع"
         metric=<revenue|profit>       — default: revenue
@@ -438,33 +446,52 @@ class TransactionBranchMonthlyView(APIView):
         date_from = _strip_param(request, "date_from")
         date_to   = _strip_param(request, "date_to")
 
-        qs = MaterialMovement.objects.filter(
-            company=request.user.company,
-            movement_type=movement_type,
-        )
-
-        if date_from:
-            qs = qs.filter(movement_date__gte=date_from)
-        if date_to:
-            qs = qs.filter(movement_date__lte=date_to)
         if year and not date_from and not date_to:
             try:
-                qs = qs.filter(movement_date__year=int(year))
+                date_from, date_to = f"{int(year)}-01-01", f"{int(year)}-12-31"
             except ValueError:
                 pass
+        try:
+            period_from = date.fromisoformat(date_from) if date_from else None
+            period_to   = date.fromisoformat(date_to) if date_to else None
+        except ValueError:
+            return Response(
+                {"error": "date_from and date_to must be YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        zero_decimal = Value(
-            Decimal("0.0000"),
-            output_field=DecimalField(max_digits=18, decimal_places=4),
-        )
-        profit_expression = ExpressionWrapper(
-            (
-                Coalesce(F("price_out"), zero_decimal)
-                - Coalesce(F("balance_price"), zero_decimal)
+        kind = MOVEMENT_KIND_LABELS.get(movement_type)
+        if kind is not None:
+            qs = monthly_facts(request.user.company, period_from, period_to).filter(movement_kind=kind)
+            profit_expression = ExpressionWrapper(
+                F("sale_value") - F("cost"),
+                output_field=DecimalField(max_digits=30, decimal_places=8),
             )
-            * Coalesce(F("qty_out"), zero_decimal),
-            output_field=DecimalField(max_digits=18, decimal_places=4),
-        )
+            count_annotation = Sum("line_count")
+        else:
+            qs = MaterialMovement.objects.filter(
+                company=request.user.company,
+                movement_type=movement_type,
+            )
+            if period_from:
+                qs = qs.filter(movement_date__gte=period_from)
+            if period_to:
+                qs = qs.filter(movement_date__lte=period_to)
+            qs = qs.annotate(month=TruncMonth("movement_date"))
+
+            zero_decimal = Value(
+                Decimal("0.0000"),
+                output_field=DecimalField(max_digits=18, decimal_places=4),
+            )
+            profit_expression = ExpressionWrapper(
+                (
+                    Coalesce(F("price_out"), zero_decimal)
+                    - Coalesce(F("balance_price"), zero_decimal)
+                )
+                * Coalesce(F("qty_out"), zero_decimal),
+                output_field=DecimalField(max_digits=18, decimal_places=4),
+            )
+            count_annotation = Count("id")
 
         if metric == "profit":
             value_annotation = Sum(profit_expression)
@@ -473,9 +500,8 @@ class TransactionBranchMonthlyView(APIView):
             value_annotation = Sum(value_field)
 
         rows = (
-            qs.annotate(month=TruncMonth("movement_date"))
-            .values("month", "branch__name")
-            .annotate(total=value_annotation, count=Count("id"))
+            qs.values("month", "branch__name")
+            .annotate(total=value_annotation, count=count_annotation)
             .order_by("month", "branch__name")
         )
 
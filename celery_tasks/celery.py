@@ -0,0 +1,29 @@
+"""
+celery_tasks/celery.py
+
+Celery application for the WEEG backend.
+
+Configuration is read from Django settings (CELERY_* keys) and task
+modules live in this package.
+
+Worker:
+    celery -A celery_tasks.celery worker -l info
+
+Periodic tasks (CELERY_BEAT_SCHEDULE):
+    celery -A celery_tasks.celery beat -l info
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.development")
+
+app = Celery(
+    "weeg",
+    include=[
+        "celery_tasks.import_tasks",
+        "celery_tasks.purge_tasks",
+    ],
+)
+app.config_from_object("django.conf:settings", namespace="CELERY")
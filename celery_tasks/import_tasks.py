@@ -0,0 +1,72 @@
+"""
+celery_tasks/import_tasks.py
+
+Background Excel imports.
+
+ExcelUploadView spools the uploaded workbook to disk, creates a PENDING
+ImportLog and enqueues import_excel_file; the task parses the file,
+updates the log as chunks commit and removes the spooled file.
+
+While the company's previous import of the same file type is queued or
+running, the task is retried every DATA_IMPORT_LOCK_RETRY_DELAY seconds
+(the log stays PENDING and the spooled file is kept).  Each run is bounded
+by DATA_IMPORT_TASK_TIME_LIMIT (CELERY_TASK_ANNOTATIONS): the soft limit,
+DATA_IMPORT_TASK_GRACE seconds earlier, lets the task fail its own log;
+logs of runs killed by the hard limit are failed by the hourly
+purge_upload_sessions task.
+"""
+
+import logging
+import os
+
+from celery import shared_task
+from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+
+from apps.data_import.services import ImportBusy, fail_import, run_import
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, name="data_import.import_excel_file", max_retries=None)
+def import_excel_file(
+    self,
+    log_id: str,
+    path: str,
+    file_type: str = None,
+    load_method: str = None,
+    allowed_types: list = None,
+) -> str:
+    try:
+        log = run_import(
+            log_id,
+            path,
+            file_type=file_type,
+            load_method=load_method,
+            allowed_types=allowed_types,
+        )
+    except ImportBusy as e:
+        if not self.request.is_eager:
+            logger.info("[import_excel_file] %s Retrying later.", e)
+            raise self.retry(countdown=settings.DATA_IMPORT_LOCK_RETRY_DELAY)
+        # Run inline (CELERY_TASK_ALWAYS_EAGER): nothing can finish the
+        # other import while we wait, so give up instead.
+        log = fail_import(log_id, f"{e} Please upload the file again later.")
+    except SoftTimeLimitExceeded:
+        logger.warning("[import_excel_file] Import log %s exceeded the time limit.", log_id)
+        log = fail_import(
+            log_id,
+            f"Import did not finish within {settings.DATA_IMPORT_TASK_TIME_LIMIT} seconds.",
+        )
+    except BaseException:
+        _remove(path)
+        raise
+    _remove(path)
+    return log.status
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        logger.warning("[import_excel_file] Could not remove spooled file '%s'.", path)
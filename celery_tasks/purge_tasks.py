@@ -0,0 +1,31 @@
+"""
+celery_tasks/purge_tasks.py
+
+Background purges.
+
+purge_snapshot_lines — InventoryDetailView.delete, AgingSnapshotListView.delete
+and re-imports only mark the snapshot deleted (see
+apps/data_import/purge.py); this task then removes its lines in batches of
+DATA_IMPORT_PURGE_BATCH_SIZE and finally the snapshot row.
+
+purge_upload_sessions — hourly (CELERY_BEAT_SCHEDULE): deletes the chunked
+upload sessions abandoned for DATA_IMPORT_UPLOAD_SESSION_TTL seconds and
+their pre-allocated spool files, and fails the imports left PROCESSING by a
+worker killed at the task time limit (removing their spooled files).
+"""
+
+from celery import shared_task
+
+from apps.data_import.purge import purge_snapshot
+from apps.data_import.services import fail_stale_imports, purge_stale_upload_sessions
+
+
+@shared_task(name="data_import.purge_snapshot_lines")
+def purge_snapshot_lines(label: str, snapshot_id: str) -> int:
+    return purge_snapshot(label, snapshot_id)
+
+
+@shared_task(name="data_import.purge_upload_sessions")
+def purge_upload_sessions() -> int:
+    fail_stale_imports()
+    return purge_stale_upload_sessions()
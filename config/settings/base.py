@@ -203,6 +203,13 @@ CORS_ALLOWED_ORIGINS = env.list(
     ],
 )
 CORS_ALLOW_CREDENTIALS = True
+# En-têtes lisibles par le frontend (classeur d'erreurs des imports à blanc)
+CORS_EXPOSE_HEADERS = [
+    "Content-Disposition",
+    "X-Import-File-Type",
+    "X-Import-Rows",
+    "X-Import-Errors",
+]
 
 # =============================================================================
 # CACHE (Redis)
@@ -230,6 +237,78 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = "Africa/Tunis"
+# Exécute les tâches dans le processus web (dev / tests sans worker Redis)
+CELERY_TASK_ALWAYS_EAGER = env.bool("CELERY_TASK_ALWAYS_EAGER", default=False)
+# Tâches périodiques (celery beat)
+CELERY_BEAT_SCHEDULE = {
+    "purge-upload-sessions": {
+        "task": "data_import.purge_upload_sessions",
+        "schedule": 3600,
+    },
+}
+
+# =============================================================================
+# IMPORT EXCEL
+# =============================================================================
+
+# Méthode d'écriture des lignes en masse (mouvements, lignes d'inventaire) :
+#   "copy" → COPY FROM STDIN PostgreSQL (repli automatique sur l'ORM ailleurs)
+#   "orm"  → bulk_create()
+DATA_IMPORT_LOAD_METHOD = env("DATA_IMPORT_LOAD_METHOD", default="copy")
+
+# Lecteur des classeurs : "auto" (python-calamine s'il est installé et que le
+# fichier ne dépasse pas DATA_IMPORT_CALAMINE_MAX_SIZE octets, sinon openpyxl),
+# "calamine" ou "openpyxl". calamine charge toute la feuille en mémoire ;
+# openpyxl lit les lignes au fil de l'eau.
+DATA_IMPORT_READER = env("DATA_IMPORT_READER", default="auto")
+DATA_IMPORT_CALAMINE_MAX_SIZE = env.int("DATA_IMPORT_CALAMINE_MAX_SIZE", default=20 * 1024 * 1024)
+
+# Validation à blanc (dry_run=true) : exécutée pendant la requête, elle est
+# refusée au-delà de cette taille (octets)
+DATA_IMPORT_DRY_RUN_MAX_SIZE = env.int("DATA_IMPORT_DRY_RUN_MAX_SIZE", default=DATA_IMPORT_CALAMINE_MAX_SIZE)
+
+# Dossier où les fichiers uploadés attendent le worker Celery (hors MEDIA_ROOT,
+# jamais servi publiquement). Le fichier est supprimé en fin d'import.
+DATA_IMPORT_SPOOL_DIR = env("DATA_IMPORT_SPOOL_DIR", default=str(BASE_DIR / "spool" / "imports"))
+
+# Uploads par morceaux (/api/import/uploads/) : taille max du fichier, taille
+# par défaut et max d'un morceau (octets).
+DATA_IMPORT_UPLOAD_MAX_SIZE = env.int("DATA_IMPORT_UPLOAD_MAX_SIZE", default=500 * 1024 * 1024)
+DATA_IMPORT_UPLOAD_CHUNK_SIZE = env.int("DATA_IMPORT_UPLOAD_CHUNK_SIZE", default=8 * 1024 * 1024)
+DATA_IMPORT_UPLOAD_MAX_CHUNK_SIZE = env.int(
+    "DATA_IMPORT_UPLOAD_MAX_CHUNK_SIZE", default=32 * 1024 * 1024
+)
+# Sessions ouvertes simultanément par utilisateur, et durée (secondes) sans
+# nouveau morceau après laquelle une session est abandonnée : elle est
+# supprimée avec son fichier par la tâche périodique purge_upload_sessions.
+DATA_IMPORT_UPLOAD_MAX_OPEN_SESSIONS = env.int("DATA_IMPORT_UPLOAD_MAX_OPEN_SESSIONS", default=3)
+DATA_IMPORT_UPLOAD_SESSION_TTL = env.int("DATA_IMPORT_UPLOAD_SESSION_TTL", default=24 * 3600)
+
+# Import parallèle des gros fichiers de mouvements : nombre de processus
+# (1 = import séquentiel) et nombre de lignes à partir duquel ils sont utilisés
+DATA_IMPORT_WORKERS = env.int("DATA_IMPORT_WORKERS", default=1)
+DATA_IMPORT_PARALLEL_MIN_ROWS = env.int("DATA_IMPORT_PARALLEL_MIN_ROWS", default=200000)
+
+# Un seul import par société et par type de fichier à la fois : les suivants
+# restent en attente (PENDING) et la tâche réessaie toutes les N secondes
+DATA_IMPORT_LOCK_RETRY_DELAY = env.int("DATA_IMPORT_LOCK_RETRY_DELAY", default=15)
+# Durée max (secondes) d'une tâche d'import ; un import resté en attente plus
+# longtemps est considéré perdu et ne bloque plus la file
+DATA_IMPORT_TASK_TIME_LIMIT = env.int("DATA_IMPORT_TASK_TIME_LIMIT", default=2 * 3600)
+# Marge (secondes) : la limite souple tombe autant avant la limite dure pour
+# que la tâche marque elle-même son import en échec ; un import encore en
+# cours autant après la limite dure est marqué en échec par purge_upload_sessions
+DATA_IMPORT_TASK_GRACE = env.int("DATA_IMPORT_TASK_GRACE", default=300)
+CELERY_TASK_ANNOTATIONS = {
+    "data_import.import_excel_file": {
+        "time_limit": DATA_IMPORT_TASK_TIME_LIMIT,
+        "soft_time_limit": DATA_IMPORT_TASK_TIME_LIMIT - DATA_IMPORT_TASK_GRACE,
+    },
+}
+
+# Suppression des instantanés (inventaire, balance âgée) : marqués supprimés
+# immédiatement, leurs lignes sont purgées en tâche de fond par lots de N
+DATA_IMPORT_PURGE_BATCH_SIZE = env.int("DATA_IMPORT_PURGE_BATCH_SIZE", default=5000)
 
 # =============================================================================
 # EMAIL